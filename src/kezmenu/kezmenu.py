@@ -54,6 +54,9 @@ class KezMenu(KezMenuEffectAble):
         self.focus_color = (255, 0, 0, 255)
         self.mouse_enabled = True
         self.mouse_focus = False
+        # Scrolling mode: only `viewport` entries, starting at `top`, are laid out and drawn
+        self.viewport = None
+        self.top = 0
         # The 2 lines below seem stupid, but for effects I can need different font for every line.
         try:
             self._font = None
@@ -65,16 +68,55 @@ class KezMenu(KezMenuEffectAble):
     def _fixSize(self):
         """Fix the menu size. Commonly called when the font is changed"""
         self.height = 0
+        if self.viewport:
+            # Only the visible window is measured, the size doesn't depend on the number of options
+            self.width = 0
+            for o in self._visibleOptions():
+                w = o['font'].size(o['label'])[0]
+                if w > self.width:
+                    self.width = w
+            self.height = self.viewport * self._font.get_height()
+            return
         for o in self.options:
             text = o['label']
             font = o['font']
-            ren = font.render(text, 1, (0, 0, 0))
-            if ren.get_width() > self.width:
-                self.width = ren.get_width()
+            w = font.size(text)[0]
+            if w > self.width:
+                self.width = w
             self.height+=font.get_height()
 
+    def _visibleOptions(self):
+        return self.options[self.top:self.top+self.viewport]
+
+    def setViewport(self, lines):
+        """Enable the scrolling mode, showing `lines` entries at a time; None shows them all"""
+        self.viewport = lines
+        self.top = 0
+        self._scrollToOption()
+        if self._font:
+            self._fixSize()
+
+    def scroll(self, lines):
+        """Scroll the viewport by `lines` entries, negative values scroll up"""
+        if not self.viewport:
+            return
+        self.top = max(0, min(self.top + lines, len(self.options) - self.viewport))
+
+    def _scrollToOption(self):
+        """Move the viewport so that the focused option is visible"""
+        if not self.viewport:
+            return
+        if self.option < self.top:
+            self.top = self.option
+        elif self.option >= self.top + self.viewport:
+            self.top = self.option - self.viewport + 1
+        self.scroll(0)
+
     def draw(self, surface):
         """Blit the menu to a surface."""
+        if self.viewport:
+            self._drawViewport(surface)
+            return
         offset = 0
         i = 0
         ol, ot = self.screen_topleft_offset
@@ -106,18 +148,47 @@ class KezMenu(KezMenuEffectAble):
 
             i+=1
 
+    def _drawViewport(self, surface):
+        """Blit the visible window of a scrolling menu, all the lines have the height of the menu font"""
+        line_height = self._font.get_height()
+        offset = 0
+        i = self.top
+        for o in self._visibleOptions():
+            font = o.get('font',self._font)
+            if i==self.option and self.focus_color:
+                clr = self.focus_color
+            else:
+                clr = self.color
+            ren = font.render(o['label'], 1, clr)
+            if ren.get_width() > self.width:
+                self.width = ren.get_width()
+            surface.blit(ren, (self.x, self.y + offset))
+            offset+=line_height
+            i+=1
+
     def update(self, events, time_passed=None):
         """Update the menu and get input for the menu.
         @events: the pygame catched events
         @time_passed: optional parameter, only used for animations. The time passed (in seconds) from the last
                       update call (commonly obtained from a call on pygame.Clock.tick)
         """
+        focus_moved = False
         for e in events:
             if e.type == pygame.KEYDOWN:
+                focus_moved = True
                 if e.key == pygame.K_DOWN:
                     self.option += 1
                 if e.key == pygame.K_UP:
                     self.option -= 1
+                if self.viewport:
+                    if e.key == pygame.K_PAGEDOWN:
+                        self.option += self.viewport
+                    if e.key == pygame.K_PAGEUP:
+                        self.option -= self.viewport
+                    if e.key == pygame.K_HOME:
+                        self.option = 0
+                    if e.key == pygame.K_END:
+                        self.option = len(self.options)-1
                 if e.key == pygame.K_RETURN or e.key == pygame.K_SPACE:
                     self.options[self.option]['callable']()
             # Mouse controls
@@ -125,11 +196,15 @@ class KezMenu(KezMenuEffectAble):
                 lb, cb, rb = pygame.mouse.get_pressed()
                 if lb and self.mouse_focus:
                     self.options[self.option]['callable']()
+            elif e.type == pygame.MOUSEWHEEL:
+                self.scroll(-e.y)
         # Menu limits
         if self.option > len(self.options)-1:
             self.option = len(self.options)-1
         elif self.option < 0:
             self.option = 0
+        if focus_moved:
+            self._scrollToOption()
         # Check for mouse position
         if self.mouse_enabled:
             self._checkMousePositionForFocus()
@@ -138,6 +213,9 @@ class KezMenu(KezMenuEffectAble):
 
     def _checkMousePositionForFocus(self):
         """Check the mouse position to know if move focus on a option"""
+        if self.viewport:
+            self._checkMousePositionForFocusInViewport()
+            return
         i = 0
         mouse_pos = pygame.mouse.get_pos()
         ml,mt = self.position
@@ -152,6 +230,21 @@ class KezMenu(KezMenuEffectAble):
         else:
             self.mouse_focus = False
 
+    def _checkMousePositionForFocusInViewport(self):
+        """Same as _checkMousePositionForFocus for scrolling menus: lines have a fixed height,
+        so the option under the mouse is found with a division instead of a scan"""
+        mx, my = pygame.mouse.get_pos()
+        ol, ot = self.screen_topleft_offset
+        mx -= ol + self.x
+        my -= ot + self.y
+        line = int(my // self._font.get_height()) if my >= 0 else -1
+        i = self.top + line
+        if 0 <= mx < self.width and 0 <= line < self.viewport and i < len(self.options):
+            self.option = i
+            self.mouse_focus = True
+        else:
+            self.mouse_focus = False
+
     def _setPosition(self, position):
         x,y = position
         self.x = x
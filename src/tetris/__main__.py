@@ -1,14 +1,33 @@
 #!/usr/bin/env python
+from time import perf_counter
+STARTED = perf_counter() # For --startup-report, before the expensive imports
+
 import pygame
 from pygame import Rect, Surface
 import random
 import os
+import sys
+import atexit
+import argparse
+import asyncio
 import kezmenu
 
 from .tetrominoes import list_of_tetrominoes
 from .tetrominoes import rotate
 
 from .scores import load_score, write_score
+from .profiler import FrameProfiler, OVERLAY_SIZE
+from .allocation import AllocationTracer
+from .startup import Startup
+from .preload import Preloader
+from .simulation import Snapshot, SimulationThread
+from .aio import BackgroundIO, FrameBudget
+from .spectate import SpectatorServer
+from . import zobrist
+from . import versus
+from . import savegame
+from .layers import Layer, Glyphs
+from .rewind import RewindBuffer, DEFAULT_PLACEMENTS
 
 class GameOver(Exception):
     """Exception used for its control flow properties"""
@@ -16,8 +35,46 @@ class GameOver(Exception):
 # Global sound manager
 sound_manager = None
 
+# Global frame profiler, its overlay is toggled with F3
+frame_profiler = None
+
+# Global allocation tracer, only set with --trace-alloc
+alloc_tracer = None
+
+# Global spectator server, only set with --spectate-port
+spectator_server = None
+
+# The rewind buffer of the last practice game, reported on exit with --practice
+practice_buffer = None
+
+# Global background preloader, started once the first menu frame is shown
+asset_preloader = None
+
+# Caches warmed by the preloader, and filled on demand otherwise
+_sound_cache = {}
+_block_cache = {}
+_nightmare_cache = {}
+_preview_cache = {}
+_pause_symbol = None
+
+BLOCK_VARIANTS = 4 # Random textures kept per color; a new piece picks one of them
+
+GAME_SOUNDS = ("start.wav", "rotate.wav", "lateralmove.wav", "drop.wav", "clear.wav", "tetris.wav",
+               "linecleared.wav", "levelup.wav", "highscorebeaten.wav", "gameover.wav", "select.wav")
+
 
 def get_sound(filename):
+    """Returns the cached sound, it is loaded on first use once the mixer is up"""
+    try:
+        return _sound_cache[filename]
+    except KeyError:
+        sound = load_sound(filename)
+        if pygame.mixer.get_init():
+            _sound_cache[filename] = sound
+        return sound
+
+
+def load_sound(filename):
     try:
         sound = pygame.mixer.Sound(os.path.join(os.path.dirname(__file__), "resources", "sounds", filename))
         # Wrap the sound with a play method that uses the sound manager
@@ -64,24 +121,107 @@ TRICKY_CENTERX = WIDTH-(WIDTH-(MATRIS_OFFSET+BLOCKSIZE*MATRIX_WIDTH+BORDERWIDTH*
 
 VISIBLE_MATRIX_HEIGHT = MATRIX_HEIGHT - 2
 
+MAX_BOARD_PIXELS = 800 # Largest side of the board when the block size is picked automatically
+
+MAX_PREVIEW = 5 # Tetrominoes shown in advance, at most
+PREVIEW_BLOCKSIZE = BLOCKSIZE // 2 # The ones after the next tetromino are shown smaller
+
+PAUSE_SYMBOL_TIME = 2.0 # Seconds the pause symbol is shown after pausing
+IDLE_POLL = 0.1 # Seconds between two looks at the event queue of a paused `tetris --asyncio` game
+SIMULATION_WAKE = pygame.USEREVENT # Posted by the simulation thread to end a paused wait, see `main_threaded`
+
+GARBAGE_COLOR = 'grey'
+INFO_LABELS = ("Level", "Score", "Lines", "Combo") # The rows of the info panel, top to bottom
+GARBAGE_LINES = {2: 1, 3: 2, 4: 4} # Lines sent to the opponent of a versus game, by lines cleared
+
+
+class Layout(object):
+    """
+    The board dimensions of a game and the window geometry derived from them. The module
+    constants above describe the classic 10x20 board, `Layout()` without arguments is that board.
+    The side panel (next tetromino, info) is always drawn at the classic `BLOCKSIZE`.
+    """
+    def __init__(self, matrix_width=MATRIX_WIDTH, visible_matrix_height=VISIBLE_MATRIX_HEIGHT, blocksize=None):
+        if blocksize is None:
+            blocksize = min(BLOCKSIZE, max(2, MAX_BOARD_PIXELS // max(matrix_width, visible_matrix_height)))
+
+        self.matrix_width = matrix_width
+        self.visible_matrix_height = visible_matrix_height
+        self.matrix_height = visible_matrix_height + 2 # The 2 top rows are hidden
+        self.blocksize = blocksize
+
+        self.board_width = matrix_width * blocksize
+        self.board_height = visible_matrix_height * blocksize
+
+        self.width = self.board_width + BORDERWIDTH*2 + MATRIS_OFFSET*2 + LEFT_MARGIN
+        # Never shorter than the classic window, the side panel needs the room
+        self.height = max(self.board_height + BORDERWIDTH*2 + MATRIS_OFFSET*2, HEIGHT)
+        self.size = (self.width, self.height)
+
+        self.tricky_centerx = self.width-(self.width-(MATRIS_OFFSET+self.board_width+BORDERWIDTH*2))/2
+
+    @classmethod
+    def parse(cls, text, blocksize=None):
+        """Layout from a string such as "10x20", the width and the number of visible rows"""
+        width, height = parse_size(text)
+        if width < 4 or height < 4:
+            raise ValueError("the board must be at least 4x4, not {}".format(text))
+        return cls(width, height, blocksize)
+
+    @classmethod
+    def fit(cls, matrix_width, visible_matrix_height, window):
+        """The layout with the largest blocks that fits in `window`, drawn at that size rather than scaled"""
+        window_width, window_height = window
+        margins = BORDERWIDTH*2 + MATRIS_OFFSET*2
+        blocksize = min((window_width - margins - LEFT_MARGIN) // matrix_width,
+                        (window_height - margins) // visible_matrix_height)
+        if blocksize < 2 or window_height < HEIGHT:
+            raise ValueError("a {}x{} window is too small for the side panel, --scale fits any size".format(*window))
+        return cls(matrix_width, visible_matrix_height, blocksize)
+
+    def spawn_column(self, shape):
+        """The column where a new tetromino of `shape` appears, centered on the board"""
+        return (self.matrix_width - len(shape)) // 2
+
+
+def parse_size(text):
+    """(width, height) from a string such as "10x20" """
+    width, height = (int(value) for value in text.lower().split('x'))
+    return width, height
+
 
 class Matris(object):
-    def __init__(self, screen):
+    # Everything `update` reads or writes, as saved by `save_state` for the rollbacks of versus games
+    STATE = ('matrix', 'current_tetromino', 'next_tetromino', 'next_tetrominoes',
+             'tetromino_position', 'tetromino_rotation', 'tetromino_block', 'shadow_block',
+             'downwards_timer', 'movement_keys', 'movement_keys_timer', 'level', 'score', 'lines',
+             'combo', 'paused', 'pause_timer', 'played_highscorebeaten_sound', 'hard_drop_occurred',
+             'pending_garbage', 'garbage_sent', 'board_hash')
+
+    def __init__(self, screen, layout=None, seed=None, preview=1):
+        self.layout = layout = layout or Layout()
         self.surface = screen.subsurface(Rect((MATRIS_OFFSET+BORDERWIDTH, MATRIS_OFFSET+BORDERWIDTH),
-                                              (MATRIX_WIDTH * BLOCKSIZE, (MATRIX_HEIGHT-2) * BLOCKSIZE)))
+                                              (layout.board_width, layout.board_height)))
 
         self.matrix = dict()
-        for y in range(MATRIX_HEIGHT):
-            for x in range(MATRIX_WIDTH):
+        for y in range(layout.matrix_height):
+            for x in range(layout.matrix_width):
                 self.matrix[(y,x)] = None
         """
         `self.matrix` is the current state of the tetris board, that is, it records which squares are
         currently occupied. It does not include the falling tetromino. The information relating to the
         falling tetromino is managed by `self.set_tetrominoes` instead. When the falling tetromino "dies",
-        it will be placed in `self.matrix`.
+        it will be placed in `self.matrix`. Occupied squares hold ('block', surface, color).
         """
-
-        self.next_tetromino = random.choice(list_of_tetrominoes)
+        # The Zobrist hash of the occupied squares of `self.matrix`, kept up to date as it changes
+        self.square_keys = zobrist.square_keys(layout.matrix_width, layout.matrix_height)
+        self.row_keys = zobrist.row_keys(layout.matrix_width, layout.matrix_height)
+        self.board_hash = 0
+
+        # The pieces come from a generator of their own, two boards with the same seed get the same pieces
+        self.random = random.Random(seed)
+        # The queue of the next `preview` tetrominoes, the first one comes next
+        self.next_tetrominoes = tuple(self.random.choice(list_of_tetrominoes) for _ in range(preview))
         self.set_tetrominoes()
         self.tetromino_rotation = 0
         self.downwards_timer = 0
@@ -106,6 +246,18 @@ class Matris(object):
         # Track if a hard drop occurred for sound effects
         self.hard_drop_occurred = False
 
+        # Garbage lines of versus games: waiting to come in, and sent to the opponent
+        self.pending_garbage = 0
+        self.garbage_sent = 0
+        self.last_lock = None # (tetromino, rotation, position, lines cleared) of the last locked tetromino
+
+        # Called with the final score at game over, the asyncio loop hands it to a worker thread
+        self.score_writer = write_score
+        # Where the game is saved when its window is closed, to go on from there the next time (see `savegame`)
+        self.autosave = None
+        # The placements of a practice game to take back with backspace, None in other games
+        self.rewind_buffer = None
+
         self.levelup_sound  = get_sound("levelup.wav")
         self.gameover_sound = get_sound("gameover.wav")
         self.linescleared_sound = get_sound("linecleared.wav")
@@ -120,10 +272,10 @@ class Matris(object):
 
 
     def set_tetrominoes(self):
-        self.current_tetromino = self.next_tetromino
-        self.next_tetromino = random.choice(list_of_tetrominoes)
-        self.surface_of_next_tetromino = self.construct_surface_of_next_tetromino()
-        self.tetromino_position = (0,4) if len(self.current_tetromino.shape) == 2 else (0, 3)
+        self.current_tetromino = self.next_tetrominoes[0]
+        self.next_tetrominoes = self.next_tetrominoes[1:] + (self.random.choice(list_of_tetrominoes),)
+        self.next_tetromino = self.next_tetrominoes[0]
+        self.tetromino_position = (0, self.layout.spawn_column(self.current_tetromino.shape))
         self.tetromino_rotation = 0
         self.tetromino_block = self.block(self.current_tetromino.color)
         self.shadow_block = self.block(self.current_tetromino.color, shadow=True)
@@ -140,13 +292,18 @@ class Matris(object):
         self.lock_tetromino()
 
 
-    def update(self, timepassed):
+    def update(self, timepassed, events=None, soft_drop=None):
+        """
+        Advances the game by `timepassed` seconds. The events and the state of the soft drop keys
+        are read from pygame unless given, which is how the simulation thread feeds them in.
+        """
         self.needs_redraw = False
         
         pressed = lambda key: event.type == pygame.KEYDOWN and event.key == key
         unpressed = lambda key: event.type == pygame.KEYUP and event.key == key
 
-        events = pygame.event.get()
+        if events is None:
+            events = pygame.event.get()
         
         for event in events:
             if pressed(pygame.K_p):
@@ -155,22 +312,30 @@ class Matris(object):
                 # Reset the pause timer when pausing
                 if self.paused:
                     self.pause_timer = 0
+                else:
+                    timepassed = 0 # The time spent paused doesn't count, however long the loop slept
             elif event.type == pygame.QUIT:
                 self.gameover(full_exit=True)
             elif pressed(pygame.K_ESCAPE):
                 self.gameover()
+            elif pressed(pygame.K_F3) and frame_profiler:
+                frame_profiler.toggle()
+                self.needs_redraw = True
 
         if self.paused:
-            # Update the pause timer even when paused
+            # Update the pause timer even when paused, the board is only redrawn to hide the pause symbol
+            shown = self.pause_timer < PAUSE_SYMBOL_TIME
             self.pause_timer += timepassed
-            # Always return True to trigger redraw and show/hide pause symbol
-            return True
+            return self.needs_redraw or shown != (self.pause_timer < PAUSE_SYMBOL_TIME)
 
         for event in events:
             if pressed(pygame.K_SPACE):
                 self.hard_drop()
             elif pressed(pygame.K_UP) or pressed(pygame.K_w):
                 self.request_rotation()
+            elif pressed(pygame.K_BACKSPACE) and self.rewind_buffer is not None:
+                self.rewind_buffer.rewind(self)
+                self.needs_redraw = True
 
             elif pressed(pygame.K_LEFT) or pressed(pygame.K_a):
                 self.request_movement('left')
@@ -189,8 +354,9 @@ class Matris(object):
         self.downwards_speed = self.base_downwards_speed ** (1 + self.level/10.)
 
         self.downwards_timer += timepassed
-        downwards_speed = self.downwards_speed*0.10 if any([pygame.key.get_pressed()[pygame.K_DOWN],
-                                                            pygame.key.get_pressed()[pygame.K_s]]) else self.downwards_speed
+        if soft_drop is None:
+            soft_drop = any([pygame.key.get_pressed()[pygame.K_DOWN], pygame.key.get_pressed()[pygame.K_s]])
+        downwards_speed = self.downwards_speed*0.10 if soft_drop else self.downwards_speed
         if self.downwards_timer > downwards_speed:
             if not self.request_movement('down'):
                 self.lock_tetromino()
@@ -205,21 +371,47 @@ class Matris(object):
 
         return self.needs_redraw
 
-    def draw_surface(self):
-        with_tetromino = self.blend(matrix=self.place_shadow())
-
-        for y in range(MATRIX_HEIGHT):
-            for x in range(MATRIX_WIDTH):
-
-                #                                       I hide the 2 first rows by drawing them outside of the surface
-                block_location = Rect(x*BLOCKSIZE, (y*BLOCKSIZE - 2*BLOCKSIZE), BLOCKSIZE, BLOCKSIZE)
-                if with_tetromino[(y,x)] is None:
-                    self.surface.fill(BGCOLOR, block_location)
-                else:
-                    if with_tetromino[(y,x)][0] == 'shadow':
-                        self.surface.fill(BGCOLOR, block_location)
-
-                    self.surface.blit(with_tetromino[(y,x)][1], block_location)
+    def snapshot(self, tick=0):
+        """An immutable copy of everything needed to draw the game, see `tetris.simulation`"""
+        return Snapshot(
+            tick=tick,
+            blocks=tuple((x, y, square[1], square[2]) for (y, x), square in self.matrix.items() if square is not None),
+            tetromino=self.current_tetromino, rotation=self.tetromino_rotation,
+            next_tetromino=self.next_tetromino, next_tetrominoes=self.next_tetrominoes, shape=self.rotated(), position=self.tetromino_position, shadow_position=self.shadow_position(),
+            tetromino_block=self.tetromino_block, shadow_block=self.shadow_block,
+            score=self.score, level=self.level, lines=self.lines, combo=self.combo,
+            paused=self.paused, pause_timer=self.pause_timer)
+
+    def draw_surface(self, snapshot=None):
+        """
+        Paints the board, the shadow and the falling tetromino, from `snapshot` if given. Only occupied
+        squares are blitted, so the cost follows the number of blocks rather than the size of the board.
+        """
+        blocksize = self.layout.blocksize
+        surface = self.surface
+        blit = surface.blit
+        surface.fill(BGCOLOR)
+
+        # I hide the 2 first rows by drawing them outside of the surface
+        if snapshot is None:
+            for (y, x), square in self.matrix.items():
+                if square is not None:
+                    blit(square[1], (x*blocksize, (y-2)*blocksize))
+            shape = self.rotated()
+            pieces = ((self.shadow_block, self.shadow_position()),
+                      (self.tetromino_block, self.tetromino_position))
+        else:
+            for x, y, block, color in snapshot.blocks:
+                blit(block, (x*blocksize, (y-2)*blocksize))
+            shape = snapshot.shape
+            pieces = ((snapshot.shadow_block, snapshot.shadow_position),
+                      (snapshot.tetromino_block, snapshot.position))
+
+        for block, (posY, posX) in pieces:
+            for y, row in enumerate(shape):
+                for x, square in enumerate(row):
+                    if square:
+                        blit(block, ((posX+x)*blocksize, (posY+y-2)*blocksize))
 
     def gameover(self, full_exit=False):
         """
@@ -228,21 +420,41 @@ class Matris(object):
         is responsible for checking if it's game over.
         """
 
-        write_score(self.score)
+        if full_exit and self.autosave:
+            savegame.save(self, self.autosave) # It isn't over, no score yet
+            exit()
+
+        if self.rewind_buffer is None: # A practice score, made with take-backs, isn't a high score
+            self.score_writer(self.score)
 
         if full_exit:
             exit()
         else:
             raise GameOver("Sucker!")
 
-    def place_shadow(self):
+    def shadow_position(self):
+        """Where the falling tetromino would land if it was dropped now"""
+        shape = self.rotated()
         posY, posX = self.tetromino_position
-        while self.blend(position=(posY, posX)):
+        while self.fits(shape, (posY+1, posX)):
             posY += 1
+        return (posY, posX)
 
-        position = (posY-1, posX)
+    def place_shadow(self):
+        return self.blend(position=self.shadow_position(), shadow=True)
 
-        return self.blend(position=position, shadow=True)
+    def fits(self, shape, position):
+        """
+        Does `shape` at `position` fit in `self.matrix`, inside the board and on free squares only?
+        This is `self.blend` as a test, without copying the matrix.
+        """
+        posY, posX = position
+        matrix = self.matrix
+        for y, row in enumerate(shape):
+            for x, square in enumerate(row):
+                if square and matrix.get((posY+y, posX+x), False) is not None:
+                    return False
+        return True
 
     def fits_in_matrix(self, shape, position):
         posY, posX = position
@@ -267,7 +479,7 @@ class Matris(object):
                     self.fits_in_matrix(shape, (y, x-2)))
         # ^ That's how wall-kick is implemented
 
-        if position and self.blend(shape, position):
+        if position and self.fits(shape, position):
             self.tetromino_rotation = rotation
             self.tetromino_position = position
             self.rotate_sound.play()
@@ -278,21 +490,22 @@ class Matris(object):
 
     def request_movement(self, direction):
         posY, posX = self.tetromino_position
-        if direction == 'left' and self.blend(position=(posY, posX-1)):
+        shape = self.rotated()
+        if direction == 'left' and self.fits(shape, (posY, posX-1)):
             self.tetromino_position = (posY, posX-1)
             self.lateralmove_sound.play()
             self.needs_redraw = True
             return self.tetromino_position
-        elif direction == 'right' and self.blend(position=(posY, posX+1)):
+        elif direction == 'right' and self.fits(shape, (posY, posX+1)):
             self.tetromino_position = (posY, posX+1)
             self.lateralmove_sound.play()
             self.needs_redraw = True
             return self.tetromino_position
-        elif direction == 'up' and self.blend(position=(posY-1, posX)):
+        elif direction == 'up' and self.fits(shape, (posY-1, posX)):
             self.needs_redraw = True
             self.tetromino_position = (posY-1, posX)
             return self.tetromino_position
-        elif direction == 'down' and self.blend(position=(posY+1, posX)):
+        elif direction == 'down' and self.fits(shape, (posY+1, posX)):
             self.needs_redraw = True
             self.tetromino_position = (posY+1, posX)
             return self.tetromino_position
@@ -305,46 +518,24 @@ class Matris(object):
         return rotate(self.current_tetromino.shape, rotation)
 
     def block(self, color, shadow=False):
-        colors = {'blue':   (105, 105, 255),
-                  'yellow': (225, 242, 41),
-                  'pink':   (242, 41, 195),
-                  'green':  (22, 181, 64),
-                  'red':    (204, 22, 22),
-                  'orange': (245, 144, 12),
-                  'cyan':   (10, 255, 226)}
-
-
-        if shadow:
-            end = [90] # end is the alpha value
-        else:
-            end = [] # Adding this to the end will not change the array, thus no alpha value
-
-        border = Surface((BLOCKSIZE, BLOCKSIZE), pygame.SRCALPHA, 32)
-        border.fill(list(map(lambda c: c*0.5, colors[color])) + end)
-
-        borderwidth = 2
-
-        box = Surface((BLOCKSIZE-borderwidth*2, BLOCKSIZE-borderwidth*2), pygame.SRCALPHA, 32)
-        boxarr = pygame.PixelArray(box)
-        for x in range(len(boxarr)):
-            for y in range(len(boxarr)):
-                boxarr[x][y] = tuple(list(map(lambda c: min(255, int(c*random.uniform(0.8, 1.2))), colors[color])) + end)
-
-        del boxarr # deleting boxarr or else the box surface will be 'locked' or something like that and won't blit.
-        border.blit(box, Rect(borderwidth, borderwidth, 0, 0))
-
-
-        return border
+        return get_block(color, shadow, self.layout.blocksize)
 
     def lock_tetromino(self):
         """
         This method is called whenever the falling tetromino "dies". `self.matrix` is updated,
         the lines are counted and cleared, and a new tetromino is chosen.
         """
-        self.matrix = self.blend()
+        shape = self.rotated()
+        posY, posX = self.tetromino_position
+        for y, row in enumerate(shape):
+            for x, square in enumerate(row):
+                if square:
+                    self.matrix[(posY+y, posX+x)] = ('block', self.tetromino_block, self.current_tetromino.color)
+                    self.board_hash ^= self.square_keys[(posY+y, posX+x)]
 
-        lines_cleared = self.remove_lines()
+        lines_cleared = self.remove_lines(range(posY, posY+len(shape)))
         self.lines += lines_cleared
+        self.last_lock = (self.current_tetromino, self.tetromino_rotation, self.tetromino_position, lines_cleared)
 
         if lines_cleared:
             # Play appropriate line clear sound
@@ -366,6 +557,17 @@ class Matris(object):
                     self.highscorebeaten_sound.play()
                 self.played_highscorebeaten_sound = True
 
+            # Multi-line clears attack the opponent, after cancelling the garbage waiting to come in
+            attack = GARBAGE_LINES.get(min(lines_cleared, 4), 0)
+            if attack:
+                attack += self.combo - 1
+            cancelled = min(attack, self.pending_garbage)
+            self.pending_garbage -= cancelled
+            self.garbage_sent += attack - cancelled
+        elif self.pending_garbage:
+            self.add_garbage(self.pending_garbage)
+            self.pending_garbage = 0
+
         if self.lines >= self.level*10:
             self.levelup_sound.play()
             self.level += 1
@@ -381,28 +583,91 @@ class Matris(object):
         # Reset the hard drop flag for the next piece
         self.hard_drop_occurred = False
 
-        if not self.blend():
+        if not self.fits(self.rotated(), self.tetromino_position):
             self.gameover_sound.play()
-            self.gameover()
+            if self.rewind_buffer is not None:
+                # Practice games go back to before the placement that topped out
+                self.rewind_buffer.rewind(self, 0)
+            else:
+                self.gameover()
+        elif self.rewind_buffer is not None:
+            self.rewind_buffer.record(self)
 
         self.needs_redraw = True
 
-    def remove_lines(self):
-        lines = []
-        for y in range(MATRIX_HEIGHT):
-            line = (y, [])
-            for x in range(MATRIX_WIDTH):
-                if self.matrix[(y,x)]:
-                    line[1].append(x)
-            if len(line[1]) == MATRIX_WIDTH:
-                lines.append(y)
-
-        for line in sorted(lines):
-            for x in range(MATRIX_WIDTH):
-                self.matrix[(line,x)] = None
-            for y in range(0, line+1)[::-1]:
-                for x in range(MATRIX_WIDTH):
-                    self.matrix[(y,x)] = self.matrix.get((y-1,x), None)
+    def add_garbage(self, count):
+        """Pushes the stack up by `count` rows of garbage, each with a hole in the same random column"""
+        width, height = self.layout.matrix_width, self.layout.matrix_height
+        count = min(count, height)
+        matrix = self.matrix
+        # Whatever is pushed past the top is lost, the spawn check in `lock_tetromino` ends the game
+        for y in range(height - count):
+            for x in range(width):
+                matrix[(y, x)] = matrix[(y+count, x)]
+        hole = self.random.randrange(width)
+        garbage = ('block', self.block(GARBAGE_COLOR), GARBAGE_COLOR)
+        for y in range(height - count, height):
+            for x in range(width):
+                matrix[(y, x)] = None if x == hole else garbage
+        self.board_hash = zobrist.board_hash(matrix)
+
+    def state_hash(self):
+        """The Zobrist hash of the board and of the falling tetromino"""
+        y, x = self.tetromino_position
+        return self.board_hash ^ zobrist.piece_key(
+            list_of_tetrominoes.index(self.current_tetromino), self.tetromino_rotation, y, x)
+
+    def save_state(self):
+        """A copy of the game state that `load_state` can go back to"""
+        state = {name: getattr(self, name) for name in self.STATE}
+        state['matrix'] = dict(self.matrix)
+        state['movement_keys'] = dict(self.movement_keys)
+        state['random'] = self.random.getstate()
+        return state
+
+    def load_state(self, state):
+        for name in self.STATE:
+            setattr(self, name, state[name])
+        self.matrix = dict(state['matrix'])
+        self.movement_keys = dict(state['movement_keys'])
+        self.random.setstate(state['random'])
+
+    def remove_lines(self, rows=None):
+        """
+        Clears the full lines among `rows` (all of them by default) and moves everything above them
+        down, in a single pass over the rows above the lowest cleared line.
+        """
+        width = self.layout.matrix_width
+        matrix = self.matrix
+        if rows is None:
+            rows = range(self.layout.matrix_height)
+
+        lines = [y for y in rows
+                 if 0 <= y < self.layout.matrix_height and all(matrix[(y,x)] for x in range(width))]
+        if not lines:
+            return 0
+
+        cleared = set(lines)
+        target = max(lines)
+        # The hash loses the full lines, and every square that moves down moves in it too
+        keys = self.square_keys
+        board_hash = self.board_hash
+        for y in lines:
+            board_hash ^= self.row_keys[y]
+        for y in range(target, -1, -1):
+            if y in cleared:
+                continue
+            if y != target:
+                for x in range(width):
+                    square = matrix[(y,x)]
+                    if square is not None:
+                        board_hash ^= keys[(y,x)] ^ keys[(target,x)]
+                    matrix[(target,x)] = square
+            target -= 1
+        for y in range(target, -1, -1):
+            for x in range(width):
+                matrix[(y,x)] = None
+        self.board_hash = board_hash
 
         return len(lines)
 
@@ -430,154 +695,565 @@ class Matris(object):
                     return False # Blend failed; `shape` at `position` breaks the matrix
 
                 elif shape[y-posY][x-posX]:
-                    copy[(y,x)] = ('shadow', self.shadow_block) if shadow else ('block', self.tetromino_block)
+                    copy[(y,x)] = (('shadow', self.shadow_block, self.current_tetromino.color) if shadow else
+                                    ('block', self.tetromino_block, self.current_tetromino.color))
 
         return copy
 
-    def construct_surface_of_next_tetromino(self):
-        shape = self.next_tetromino.shape
-        surf = Surface((len(shape)*BLOCKSIZE, len(shape)*BLOCKSIZE), pygame.SRCALPHA, 32)
-
-        for y in range(len(shape)):
-            for x in range(len(shape)):
-                if shape[y][x]:
-                    surf.blit(self.block(self.next_tetromino.color), (x*BLOCKSIZE, y*BLOCKSIZE))
-        return surf
-
 class Game(object):
-    def main(self, screen):
+    def __init__(self, layout=None, sim_rate=None, preview=1, practice=None):
+        self.layout = layout or Layout()
+        self.sim_rate = sim_rate # Ticks per second of the simulation thread, None runs everything here
+        self.preview = preview # Number of next tetrominoes shown
+        self.practice = practice # Number of placements that can be taken back, None to play for real
+
+    def main(self, screen, resume=False):
+        """Play a game on `screen`; with `resume`, the saved game goes on and the game is saved on exit"""
         clock = pygame.time.Clock()
-        self.screen = screen
-
-        self.matris = Matris(screen)
-
-        screen.blit(construct_nightmare(screen.get_size()), (0,0))
+        self.start(screen, resume=resume)
 
-        matris_border = Surface((MATRIX_WIDTH*BLOCKSIZE+BORDERWIDTH*2, VISIBLE_MATRIX_HEIGHT*BLOCKSIZE+BORDERWIDTH*2))
-        matris_border.fill(BORDERCOLOR)
-        screen.blit(matris_border, (MATRIS_OFFSET,MATRIS_OFFSET))
-
-        self.redraw()
+        if self.sim_rate:
+            return self.main_threaded(clock)
 
         while True:
             try:
                 timepassed = clock.tick(50)
-                # Always pass the actual timepassed to update, but the game logic only processes it when not paused
-                if self.matris.update(timepassed / 1000.):
-                    self.redraw()
+                self.frame(timepassed)
             except GameOver:
                 return
+            self.wait_while_paused(self.matris)
 
+    async def main_async(self, screen, io, resume=False):
+        """`main` for `tetris --asyncio`, the score is written by a worker of `io`"""
+        budget = FrameBudget(50)
+        self.start(screen, resume=resume)
+        self.matris.score_writer = lambda score: io.submit(write_score, score)
 
-    def redraw(self):
-        # Draw the next tetromino, info panel, and game surface
-        self.blit_next_tetromino(self.matris.surface_of_next_tetromino)
-        self.blit_info()
-        self.matris.draw_surface()
+        while True:
+            timepassed = await budget.tick()
+            try:
+                self.frame(timepassed * 1000)
+            except GameOver:
+                return
 
-        # Draw pause symbol if the game is paused and the timer is within the display duration
-        if self.matris.paused and self.matris.pause_timer < 2.0:  # Show for 2 seconds
-            # Calculate the position within the game area (the subsurface)
-            game_area_width = MATRIX_WIDTH * BLOCKSIZE
-            game_area_height = (MATRIX_HEIGHT-2) * BLOCKSIZE
-
-            # Draw a pause symbol (two vertical bars)
-            bar_width = 15
-            bar_height = 30
-            bar_spacing = 10
-
-            # Create a semi-transparent background for better visibility
-            symbol_width = bar_width * 2 + bar_spacing
-            symbol_height = bar_height
-            bg_surface = Surface((symbol_width + 20, symbol_height + 20), pygame.SRCALPHA)
-            pygame.draw.rect(bg_surface, (0, 0, 0, 180), bg_surface.get_rect())
-            self.matris.surface.blit(bg_surface, bg_surface.get_rect(center=(game_area_width // 2, game_area_height // 2)))
-
-            # Draw the two bars of the pause symbol
-            center_x = game_area_width // 2
-            center_y = game_area_height // 2
-
-            bar_color = (255, 255, 255)
-            left_bar_rect = Rect(center_x - bar_spacing//2 - bar_width, center_y - bar_height//2, bar_width, bar_height)
-            right_bar_rect = Rect(center_x + bar_spacing//2, center_y - bar_height//2, bar_width, bar_height)
-
-            pygame.draw.rect(self.matris.surface, bar_color, left_bar_rect)
-            pygame.draw.rect(self.matris.surface, bar_color, right_bar_rect)
+            timeout = self.idle_timeout(self.matris)
+            if timeout is not None:
+                # Blocking on the events would block the other tasks too, poll for them slowly instead
+                deadline = perf_counter() + timeout / 1000. if timeout else None
+                while deadline is None or perf_counter() < deadline:
+                    events = pygame.event.get()
+                    if events:
+                        # Put back for the next frame (`event.peek` would lose the attributes of posted events)
+                        for event in events:
+                            pygame.event.post(event)
+                        break
+                    await asyncio.sleep(IDLE_POLL)
+
+    def start(self, screen, matris=None, resume=False):
+        """
+        Set up a new game on `screen`, or of `matris` if given, and draw its first frame. With `resume`
+        the new game picks up the saved one, if any, and is saved when its window is closed; only the
+        games played from the menu do, not the ones of the viewer or the benchmarks
+        """
+        self.screen = screen
+        layout = self.layout
+
+        if matris is None:
+            matris = Matris(screen, layout, preview=self.preview)
+            if resume:
+                matris.autosave = savegame.savefile
+                savegame.resume(matris, matris.autosave)
+            if self.practice:
+                global practice_buffer
+                matris.rewind_buffer = practice_buffer = RewindBuffer(self.practice)
+                matris.rewind_buffer.record(matris)
+        self.matris = matris
+        self.ticks = 0
+        self.profiler = frame_profiler if frame_profiler is not None else FrameProfiler()
+        self.profiler_rect = None
+
+        # The static layer, see `tetris.layers`: the background, the frames and the labels, drawn once
+        self.static_layer = get_nightmare(screen.get_size()).copy()
+        self.static_layer.fill(BORDERCOLOR, Rect(MATRIS_OFFSET, MATRIS_OFFSET,
+                                                 layout.board_width+BORDERWIDTH*2, layout.board_height+BORDERWIDTH*2))
+        self.build_preview_panel(len(self.matris.next_tetrominoes))
+        self.build_info_panel()
+        screen.blit(self.static_layer, (0,0))
+        self.redraw()
+        self.broadcast()
+
+    def frame(self, timepassed):
+        """One iteration of the game loop, `timepassed` in milliseconds; raises `GameOver` at the end"""
+        if alloc_tracer:
+            alloc_tracer.begin_frame()
+        self.profiler.start()
+        # Always pass the actual timepassed to update, but the game logic only processes it when not paused
+        try:
+            needs_redraw = self.matris.update(timepassed / 1000.)
+        except GameOver:
+            raise
+        except Exception:
+            self.save_crashed()
+            raise
+        self.profiler.lap('update')
+        self.ticks += 1
+        if needs_redraw:
+            self.broadcast()
+        if needs_redraw or self.profiler.visible or self.profiler_rect:
+            self.redraw()
+        self.profiler.end()
+        if alloc_tracer:
+            alloc_tracer.end_frame()
+
+    def main_threaded(self, clock):
+        """
+        The game logic runs on a `SimulationThread` at `self.sim_rate` ticks per second, this thread
+        (which owns the display) forwards the input and renders the latest snapshot of the board.
+        """
+        # Posted by the simulation to wake this thread up from `wait_while_paused`
+        wake = lambda: pygame.event.post(pygame.event.Event(SIMULATION_WAKE))
+        simulation = SimulationThread(self.matris, self.sim_rate, wake)
+        simulation.start()
+        rendered = None
+        try:
+            while not simulation.finished:
+                clock.tick(50)
+                if alloc_tracer:
+                    alloc_tracer.begin_frame()
+                self.profiler.start()
+                events = pygame.event.get()
+                keys = pygame.key.get_pressed()
+                simulation.push(events, keys[pygame.K_DOWN] or keys[pygame.K_s])
+                self.profiler.lap('update')
+                snapshot = simulation.latest
+                if snapshot is not rendered:
+                    self.broadcast(snapshot)
+                if snapshot is not rendered or self.profiler.visible or self.profiler_rect:
+                    self.redraw(snapshot)
+                    rendered = snapshot
+                self.profiler.end()
+                if alloc_tracer:
+                    alloc_tracer.end_frame()
+                # The latest state, not the one drawn: the events just pushed may have unpaused it
+                self.wait_while_paused(simulation.latest)
+        finally:
+            simulation.stop()
+            simulation.join()
+
+        if simulation.exit_requested:
+            exit()
+        if not isinstance(simulation.error, GameOver):
+            self.save_crashed()
+            raise simulation.error
 
-        pygame.display.flip()
+    def save_crashed(self):
+        """Save the game after an exception in its logic, the crash doesn't lose it"""
+        if self.matris.autosave:
+            savegame.save(self.matris, self.matris.autosave)
 
+    def idle_timeout(self, state):
+        """
+        Milliseconds the game loop can wait for an event while `state` is paused: until the pause
+        symbol has to go, or 0 for as long as it takes. None when the game isn't idle.
+        """
+        if not state.paused or self.profiler.visible:
+            return None
+        remaining = PAUSE_SYMBOL_TIME - state.pause_timer
+        return max(1, int(remaining * 1000 + 1)) if remaining > 0 else 0
+
+    def wait_while_paused(self, state):
+        """Sleep until the next event if `state` is paused, it is put back for the next frame"""
+        timeout = self.idle_timeout(state)
+        if timeout is None:
+            return
+        event = pygame.event.wait(timeout) if timeout else pygame.event.wait()
+        if event.type != pygame.NOEVENT:
+            pygame.event.post(event)
+
+    def broadcast(self, snapshot=None):
+        """Send the board to the spectators, if any; the fan-out happens on the server's own thread"""
+        if spectator_server:
+            spectator_server.publish(snapshot or self.matris.snapshot(self.ticks),
+                                     self.layout.matrix_width, self.layout.matrix_height)
+
+    def redraw(self, snapshot=None, flip=True):
+        # Draw the layers over the static one in order: the board, the next tetrominoes, the info panel
+        # and the overlays, from `snapshot` if given
+        state = snapshot or self.matris
+        profiler = self.profiler
+        self.matris.draw_surface(snapshot)
 
-    def blit_info(self):
+        # Draw pause symbol if the game is paused and the timer is within the display duration
+        if state.paused and state.pause_timer < PAUSE_SYMBOL_TIME:
+            symbol = get_pause_symbol()
+            self.matris.surface.blit(symbol, symbol.get_rect(
+                center=(self.layout.board_width // 2, self.layout.board_height // 2)))
+
+        profiler.lap('draw_surface')
+        self.blit_next_tetrominoes(state.next_tetrominoes)
+        profiler.lap('blit_next_tetromino')
+        self.blit_info(state)
+        profiler.lap('blit_info')
+        self.blit_profiler()
+        profiler.skip()
+
+        if flip:
+            pygame.display.flip()
+        profiler.lap('flip')
+
+    def blit_profiler(self):
+        """Draw the frame-time overlay, or restore the background once it has been hidden"""
+        if self.profiler.visible:
+            # Between the next tetromino and the info panel
+            position = (int(self.layout.tricky_centerx) - OVERLAY_SIZE[0]//2, MATRIS_OFFSET*2 + BLOCKSIZE*5)
+            self.profiler_rect = self.profiler.draw(self.screen, position)
+        elif self.profiler_rect:
+            self.screen.blit(self.static_layer, self.profiler_rect, self.profiler_rect)
+            self.profiler_rect = None
+            # The overlay may have covered the panels too
+            self.preview_layer.invalidate()
+            self.info_layer.invalidate()
+
+
+    def build_info_panel(self):
+        """The frame and labels of the info panel go on the static layer, the values on the info layer"""
         textcolor = (255, 255, 255)
         font = pygame.font.Font(None, 30)
-        width = (WIDTH-(MATRIS_OFFSET+BLOCKSIZE*MATRIX_WIDTH+BORDERWIDTH*2)) - MATRIS_OFFSET*2
+        layout = self.layout
+        static = self.static_layer
+        width = (layout.width-(MATRIS_OFFSET+layout.board_width+BORDERWIDTH*2)) - MATRIS_OFFSET*2
+        self.info_row = row = font.size("0")[1] + BORDERWIDTH*2
+        rect = Rect(0, 0, width, 20 + row*len(INFO_LABELS))
+        rect.bottom, rect.centerx = layout.height-MATRIS_OFFSET, layout.tricky_centerx
+
+        static.fill(BORDERCOLOR, rect)
+        static.fill(BGCOLOR, rect.inflate(-BORDERWIDTH*2, -BORDERWIDTH*2))
+        for index, label in enumerate(INFO_LABELS):
+            static.blit(font.render(label, True, textcolor), (rect.left+BORDERWIDTH+10, rect.top+row*index+BORDERWIDTH+10))
+        self.info_layer = Layer(static, rect)
+        self.info_glyphs = Glyphs(font, "0123456789x", textcolor)
+
+    def blit_info(self, state=None):
+        state = state or self.matris
+        layer = self.info_layer
+        if layer.update((state.level, state.score, state.lines, state.combo)):
+            row, right = self.info_row, layer.rect.width-(BORDERWIDTH+10)
+            level, score, lines, combo = layer.shown
+            for index, value in enumerate((str(level), str(score), str(lines), "x{}".format(combo))):
+                self.info_glyphs.draw(layer.surface, value, right, row*index+BORDERWIDTH+10)
+        layer.compose(self.screen)
+
+
+    def build_preview_panel(self, count):
+        """
+        The frame of the panel of the next `count` tetrominoes is drawn on the static layer, they go on the
+        preview layer. The next tetromino is centered in the top 5x5 square, the others follow below it at a
+        smaller size.
+        """
+        slot = PREVIEW_BLOCKSIZE*4
+        width, height = BLOCKSIZE*5, BLOCKSIZE*5 + slot*(count-1)
+        rect = Rect(0, 0, width, height)
+        rect.top, rect.centerx = MATRIS_OFFSET, self.layout.tricky_centerx
+        self.static_layer.fill(BORDERCOLOR, rect)
+        self.static_layer.fill(BGCOLOR, rect.inflate(-BORDERWIDTH*2, -BORDERWIDTH*2))
+        self.preview_layer = Layer(self.static_layer, rect)
+
+        centerx = width // 2
+        self.preview_slots = [(BLOCKSIZE, centerx, width//2)]
+        for index in range(count-1):
+            self.preview_slots.append((PREVIEW_BLOCKSIZE, centerx, width-BORDERWIDTH + slot*index + slot//2))
+
+    def blit_next_tetrominoes(self, tetrominoes):
+        layer = self.preview_layer
+        if layer.update(tetrominoes):
+            blit = layer.surface.blit
+            for tetromino, (size, centerx, centery) in zip(tetrominoes, self.preview_slots):
+                surf = get_preview(tetromino, size)
+                half = surf.get_width() // 2 # Previews are square
+                blit(surf, (centerx - half, centery - half))
+        layer.compose(self.screen)
+
+class VersusGame(object):
+    """
+    A head-to-head game against another process over `connection`, see `tetris.versus`.
+    `player` is 0 for the host and 1 for the guest; the local board is always drawn on the left.
+    """
+    def __init__(self, layout, connection, seed, player):
+        self.layout = layout
+        self.connection = connection
+        self.seed = seed
+        self.player = player
+
+    def main(self, screen):
+        layout = self.layout
+        width, height = layout.size
+        halves = [screen.subsurface(Rect(width*side, 0, width, height)) for side in range(2)]
+
+        # Both boards get the same seed, so both players get the same pieces
+        self.games = games = []
+        boards = []
+        for player in range(2):
+            half = halves[0 if player == self.player else 1]
+            board = Matris(half, layout, self.seed)
+            board.score_writer = lambda score: None
+            if player != self.player:
+                versus.silence(board)
+            game = Game(layout)
+            game.start(half, board)
+            games.append(game)
+            boards.append(board)
+
+        lockstep = versus.Lockstep(boards, self.player, GameOver)
+        connection = self.connection
+        clock = pygame.time.Clock()
+        held = 0 # Presses of frames the lockstep had to wait on, played with the next tick
 
-        def renderpair(text, val):
-            text = font.render(text, True, textcolor)
-            val = font.render(str(val), True, textcolor)
+        drawn = [None, None] # What each board showed when it was last drawn
+
+        try:
+            while lockstep.result is None:
+                clock.tick(50)
+                events = pygame.event.get()
+                for event in events:
+                    if event.type == pygame.QUIT or event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                        connection.send(versus.QUIT, lockstep.tick)
+                        connection.flush()
+                        if event.type == pygame.QUIT:
+                            exit()
+                        return
+
+                for kind, values in connection.receive():
+                    if kind == versus.INPUT:
+                        lockstep.receive(*values)
+                    elif kind == versus.LOCK:
+                        lockstep.report(values[0], versus.decode_lock(*values[1:]))
+                    elif kind == versus.QUIT:
+                        return self.show_result(screen, "Your opponent left")
+                if connection.closed and lockstep.stalled:
+                    # Play on what was received until then, it may still decide the game
+                    return self.show_result(screen, "Connection lost")
+
+                keys = pygame.key.get_pressed()
+                bits = held | versus.encode_input(events, keys[pygame.K_DOWN] or keys[pygame.K_s])
+                if lockstep.advance(bits):
+                    connection.send(versus.INPUT, lockstep.tick - 1, bits)
+                    held = 0
+                else:
+                    held = bits & ~versus.SOFT_DROP
+                for tick, lock in lockstep.outgoing_locks():
+                    connection.send(versus.LOCK, tick, *versus.encode_lock(lock))
+                connection.flush()
+
+                # Only the boards that changed are drawn again, then both go to the display at once
+                changed = False
+                for index, (game, board) in enumerate(zip(games, boards)):
+                    shown = (board.state_hash(), board.next_tetrominoes, board.score, board.level, board.lines,
+                             board.combo)
+                    if shown != drawn[index]:
+                        game.redraw(flip=False)
+                        drawn[index] = shown
+                        changed = True
+                if changed:
+                    pygame.display.flip()
+        except versus.DesyncError:
+            # The boards don't match anymore, or the peer sent something that isn't a message
+            return self.show_result(screen, "Out of sync")
+
+        result = lockstep.result
+        self.show_result(screen, "Draw" if result == versus.DRAW else
+                                 "You win!" if result == self.player else "You lose")
+
+    def show_result(self, screen, text):
+        """Shows `text` over both boards until a key is pressed"""
+        font = pygame.font.Font(None, 70)
+        text = font.render(text, True, (255, 255, 255))
+        box = text.get_rect(center=screen.get_rect().center).inflate(40, 30)
+        screen.fill(BORDERCOLOR, box)
+        screen.fill(BGCOLOR, box.inflate(-BORDERWIDTH, -BORDERWIDTH))
+        screen.blit(text, text.get_rect(center=box.center))
+        pygame.display.flip()
+        while True:
+            event = pygame.event.wait()
+            if event.type == pygame.QUIT:
+                exit()
+            if event.type == pygame.KEYDOWN:
+                return
 
-            surf = Surface((width, text.get_rect().height + BORDERWIDTH*2), pygame.SRCALPHA, 32)
 
-            surf.blit(text, text.get_rect(top=BORDERWIDTH+10, left=BORDERWIDTH+10))
-            surf.blit(val, val.get_rect(top=BORDERWIDTH+10, right=width-(BORDERWIDTH+10)))
-            return surf
+class OptionsScreen(object):
+    """The sound options: what `Menu.show_options` shows, and how it reacts to the mouse and keys"""
+    def __init__(self, screen):
+        self.screen = screen
+        self.nightmare = get_nightmare(screen.get_size())
+        self.width = WIDTH = screen.get_width()
 
-        scoresurf = renderpair("Score", self.matris.score)
-        levelsurf = renderpair("Level", self.matris.level)
-        linessurf = renderpair("Lines", self.matris.lines)
-        combosurf = renderpair("Combo", "x{}".format(self.matris.combo))
+        # Font setup
+        self.title_font = pygame.font.Font(None, 70)
+        self.option_font = pygame.font.Font(None, 50)
 
-        height = 20 + (levelsurf.get_rect().height +
-                       scoresurf.get_rect().height +
-                       linessurf.get_rect().height +
-                       combosurf.get_rect().height )
+        # UI element positions
+        self.title_y = 100
+        self.mute_y = mute_y = 200
+        self.volume_y = volume_y = 300
+        back_y = 400
 
-        area = Surface((width, height))
-        area.fill(BORDERCOLOR)
-        area.fill(BGCOLOR, Rect(BORDERWIDTH, BORDERWIDTH, width-BORDERWIDTH*2, height-BORDERWIDTH*2))
+        # Slider properties
+        self.slider_x = WIDTH // 2 - 100
+        self.slider_width = 200
+        self.slider_height = 20
+        self.slider_knob_radius = 10
 
-        area.blit(levelsurf, (0,0))
-        area.blit(scoresurf, (0, levelsurf.get_rect().height))
-        area.blit(linessurf, (0, levelsurf.get_rect().height + scoresurf.get_rect().height))
-        area.blit(combosurf, (0, levelsurf.get_rect().height + scoresurf.get_rect().height + linessurf.get_rect().height))
+        # Checkbox properties
+        self.checkbox_size = 30
+        self.checkbox_x = WIDTH // 2 - 100
+        self.checkbox_y = mute_y - self.checkbox_size // 2
 
-        self.screen.blit(area, area.get_rect(bottom=HEIGHT-MATRIS_OFFSET, centerx=TRICKY_CENTERX))
+        # Button properties
+        button_width = 200
+        button_height = 50
 
+        self.checkbox_rect = pygame.Rect(self.checkbox_x, self.checkbox_y, self.checkbox_size, self.checkbox_size)
+        self.slider_rect = pygame.Rect(self.slider_x, volume_y - self.slider_height // 2, self.slider_width, self.slider_height)
+        self.back_button_rect = pygame.Rect(WIDTH // 2 - button_width // 2, back_y - button_height // 2, button_width, button_height)
 
-    def blit_next_tetromino(self, tetromino_surf):
-        area = Surface((BLOCKSIZE*5, BLOCKSIZE*5))
-        area.fill(BORDERCOLOR)
-        area.fill(BGCOLOR, Rect(BORDERWIDTH, BORDERWIDTH, BLOCKSIZE*5-BORDERWIDTH*2, BLOCKSIZE*5-BORDERWIDTH*2))
+        # Mouse state
+        self.mouse_pressed = False
 
-        areasize = area.get_size()[0]
-        tetromino_surf_size = tetromino_surf.get_size()[0]
-        # ^^ I'm assuming width and height are the same
+    def update(self, events, mouse):
+        """Handle the events of a frame, returns True when it's time to go back to the main menu"""
+        mouse_x, mouse_y = mouse
 
-        center = areasize/2 - tetromino_surf_size/2
-        area.blit(tetromino_surf, (center, center))
+        # Handle events
+        for event in events:
+            if event.type == pygame.QUIT:
+                exit()
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    return True
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                if event.button == 1:  # Left mouse button
+                    self.mouse_pressed = True
+            elif event.type == pygame.MOUSEBUTTONUP:
+                if event.button == 1:  # Left mouse button
+                    self.mouse_pressed = False
+
+        # Handle mute/unmute checkbox
+        if self.mouse_pressed and self.checkbox_rect.collidepoint(mouse_x, mouse_y):
+            sound_manager.toggle_sound()
+            # Play sound effect for checkbox toggle
+            try:
+                select_sound = get_sound("select.wav")
+                sound_manager.play_sound(select_sound)
+            except:
+                pass
+            self.mouse_pressed = False  # Prevent continuous toggling
+
+        # Handle volume slider
+        if self.mouse_pressed and self.slider_rect.collidepoint(mouse_x, mouse_y):
+            # Calculate new volume based on mouse position
+            relative_x = max(0, min(self.slider_width, mouse_x - self.slider_x))
+            new_volume = relative_x / self.slider_width
+            sound_manager.sound_volume = new_volume
+            if not sound_manager.sound_muted:
+                pygame.mixer.music.set_volume(new_volume)
+
+        # Handle back button
+        if (self.mouse_pressed and self.back_button_rect.collidepoint(mouse_x, mouse_y)) or \
+           any(event.type == pygame.KEYDOWN and (event.key == pygame.K_RETURN or event.key == pygame.K_SPACE) for event in events):
+            # Play sound effect for back button
+            try:
+                select_sound = get_sound("select.wav")
+                sound_manager.play_sound(select_sound)
+            except:
+                pass
+            return True
+        return False
+
+    def draw(self, mouse):
+        """Draw the options screen, without flipping it to the display"""
+        screen = self.screen
+        WIDTH = self.width
+        option_font = self.option_font
+        checkbox_x, checkbox_y = self.checkbox_x, self.checkbox_y
+        slider_x, slider_width, slider_height = self.slider_x, self.slider_width, self.slider_height
+        volume_y = self.volume_y
+        back_button_rect = self.back_button_rect
+
+        # Draw background
+        screen.blit(self.nightmare, (0, 0))
+
+        # Draw title
+        title = self.title_font.render("OPTIONS", True, (255, 255, 255))
+        screen.blit(title, title.get_rect(centerx=WIDTH // 2, top=self.title_y))
+
+        # Draw mute/unmute checkbox
+        pygame.draw.rect(screen, (255, 255, 255), self.checkbox_rect, 2)
+        if sound_manager.sound_muted:
+            # Draw checkmark
+            pygame.draw.line(screen, (255, 255, 255),
+                            (checkbox_x + 5, checkbox_y + 15),
+                            (checkbox_x + 12, checkbox_y + 22), 3)
+            pygame.draw.line(screen, (255, 255, 255),
+                            (checkbox_x + 12, checkbox_y + 22),
+                            (checkbox_x + 25, checkbox_y + 8), 3)
+
+        # Draw mute label
+        mute_text = option_font.render("Mute Sound", True, (255, 255, 255))
+        screen.blit(mute_text, (checkbox_x + self.checkbox_size + 10, self.mute_y - mute_text.get_height() // 2))
+
+        # Draw volume label
+        volume_label = option_font.render("Volume", True, (255, 255, 255))
+        screen.blit(volume_label, volume_label.get_rect(centerx=WIDTH // 2, centery=volume_y - 40))
+
+        # Draw volume slider
+        pygame.draw.rect(screen, (100, 100, 100), self.slider_rect)
+        pygame.draw.rect(screen, (255, 255, 255), self.slider_rect, 2)
+
+        # Draw slider fill
+        fill_width = int(slider_width * sound_manager.sound_volume)
+        if fill_width > 0:
+            fill_rect = pygame.Rect(slider_x, volume_y - slider_height // 2, fill_width, slider_height)
+            pygame.draw.rect(screen, (40, 200, 40), fill_rect)
+
+        # Draw slider knob
+        knob_x = slider_x + int(slider_width * sound_manager.sound_volume)
+        knob_y = volume_y
+        pygame.draw.circle(screen, (255, 255, 255), (knob_x, knob_y), self.slider_knob_radius)
+        pygame.draw.circle(screen, (40, 200, 40), (knob_x, knob_y), self.slider_knob_radius - 2)
+
+        # Draw volume percentage
+        volume_text = option_font.render(f"{int(sound_manager.sound_volume * 100)}%", True, (255, 255, 255))
+        screen.blit(volume_text, volume_text.get_rect(centerx=WIDTH // 2, centery=volume_y + 40))
+
+        # Draw back button
+        back_color = (40, 200, 40) if back_button_rect.collidepoint(*mouse) else (100, 100, 100)
+        pygame.draw.rect(screen, back_color, back_button_rect, border_radius=10)
+        pygame.draw.rect(screen, (255, 255, 255), back_button_rect, 2, border_radius=10)
+        back_text = option_font.render("BACK", True, (255, 255, 255))
+        screen.blit(back_text, back_text.get_rect(center=back_button_rect.center))
 
-        self.screen.blit(area, area.get_rect(top=MATRIS_OFFSET, centerx=TRICKY_CENTERX))
 
 class Menu(object):
     running = True
-    def main(self, screen):
+    def __init__(self, layout=None, **game_options):
+        self.layout = layout or Layout()
+        self.game_options = game_options # Passed on to every `Game`
+
+    def main(self, screen, startup=None):
         clock = pygame.time.Clock()
+        width, height = screen.get_size()
 
-        # Create main menu
-        menu = kezmenu.KezMenu(
-            ['Play!', lambda: self.start_game(screen)],
-            ['Options', lambda: self.show_options(screen)],
-            ['High Scores', lambda: self.show_high_scores(screen)],
-            ['Quit', lambda: setattr(self, 'running', False)],
-        )
-        menu.position = (50, 50)
-        # Set a larger base font size
-        menu.font = pygame.font.Font(None, 60)
-        menu.color = (255,255,255)
-        menu.focus_color = (40, 200, 40)
+        menu = self.build_menu(screen)
+
+        if startup:
+            startup.mark("build menu")
 
-        nightmare = construct_nightmare(screen.get_size())
+        nightmare = get_nightmare(screen.get_size())
+        if startup:
+            startup.mark("menu background")
         highscoresurf = self.construct_highscoresurf()
+        if startup:
+            startup.mark("highscore")
 
         timepassed = clock.tick(30) / 1000.
 
@@ -590,16 +1266,86 @@ class Menu(object):
 
             menu.update(events, timepassed)
 
-            timepassed = clock.tick(30) / 1000.
+            # Don't wait for the frame rate limit before the very first frame
+            timepassed = clock.tick(30 if startup is None else 0) / 1000.
 
             if timepassed > 1: # A game has most likely been played
                 highscoresurf = self.construct_highscoresurf()
 
-            screen.blit(nightmare, (0,0))
-            screen.blit(highscoresurf, highscoresurf.get_rect(right=WIDTH-50, bottom=HEIGHT-50))
-            menu.draw(screen)
+            self.draw(screen, menu, nightmare, highscoresurf)
+            pygame.display.flip()
+
+            if startup:
+                # Load what isn't needed on the first frame now that it is on screen
+                startup.first_frame_shown()
+                startup = None
+
+    async def main_async(self, screen, io, startup=None):
+        """
+        `main` for `tetris --asyncio`: every frame yields to the event loop for the rest of its
+        budget, and the score file is read by a worker of `io` after each game.
+        """
+        budget = FrameBudget(30)
+        width, height = screen.get_size()
+        play_requested = []
+
+        menu = self.build_menu(screen, play=lambda: play_requested.append(True))
+        nightmare = get_nightmare(screen.get_size())
+        highscoresurf = self.construct_highscoresurf(await io.run(load_score))
+        if startup:
+            startup.mark("build menu")
+
+        timepassed = 0
+        while self.running:
+            events = pygame.event.get()
+
+            for event in events:
+                if event.type == pygame.QUIT:
+                    exit()
+
+            menu.update(events, timepassed)
+
+            if play_requested:
+                del play_requested[:]
+                get_sound("start.wav").play()
+                await Game(self.layout, **self.game_options).main_async(screen, io, resume=True)
+                await io.drain() # The score of the game may still be on its way to the file
+                highscoresurf = self.construct_highscoresurf(await io.run(load_score))
+                budget.reset()
+
+            self.draw(screen, menu, nightmare, highscoresurf)
             pygame.display.flip()
 
+            if startup:
+                startup.first_frame_shown()
+                startup = None
+
+            timepassed = await budget.tick()
+
+        await io.drain()
+
+    def draw(self, screen, menu, nightmare, highscoresurf):
+        """Draw a frame of the main menu, without flipping it to the display"""
+        width, height = screen.get_size()
+        screen.blit(nightmare, (0,0))
+        screen.blit(highscoresurf, highscoresurf.get_rect(right=width-50, bottom=height-50))
+        menu.draw(screen)
+
+    def build_menu(self, screen, play=None):
+        # Create main menu
+        menu = kezmenu.KezMenu(
+            ['Play!', play or (lambda: self.start_game(screen))],
+            ['Options', lambda: self.show_options(screen)],
+            ['High Scores', lambda: self.show_high_scores(screen)],
+            ['Quit', lambda: setattr(self, 'running', False)],
+        )
+        menu.position = (50, 50)
+        # Set a larger base font size
+        menu.font = pygame.font.Font(None, 60)
+        menu.color = (255,255,255)
+        menu.focus_color = (40, 200, 40)
+        return menu
+
     def start_game(self, screen):
         """Start the game and play the start sound"""
         # Play start sound
@@ -608,7 +1354,7 @@ class Menu(object):
             start_sound.play()
         except:
             pass  # If sound fails, continue anyway
-        Game().main(screen)
+        Game(self.layout, **self.game_options).main(screen, resume=True)
 
     def show_options(self, screen):
         """Show the options menu with custom UI elements"""
@@ -622,143 +1368,15 @@ class Menu(object):
             pass  # If sound fails, continue anyway
 
         clock = pygame.time.Clock()
-        nightmare = construct_nightmare(screen.get_size())
-
-        # Font setup
-        title_font = pygame.font.Font(None, 70)
-        option_font = pygame.font.Font(None, 50)
-
-        # UI element positions
-        title_y = 100
-        mute_y = 200
-        volume_y = 300
-        back_y = 400
-
-        # Slider properties
-        slider_x = WIDTH // 2 - 100
-        slider_width = 200
-        slider_height = 20
-        slider_knob_radius = 10
-
-        # Checkbox properties
-        checkbox_size = 30
-        checkbox_x = WIDTH // 2 - 100
-        checkbox_y = mute_y - checkbox_size // 2
-
-        # Button properties
-        button_width = 200
-        button_height = 50
-
-        # Mouse state
-        mouse_pressed = False
+        options = OptionsScreen(screen)
 
         while True:
             events = pygame.event.get()
-
-            # Handle events
-            for event in events:
-                if event.type == pygame.QUIT:
-                    exit()
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        return  # Return to main menu
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    if event.button == 1:  # Left mouse button
-                        mouse_pressed = True
-                elif event.type == pygame.MOUSEBUTTONUP:
-                    if event.button == 1:  # Left mouse button
-                        mouse_pressed = False
-
-            # Get mouse position
-            mouse_x, mouse_y = pygame.mouse.get_pos()
-
-            # Handle mute/unmute checkbox
-            checkbox_rect = pygame.Rect(checkbox_x, checkbox_y, checkbox_size, checkbox_size)
-            if mouse_pressed and checkbox_rect.collidepoint(mouse_x, mouse_y):
-                sound_manager.toggle_sound()
-                # Play sound effect for checkbox toggle
-                try:
-                    select_sound = get_sound("select.wav")
-                    sound_manager.play_sound(select_sound)
-                except:
-                    pass
-                mouse_pressed = False  # Prevent continuous toggling
-
-            # Handle volume slider
-            slider_rect = pygame.Rect(slider_x, volume_y - slider_height // 2, slider_width, slider_height)
-            if mouse_pressed and slider_rect.collidepoint(mouse_x, mouse_y):
-                # Calculate new volume based on mouse position
-                relative_x = max(0, min(slider_width, mouse_x - slider_x))
-                new_volume = relative_x / slider_width
-                sound_manager.sound_volume = new_volume
-                if not sound_manager.sound_muted:
-                    pygame.mixer.music.set_volume(new_volume)
-
-            # Handle back button
-            back_button_rect = pygame.Rect(WIDTH // 2 - button_width // 2, back_y - button_height // 2, button_width, button_height)
-            if (mouse_pressed and back_button_rect.collidepoint(mouse_x, mouse_y)) or \
-               any(event.type == pygame.KEYDOWN and (event.key == pygame.K_RETURN or event.key == pygame.K_SPACE) for event in events):
-                # Play sound effect for back button
-                try:
-                    select_sound = get_sound("select.wav")
-                    sound_manager.play_sound(select_sound)
-                except:
-                    pass
+            mouse = pygame.mouse.get_pos()
+            if options.update(events, mouse):
                 return  # Return to main menu
 
-            # Draw background
-            screen.blit(nightmare, (0, 0))
-
-            # Draw title
-            title = title_font.render("OPTIONS", True, (255, 255, 255))
-            screen.blit(title, title.get_rect(centerx=WIDTH // 2, top=title_y))
-
-            # Draw mute/unmute checkbox
-            pygame.draw.rect(screen, (255, 255, 255), checkbox_rect, 2)
-            if sound_manager.sound_muted:
-                # Draw checkmark
-                pygame.draw.line(screen, (255, 255, 255),
-                                (checkbox_x + 5, checkbox_y + 15),
-                                (checkbox_x + 12, checkbox_y + 22), 3)
-                pygame.draw.line(screen, (255, 255, 255),
-                                (checkbox_x + 12, checkbox_y + 22),
-                                (checkbox_x + 25, checkbox_y + 8), 3)
-
-            # Draw mute label
-            mute_text = option_font.render("Mute Sound", True, (255, 255, 255))
-            screen.blit(mute_text, (checkbox_x + checkbox_size + 10, mute_y - mute_text.get_height() // 2))
-
-            # Draw volume label
-            volume_label = option_font.render("Volume", True, (255, 255, 255))
-            screen.blit(volume_label, volume_label.get_rect(centerx=WIDTH // 2, centery=volume_y - 40))
-
-            # Draw volume slider
-            pygame.draw.rect(screen, (100, 100, 100), slider_rect)
-            pygame.draw.rect(screen, (255, 255, 255), slider_rect, 2)
-
-            # Draw slider fill
-            fill_width = int(slider_width * sound_manager.sound_volume)
-            if fill_width > 0:
-                fill_rect = pygame.Rect(slider_x, volume_y - slider_height // 2, fill_width, slider_height)
-                pygame.draw.rect(screen, (40, 200, 40), fill_rect)
-
-            # Draw slider knob
-            knob_x = slider_x + int(slider_width * sound_manager.sound_volume)
-            knob_y = volume_y
-            pygame.draw.circle(screen, (255, 255, 255), (knob_x, knob_y), slider_knob_radius)
-            pygame.draw.circle(screen, (40, 200, 40), (knob_x, knob_y), slider_knob_radius - 2)
-
-            # Draw volume percentage
-            volume_text = option_font.render(f"{int(sound_manager.sound_volume * 100)}%", True, (255, 255, 255))
-            screen.blit(volume_text, volume_text.get_rect(centerx=WIDTH // 2, centery=volume_y + 40))
-
-            # Draw back button
-            back_color = (40, 200, 40) if back_button_rect.collidepoint(mouse_x, mouse_y) else (100, 100, 100)
-            pygame.draw.rect(screen, back_color, back_button_rect, border_radius=10)
-            pygame.draw.rect(screen, (255, 255, 255), back_button_rect, 2, border_radius=10)
-            back_text = option_font.render("BACK", True, (255, 255, 255))
-            screen.blit(back_text, back_text.get_rect(center=back_button_rect.center))
-
+            options.draw(mouse)
             pygame.display.flip()
             clock.tick(30)
 
@@ -792,9 +1410,10 @@ class Menu(object):
         except:
             pass
 
-    def construct_highscoresurf(self):
+    def construct_highscoresurf(self, highscore=None):
         font = pygame.font.Font(None, 50)
-        highscore = load_score()
+        if highscore is None:
+            highscore = load_score()
         text = "Highscore: {}".format(highscore)
         return font.render(text, True, (255,255,255))
 
@@ -810,16 +1429,29 @@ class Menu(object):
             pass  # If sound fails, continue anyway
 
         clock = pygame.time.Clock()
+        WIDTH, HEIGHT = screen.get_size()
 
         # Load high scores
         from .scores import load_high_scores
-        highscores = load_high_scores(5)  # Load top 5 scores
+        highscores = load_high_scores(None)  # The whole history, in a scrolling list
 
         # Fonts
         font_large = pygame.font.Font(None, 70)
         font_medium = pygame.font.Font(None, 50)
         font_small = pygame.font.Font(None, 40)
 
+        # No menu without scores, it would pick the first of none on Enter
+        scores_menu = None
+        if highscores:
+            scores_menu = kezmenu.KezMenu(*[[f"{i+1}. {score}", lambda: None] for i, score in enumerate(highscores)])
+            scores_menu.font = font_medium
+            scores_menu.color = (255, 255, 255)
+            scores_menu.focus_color = (40, 200, 40)
+            scores_menu.setViewport(max(1, (HEIGHT - 310) // font_medium.get_height()))
+            # Centered on the widest entry, not on the visible ones, so the list doesn't shift while scrolling
+            widest = max(font_medium.size(option['label'])[0] for option in scores_menu.options)
+            scores_menu.position = (WIDTH // 2 - widest // 2, 150)
+
         # Title
         title = font_large.render("HIGH SCORES", True, (255, 255, 255))
 
@@ -828,7 +1460,7 @@ class Menu(object):
         button_height = 50
         back_button_rect = pygame.Rect(WIDTH // 2 - button_width // 2, HEIGHT - 100, button_width, button_height)
 
-        nightmare = construct_nightmare(screen.get_size())
+        nightmare = get_nightmare(screen.get_size())
 
         while True:
             events = pygame.event.get()
@@ -857,6 +1489,9 @@ class Menu(object):
                                 pass
                             return  # Return to main menu
 
+            if scores_menu:
+                scores_menu.update(events)
+
             # Draw background
             screen.blit(nightmare, (0, 0))
 
@@ -864,10 +1499,8 @@ class Menu(object):
             screen.blit(title, title.get_rect(centerx=WIDTH/2, top=50))
 
             # Draw high scores
-            if highscores:
-                for i, score in enumerate(highscores):
-                    score_text = font_medium.render(f"{i+1}. {score}", True, (255, 255, 255))
-                    screen.blit(score_text, score_text.get_rect(centerx=WIDTH/2, top=150 + i*60))
+            if scores_menu:
+                scores_menu.draw(screen)
             else:
                 no_scores_text = font_medium.render("No scores yet!", True, (255, 255, 255))
                 screen.blit(no_scores_text, no_scores_text.get_rect(centerx=WIDTH/2, top=150))
@@ -898,23 +1531,108 @@ class Menu(object):
             pass
 
 
+def get_block(color, shadow=False, size=BLOCKSIZE):
+    """Returns one of the cached random textures of a `color` block of `size` pixels"""
+    variants = _block_cache.setdefault((color, shadow, size), [])
+    if len(variants) < BLOCK_VARIANTS:
+        variants.append(construct_block(color, shadow, size))
+        return variants[-1]
+    return random.choice(variants)
+
+
+def construct_block(color, shadow=False, size=BLOCKSIZE):
+    colors = {'blue':   (105, 105, 255),
+              'yellow': (225, 242, 41),
+              'pink':   (242, 41, 195),
+              'green':  (22, 181, 64),
+              'red':    (204, 22, 22),
+              'orange': (245, 144, 12),
+              'cyan':   (10, 255, 226),
+              'grey':   (128, 128, 128)} # Garbage lines
+
+
+    if shadow:
+        end = [90] # end is the alpha value
+    else:
+        end = [] # Adding this to the end will not change the array, thus no alpha value
+
+    border = Surface((size, size), pygame.SRCALPHA, 32)
+    border.fill(list(map(lambda c: c*0.5, colors[color])) + end)
+
+    borderwidth = min(2, size // 8) # Thinner borders for the tiny blocks of large boards
+
+    box = Surface((size-borderwidth*2, size-borderwidth*2), pygame.SRCALPHA, 32)
+    boxarr = pygame.PixelArray(box)
+    for x in range(len(boxarr)):
+        for y in range(len(boxarr)):
+            boxarr[x][y] = tuple(list(map(lambda c: min(255, int(c*random.uniform(0.8, 1.2))), colors[color])) + end)
+
+    del boxarr # deleting boxarr or else the box surface will be 'locked' or something like that and won't blit.
+    border.blit(box, Rect(borderwidth, borderwidth, 0, 0))
+
+
+    return border
+
+
+def get_preview(tetromino, size=BLOCKSIZE):
+    """The pre-rendered preview of `tetromino`, built once per tetromino and block size"""
+    key = (tetromino.name, size)
+    if key not in _preview_cache:
+        _preview_cache[key] = construct_preview(tetromino, size)
+    return _preview_cache[key]
+
+
+def construct_preview(tetromino, size=BLOCKSIZE):
+    shape = tetromino.shape
+    surf = Surface((len(shape)*size, len(shape)*size), pygame.SRCALPHA, 32)
+
+    # The side panel keeps its own block sizes, whatever the size of the board
+    for y in range(len(shape)):
+        for x in range(len(shape)):
+            if shape[y][x]:
+                surf.blit(get_block(tetromino.color, size=size), (x*size, y*size))
+    return surf
+
+
+def get_pause_symbol():
+    """Returns the cached pause symbol: two white bars on a semi-transparent background"""
+    global _pause_symbol
+    if _pause_symbol is None:
+        bar_width = 15
+        bar_height = 30
+        bar_spacing = 10
+        symbol = Surface((bar_width * 2 + bar_spacing + 20, bar_height + 20), pygame.SRCALPHA)
+        symbol.fill((0, 0, 0, 180))
+        center_x, center_y = symbol.get_rect().center
+        bar_color = (255, 255, 255)
+        symbol.fill(bar_color, Rect(center_x - bar_spacing//2 - bar_width, center_y - bar_height//2, bar_width, bar_height))
+        symbol.fill(bar_color, Rect(center_x + bar_spacing//2, center_y - bar_height//2, bar_width, bar_height))
+        _pause_symbol = symbol
+    return _pause_symbol
+
+
+def get_nightmare(size):
+    """Returns the cached background for a screen of `size`"""
+    try:
+        return _nightmare_cache[size]
+    except KeyError:
+        return _nightmare_cache.setdefault(size, construct_nightmare(size))
+
+
 def construct_nightmare(size):
     surf = Surface(size)
 
     boxsize = 8
     bordersize = 1
     vals = '1235' # only the lower values, for darker colors and greater fear
-    arr = pygame.PixelArray(surf)
-    for x in range(0, len(arr), boxsize):
-        for y in range(0, len(arr[x]), boxsize):
-
-            color = int(''.join([random.choice(vals) + random.choice(vals) for _ in range(3)]), 16)
-
-            for LX in range(x, x+(boxsize - bordersize)):
-                for LY in range(y, y+(boxsize - bordersize)):
-                    if LX < len(arr) and LY < len(arr[x]):
-                        arr[LX][LY] = color
-    del arr
+    channel_values = [int(a+b, 16) for a in vals for b in vals]
+    choice = random.choice
+    width, height = size
+    for x in range(0, width, boxsize):
+        for y in range(0, height, boxsize):
+            color = (choice(channel_values), choice(channel_values), choice(channel_values))
+            # `fill` clips the boxes on the right and bottom edges for us
+            surf.fill(color, (x, y, boxsize - bordersize, boxsize - bordersize))
     return surf
 
 
@@ -947,19 +1665,243 @@ class SoundManager:
                 pass
 
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="tetris", description="A classic Tetris game")
+    parser.add_argument("--profile", action="store_true",
+                        help="show the frame-time profiler overlay from the start (toggle with F3)")
+    parser.add_argument("--profile-csv", metavar="FILE",
+                        help="dump the frame-time ring buffer to FILE on exit")
+    parser.add_argument("--trace-alloc", action="store_true",
+                        help="trace the allocations of every game frame with tracemalloc")
+    parser.add_argument("--alloc-budget", type=int, default=0, metavar="BYTES",
+                        help="flag traced frames allocating more than BYTES (default: 0)")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print the time spent in every startup phase")
+    parser.add_argument("--board", default="{}x{}".format(MATRIX_WIDTH, VISIBLE_MATRIX_HEIGHT), metavar="WxH",
+                        help="board size in blocks, from the classic 10x20 up to 100x200 stress boards")
+    display = parser.add_mutually_exclusive_group()
+    display.add_argument("--blocksize", type=int, metavar="PIXELS",
+                         help="size of a block on the board (default: {} or less to fit large boards)".format(BLOCKSIZE))
+    display.add_argument("--window", metavar="WxH",
+                         help="draw the board with the largest blocks that fit in a WxH pixels window")
+    display.add_argument("--scale", action="store_true",
+                         help="draw at the normal size and scale to a resizable window when presenting")
+    display.add_argument("--fullscreen", action="store_true",
+                         help="like --scale, to the whole screen")
+    parser.add_argument("--practice", type=int, nargs='?', const=DEFAULT_PLACEMENTS, metavar="N",
+                        help="practice mode: backspace takes back the last N placements (default: {}), "
+                             "and topping out goes back one".format(DEFAULT_PLACEMENTS))
+    parser.add_argument("--preview", type=int, default=1, choices=range(1, MAX_PREVIEW+1), metavar="N",
+                        help="number of next tetrominoes shown, 1 to {} (default: 1)".format(MAX_PREVIEW))
+    loops = parser.add_mutually_exclusive_group()
+    loops.add_argument("--sim-thread", action="store_true",
+                       help="run the game logic on its own thread, independent of the rendering")
+    loops.add_argument("--asyncio", action="store_true",
+                       help="drive the menu and game loops from asyncio, with file I/O on worker threads")
+    parser.add_argument("--tick-rate", type=int, default=100, metavar="HZ",
+                        help="ticks per second of the simulation thread (default: 100)")
+    opponent = parser.add_mutually_exclusive_group()
+    opponent.add_argument("--versus-host", type=int, metavar="PORT",
+                          help="wait for an opponent on localhost:PORT and play a versus game")
+    opponent.add_argument("--versus-join", metavar="[HOST:]PORT",
+                          help="join the versus game hosted at HOST:PORT (default host: localhost)")
+    parser.add_argument("--spectate-port", type=int, metavar="PORT",
+                        help="serve the live game to `tetris-spectate` viewers on localhost:PORT")
+    args = parser.parse_args(argv)
+    try:
+        args.layout = Layout.parse(args.board, args.blocksize)
+    except ValueError as error:
+        parser.error("--board: {}".format(error))
+    if args.window:
+        try:
+            window = parse_size(args.window)
+        except ValueError:
+            parser.error("--window: expected WxH in pixels, got {!r}".format(args.window))
+        try:
+            args.layout = Layout.fit(args.layout.matrix_width, args.layout.visible_matrix_height, window)
+        except ValueError as error:
+            parser.error("--window: {}".format(error))
+    if args.versus_join:
+        host, _, port = args.versus_join.rpartition(':')
+        if not port.isdigit():
+            parser.error("--versus-join: expected [HOST:]PORT, got {!r}".format(args.versus_join))
+        args.versus_join = (host or versus.DEFAULT_HOST, int(port))
+    return args
+
+
 def main():
-    global sound_manager
+    global sound_manager, frame_profiler, alloc_tracer, spectator_server
+
+    args = parse_args()
+    startup = Startup(started=STARTED, report=args.startup_report)
+    startup.mark("imports")
 
-    pygame.mixer.pre_init(44100, -16, 2, 512)
-    pygame.init()
+    if args.trace_alloc:
+        alloc_tracer = AllocationTracer(budget=args.alloc_budget)
+        alloc_tracer.start()
+        atexit.register(alloc_tracer.report)
 
-    # Initialize mixer for sound
-    pygame.mixer.init()
+    frame_profiler = FrameProfiler()
+    frame_profiler.visible = args.profile
+    if args.profile_csv:
+        atexit.register(frame_profiler.dump_csv, args.profile_csv)
+
+    if args.spectate_port is not None:
+        spectator_server = SpectatorServer(port=args.spectate_port)
+        try:
+            spectator_server.start()
+        except OSError as error:
+            raise SystemExit("--spectate-port: {}".format(error))
+        atexit.register(spectator_server.stop)
+
+    if args.practice:
+        atexit.register(report_practice)
+
+    # Only what the first menu frame needs, the mixer is started after it is on screen
+    pygame.display.init()
+    pygame.font.init()
+    startup.mark("init display")
 
     # Initialize sound manager
     sound_manager = SoundManager()
 
-    # Load and play background music
+    if args.versus_host is not None or args.versus_join:
+        return play_versus(args)
+
+    screen = pygame.display.set_mode(args.layout.size, display_flags(args))
+    pygame.display.set_caption("TeTris")
+    startup.mark("open window")
+
+    startup.defer("init mixer", init_mixer)
+    startup.defer("background music", play_background_music)
+    menu = Menu(args.layout, sim_rate=args.tick_rate if args.sim_thread else None, preview=args.preview,
+                practice=args.practice)
+
+    if args.asyncio:
+        asyncio.run(main_async(menu, screen, startup, args.layout))
+    else:
+        startup.defer("start preloader", lambda: start_preloader(args.layout))
+        menu.main(screen, startup)
+
+
+def report_practice():
+    if practice_buffer is not None:
+        print(practice_buffer.report(), file=sys.stderr)
+
+
+def display_flags(args):
+    """
+    The flags of `pygame.display.set_mode`: with `pygame.SCALED`, everything is drawn at the size
+    of the layout as usual and SDL stretches the finished frame to the window when presenting it
+    """
+    if args.fullscreen:
+        return pygame.SCALED | pygame.FULLSCREEN
+    if args.scale:
+        return pygame.SCALED | pygame.RESIZABLE
+    return 0
+
+
+def play_versus(args):
+    """Connect to the opponent, then play one versus game, the two boards side by side"""
+    layout = args.layout
+    screen = pygame.display.set_mode((layout.width*2, layout.height), display_flags(args))
+    pygame.display.set_caption("TeTris - versus")
+    init_mixer()
+
+    if args.versus_host is not None:
+        try:
+            listener = versus.listen(args.versus_host)
+        except OSError as error:
+            raise SystemExit("--versus-host: {}".format(error))
+        connection = wait_for(screen, "Waiting for an opponent on port {}".format(args.versus_host),
+                              lambda: versus.Connection.accept(listener))
+        listener.close()
+        seed, player = versus.new_seed(), 0
+        connection.send(versus.HELLO, versus.VERSION, seed)
+        connection.flush()
+    else:
+        connection = wait_for(screen, "Connecting to {}:{}".format(*args.versus_join),
+                              lambda: versus.Connection.connect(*args.versus_join))
+        player = 1
+
+    # The guest gets the seed from the host and sends it back, then both start at tick 0
+    hello = wait_for(screen, "Starting...", connection.next_message)
+    kind, (version, seed) = hello
+    if kind != versus.HELLO or version != versus.VERSION:
+        raise SystemExit("The opponent runs an incompatible version of the game")
+    if player == 1:
+        connection.send(versus.HELLO, versus.VERSION, seed)
+        connection.flush()
+
+    try:
+        VersusGame(layout, connection, seed, player).main(screen)
+    finally:
+        connection.close()
+
+
+def wait_for(screen, text, poll):
+    """Shows `text` until `poll()` returns something, which is returned"""
+    clock = pygame.time.Clock()
+    font = pygame.font.Font(None, 40)
+    background = get_nightmare(screen.get_size())
+    text = font.render(text, True, (255, 255, 255))
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                exit()
+        result = poll()
+        if result is not None:
+            return result
+        screen.blit(background, (0, 0))
+        screen.blit(text, text.get_rect(center=screen.get_rect().center))
+        pygame.display.flip()
+        clock.tick(10)
+
+
+async def main_async(menu, screen, startup, layout):
+    io = BackgroundIO()
+    # The assets are warmed by tasks of the event loop rather than by the preloader thread
+    startup.defer("start preloader", lambda: io.spawn(io.run_in_order(preload_tasks(layout))))
+    await menu.main_async(screen, io, startup)
+
+
+def preload_tasks(layout):
+    """Returns the (priority, name, func) tasks that warm what `Game.main` needs"""
+    tasks = [(0, "highscore", load_score)]
+    tasks += [(1, sound, lambda sound=sound: get_sound(sound)) for sound in GAME_SOUNDS]
+    for tetromino in list_of_tetrominoes:
+        # Board blocks and shadows at the size of the board, the next tetromino at the classic size
+        for shadow, size in {(False, layout.blocksize), (True, layout.blocksize), (False, BLOCKSIZE)}:
+            tasks.append((2, "{} block".format(tetromino.color),
+                          lambda color=tetromino.color, shadow=shadow, size=size: warm_block(color, shadow, size)))
+        for size in (BLOCKSIZE, PREVIEW_BLOCKSIZE):
+            tasks.append((2, "{} preview".format(tetromino.name),
+                          lambda tetromino=tetromino, size=size: get_preview(tetromino, size)))
+    tasks.append((3, "background", lambda: get_nightmare(layout.size)))
+    return tasks
+
+
+def warm_block(color, shadow=False, size=BLOCKSIZE):
+    variants = _block_cache.setdefault((color, shadow, size), [])
+    while len(variants) < BLOCK_VARIANTS:
+        variants.append(construct_block(color, shadow, size))
+
+
+def start_preloader(layout):
+    global asset_preloader
+    asset_preloader = Preloader(preload_tasks(layout))
+    asset_preloader.start()
+
+
+def init_mixer():
+    try:
+        pygame.mixer.init(44100, -16, 2, 512)
+    except pygame.error:
+        # No audio device, get_sound hands out silent sounds
+        pass
+
+
+def play_background_music():
     try:
         background_music = os.path.join(os.path.dirname(__file__), "resources", "sounds", "background.wav")
         pygame.mixer.music.load(background_music)
@@ -969,9 +1911,5 @@ def main():
         # If background music is not found, continue without it
         pass
 
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
-    pygame.display.set_caption("TeTris")
-    Menu().main(screen)
-
 if __name__ == '__main__':
     main()
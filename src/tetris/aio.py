@@ -0,0 +1,73 @@
+"""
+Helpers for the asyncio-driven loops of `tetris --asyncio`.
+
+Every frame does its work and then awaits what is left of its time budget; that is
+when the event loop runs background tasks. Blocking calls (the score file, asset
+loading, exports) are handed to the loop's default executor, so they never take
+time away from a frame.
+"""
+import asyncio
+from time import perf_counter
+
+
+class FrameBudget(object):
+    """Paces a loop at `fps` frames per second, the async counterpart of `pygame.time.Clock.tick`"""
+
+    def __init__(self, fps):
+        self.frame_length = 1. / fps
+        self._frame_start = perf_counter()
+
+    async def tick(self):
+        """Yield to the event loop for the rest of the frame; returns the seconds since the last tick"""
+        remaining = self._frame_start + self.frame_length - perf_counter()
+        # Sleep even when over budget, other tasks must get a turn every frame
+        await asyncio.sleep(max(0., remaining))
+        now = perf_counter()
+        timepassed = now - self._frame_start
+        self._frame_start = now
+        return timepassed
+
+    def reset(self):
+        """Start a new frame now, e.g. when coming back from a nested loop"""
+        self._frame_start = perf_counter()
+
+
+class BackgroundIO(object):
+    """Runs blocking calls in the default executor and keeps track of the fire-and-forget ones"""
+
+    def __init__(self):
+        self.pending = set()
+        self.errors = []
+
+    async def run(self, func, *args):
+        """Run `func(*args)` on a worker thread and return its result"""
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def submit(self, func, *args):
+        """Run `func(*args)` on a worker thread without waiting for it"""
+        return self.spawn(self.run(func, *args))
+
+    def spawn(self, coroutine):
+        """Run `coroutine` as a task of the event loop without waiting for it"""
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self.pending.add(task)
+        task.add_done_callback(self._done)
+        return task
+
+    async def run_in_order(self, tasks):
+        """Run `(priority, name, func)` tasks one after the other, lowest priority first"""
+        for priority, name, func in sorted(tasks, key=lambda task: task[0]):
+            try:
+                await self.run(func)
+            except Exception as error:
+                self.errors.append((name, error))
+
+    async def drain(self):
+        """Wait for every pending call, e.g. before the loop is closed"""
+        while self.pending:
+            await asyncio.wait(list(self.pending))
+
+    def _done(self, task):
+        self.pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.errors.append((task.get_name(), task.exception()))
@@ -0,0 +1,94 @@
+"""
+Per-frame allocation tracking for the game loop, used by `tetris --trace-alloc`.
+
+Every iteration of `Game.main` is wrapped in a pair of `tracemalloc` snapshots.
+For each frame we record:
+
+- the peak of traced memory above the level at the start of the frame, which
+  catches short lived garbage such as the matrix copies made by `Matris.blend`,
+- the blocks and bytes still alive at the end of the frame, grouped by the line
+  that allocated them.
+
+Only memory allocated through Python is traced: the pixels of a `Surface` live in
+SDL, but the `Surface` and `Font` objects wrapping them do show up.
+"""
+import collections
+import linecache
+import sys
+import tracemalloc
+
+DEFAULT_BUDGET = 0 # Bytes per frame; the goal is a loop that allocates nothing
+
+# Don't blame the tracer for what it allocates itself
+IGNORED_FILES = (tracemalloc.__file__, __file__, linecache.__file__, "<frozen importlib._bootstrap>",
+                 "<frozen importlib._bootstrap_external>", "<unknown>")
+
+
+class AllocationTracer(object):
+    """Snapshots `tracemalloc` around every frame and flags frames above the budget"""
+
+    def __init__(self, budget=DEFAULT_BUDGET, warmup=50, top=3, out=sys.stderr):
+        self.budget = budget
+        self.warmup = warmup # Frames that fill caches, they are neither flagged nor counted
+        self.top = top
+        self.out = out
+        self.frame_number = 0
+        self.frames_over_budget = 0
+        self.peaks = []
+        self.sites = collections.Counter() # (filename, lineno) -> bytes retained over all frames
+        self.site_blocks = collections.Counter()
+        self._filters = [tracemalloc.Filter(False, filename) for filename in IGNORED_FILES]
+        self._before = None
+        self._start_memory = 0
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def begin_frame(self):
+        self._before = tracemalloc.take_snapshot().filter_traces(self._filters)
+        tracemalloc.reset_peak()
+        self._start_memory = tracemalloc.get_traced_memory()[0]
+
+    def end_frame(self):
+        peak = tracemalloc.get_traced_memory()[1] - self._start_memory
+        after = tracemalloc.take_snapshot().filter_traces(self._filters)
+        stats = [stat for stat in after.compare_to(self._before, 'lineno') if stat.size_diff > 0]
+        self._before = None
+
+        self.frame_number += 1
+        if self.frame_number <= self.warmup:
+            return
+
+        retained = sum(stat.size_diff for stat in stats)
+        self.peaks.append(peak)
+        for stat in stats:
+            frame = stat.traceback[0]
+            self.sites[(frame.filename, frame.lineno)] += stat.size_diff
+            self.site_blocks[(frame.filename, frame.lineno)] += max(stat.count_diff, 0)
+
+        if max(peak, retained) > self.budget:
+            self.frames_over_budget += 1
+            print("frame {}: peak +{} B, retained +{} B (budget {} B)".format(
+                self.frame_number, peak, retained, self.budget), file=self.out)
+            for stat in stats[:self.top]:
+                frame = stat.traceback[0]
+                print("    {}:{}: +{} B in {} block(s)  {}".format(
+                    frame.filename, frame.lineno, stat.size_diff, stat.count_diff,
+                    linecache.getline(frame.filename, frame.lineno).strip()), file=self.out)
+
+    def report(self, limit=15):
+        """Prints a summary of all frames after the warm-up"""
+        frames = len(self.peaks)
+        print("\nAllocation report: {} frame(s) traced after {} warm-up frame(s)".format(
+            frames, self.warmup), file=self.out)
+        if not frames:
+            return
+        peaks = sorted(self.peaks)
+        print("  peak per frame: median {} B, max {} B".format(peaks[len(peaks)//2], peaks[-1]), file=self.out)
+        print("  frames over the {} B budget: {}".format(self.budget, self.frames_over_budget), file=self.out)
+        print("  retained allocations by call site (bytes and blocks per frame):", file=self.out)
+        for (filename, lineno), size in self.sites.most_common(limit):
+            print("    {:>10.1f} B {:>7.2f}  {}:{}  {}".format(
+                size / frames, self.site_blocks[(filename, lineno)] / frames, filename, lineno,
+                linecache.getline(filename, lineno).strip()), file=self.out)
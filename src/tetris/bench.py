@@ -0,0 +1,217 @@
+"""
+Microbenchmarks for the hot paths of the game engine.
+
+    tetris-bench                              run and print the results
+    tetris-bench --save baseline.json         also save them as a baseline
+    tetris-bench --compare baseline.json      flag regressions against a baseline
+
+Every benchmark runs against a seeded board, so two runs on the same machine
+measure exactly the same work.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+from .tetrominoes import list_of_tetrominoes, rotate
+from . import zobrist
+from . import __main__ as tetris
+
+DEFAULT_SEED = 1234
+DEFAULT_THRESHOLD = 0.10
+BASELINE_VERSION = 1
+
+
+LARGE_BOARD = "100x200" # Stress board, the engine should scale with its area
+
+
+def make_matris(seed=DEFAULT_SEED, stack_height=8, layout=None, preview=1, screen=None):
+    """ Returns a Matris with a seeded, mid-game looking stack """
+    random.seed(seed)
+    layout = layout or tetris.Layout()
+    screen = screen or pygame.Surface(layout.size) # By default an offscreen screen, each fixture has its own
+    matris = tetris.Matris(screen, layout, seed, preview)
+    width, height = layout.matrix_width, layout.matrix_height
+
+    colors = [t.color for t in list_of_tetrominoes]
+    blocks = {color: matris.block(color) for color in colors}
+
+    # A ragged skyline with one hole per row, like a board a few minutes in
+    for x in range(width):
+        column_height = random.randint(stack_height // 2, stack_height)
+        for y in range(height - column_height, height):
+            color = random.choice(colors)
+            matris.matrix[(y, x)] = ('block', blocks[color], color)
+    for y in range(height - stack_height, height):
+        matris.matrix[(y, random.randrange(width))] = None
+    matris.board_hash = zobrist.board_hash(matris.matrix)
+
+    return matris
+
+
+def with_full_lines(matris, count=2):
+    """ Returns a copy of the matrix of `matris` whose bottom `count` rows are full """
+    matrix = dict(matris.matrix)
+    block = ('block', matris.block('cyan'), 'cyan')
+    height = matris.layout.matrix_height
+    for y in range(height - count, height):
+        for x in range(matris.layout.matrix_width):
+            matrix[(y, x)] = block
+    return matrix
+
+
+def timed(stmt):
+    return lambda number: timeit.Timer(stmt).timeit(number)
+
+
+def timed_remove_lines(matris):
+    def remove_lines(number):
+        matrices = [with_full_lines(matris) for _ in range(number)]
+        original = matris.matrix
+        start = timeit.default_timer()
+        for matrix in matrices:
+            matris.matrix = matrix
+            matris.remove_lines()
+        elapsed = timeit.default_timer() - start
+        matris.matrix = original
+        return elapsed
+    return remove_lines
+
+
+def board_benchmarks(matris, suffix=""):
+    """ The benchmarks whose cost depends on the size of the board """
+    return [
+        ("Matris.blend" + suffix, timed(matris.blend)),
+        ("Matris.fits_in_matrix" + suffix,
+         timed(lambda: matris.fits_in_matrix(matris.rotated(), matris.tetromino_position))),
+        ("Matris.place_shadow" + suffix, timed(matris.place_shadow)),
+        ("Matris.shadow_position" + suffix, timed(matris.shadow_position)),
+        ("Matris.remove_lines" + suffix, timed_remove_lines(matris)),
+        ("Matris.request_rotation" + suffix, timed(matris.request_rotation)),
+        ("Matris.draw_surface" + suffix, timed(matris.draw_surface)),
+    ]
+
+
+def benchmarks(seed):
+    """ Returns a list of (name, number-of-calls -> seconds) pairs """
+    matris = make_matris(seed)
+    size = (tetris.WIDTH, tetris.HEIGHT)
+    shapes = [t.shape for t in list_of_tetrominoes]
+
+    def rotate_all():
+        for shape in shapes:
+            rotate(shape, 3)
+
+    large = make_matris(seed, stack_height=80, layout=tetris.Layout.parse(LARGE_BOARD))
+    queued = make_matris(seed, preview=5)
+
+    return board_benchmarks(matris) + [
+        ("Matris.block", timed(lambda: matris.block('pink'))),
+        ("construct_block", timed(lambda: tetris.construct_block('pink'))),
+        ("Matris.set_tetrominoes", timed(matris.set_tetrominoes)),
+        ("Matris.set_tetrominoes[preview=5]", timed(queued.set_tetrominoes)),
+        ("construct_preview", timed(lambda: tetris.construct_preview(list_of_tetrominoes[0]))),
+        ("construct_nightmare", timed(lambda: tetris.construct_nightmare(size))),
+        ("tetrominoes.rotate", timed(rotate_all)),
+    ] + board_benchmarks(large, "[{}]".format(LARGE_BOARD))
+
+
+def measure(run, repeat, min_time):
+    """ Returns (best seconds per call, calls per repeat) """
+    number = 1
+    while True:
+        elapsed = run(number)
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2
+    best = min([elapsed] + [run(number) for _ in range(repeat - 1)])
+    return best / number, number
+
+
+def run_benchmarks(seed=DEFAULT_SEED, repeat=5, min_time=0.05, only=None, out=sys.stdout):
+    pygame.init()
+    results = {}
+    for name, run in benchmarks(seed):
+        if only and not any(part in name for part in only):
+            continue
+        per_call, number = measure(run, repeat, min_time)
+        results[name] = {"per_call_us": per_call * 1e6, "number": number, "repeat": repeat}
+        print("{:<45} {:>12.2f} us".format(name, per_call * 1e6), file=out)
+    return {
+        "version": BASELINE_VERSION,
+        "seed": seed,
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def save_baseline(report, path):
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+
+
+def load_baseline(path):
+    with open(path) as file:
+        report = json.load(file)
+    if report.get("version") != BASELINE_VERSION:
+        raise ValueError("{} is not a version {} baseline".format(path, BASELINE_VERSION))
+    return report
+
+
+def compare(baseline, report, threshold=DEFAULT_THRESHOLD, out=sys.stdout):
+    """ Prints a comparison table and returns the names of the regressed benchmarks """
+    regressions = []
+    print("{:<45} {:>12} {:>12} {:>8}".format("benchmark", "baseline", "current", "change"), file=out)
+    for name, result in report["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            print("{:<45} {:>12} {:>10.2f}us {:>8}".format(name, "-", result["per_call_us"], "new"), file=out)
+            continue
+        change = result["per_call_us"] / old["per_call_us"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print("{:<45} {:>10.2f}us {:>10.2f}us {:>+7.1%}{}".format(
+            name, old["per_call_us"], result["per_call_us"], change, flag), file=out)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="tetris-bench", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="seed for the board fixtures")
+    parser.add_argument("--repeat", type=int, default=5, help="repeats per benchmark, the best one is kept")
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="minimum seconds per repeat, the call count is doubled until reached")
+    parser.add_argument("--only", action="append", help="only run benchmarks whose name contains this")
+    parser.add_argument("--save", metavar="FILE", help="save the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare the results against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown reported as a regression (default: 0.10)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.seed, args.repeat, args.min_time, args.only)
+
+    if args.save:
+        save_baseline(report, args.save)
+    if args.compare:
+        print()
+        regressions = compare(load_baseline(args.compare), report, args.threshold)
+        if regressions:
+            print("\n{} benchmark(s) regressed by more than {:.0%}".format(len(regressions), args.threshold))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
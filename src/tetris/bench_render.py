@@ -0,0 +1,190 @@
+"""
+Render benchmark: frames per second of the game, menu and options screens.
+
+    tetris-bench-render                              run and print the results
+    tetris-bench-render --save render.json           also save them as a baseline
+    tetris-bench-render --compare render.json        flag regressions against a baseline
+
+Each screen is drawn from scripted state under the dummy video driver, so no window
+is needed and two runs draw exactly the same frames. The baselines have the format of
+`tetris-bench`, one entry per screen and per phase of its frames.
+"""
+import argparse
+import platform
+import sys
+from time import perf_counter
+
+# Importing the benchmarks first sets up the dummy video and audio drivers
+from .bench import (DEFAULT_SEED, DEFAULT_THRESHOLD, BASELINE_VERSION, LARGE_BOARD,
+                    make_matris, save_baseline, load_baseline, compare)
+
+import pygame
+
+from .profiler import PHASES
+from .versus import silence
+from . import __main__ as tetris
+
+DEFAULT_FRAMES = 500
+WARMUP_FRAMES = 20
+
+
+class Phases(object):
+    """Total seconds spent in every phase of the frames drawn"""
+
+    def __init__(self):
+        self.totals = {}
+
+    def add(self, phase, seconds):
+        self.totals[phase] = self.totals.get(phase, 0.) + seconds
+
+    def wrap(self, phase, function):
+        """ `function`, with the time spent in it added to `phase` """
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(phase, perf_counter() - start)
+        return timed
+
+
+def game_frames(layout, seed):
+    """ Returns (a function drawing frame `number` of a game, its `Phases`); the piece moves and the score ticks """
+    screen = pygame.display.set_mode(layout.size)
+    game = tetris.Game(layout, preview=tetris.MAX_PREVIEW)
+    matris = make_matris(seed, layout=layout, preview=tetris.MAX_PREVIEW, screen=screen)
+    silence(matris)
+    game.start(screen, matris)
+    profiler = game.profiler
+    phases = Phases()
+    moves = ('left',) * 3 + ('right',) * 3
+
+    def frame(number):
+        if number % 8 == 0:
+            matris.request_rotation()
+        else:
+            matris.request_movement(moves[number % len(moves)])
+        matris.score += 10
+        profiler.start()
+        game.redraw()
+        profiler.end()
+        for phase, duration in zip(PHASES, profiler.frames[-1][1:]):
+            if phase != 'update':
+                phases.add(phase, duration)
+    return frame, phases
+
+
+def menu_frames(layout, seed):
+    """ Same for the main menu, its focus moving down every few frames """
+    screen = pygame.display.set_mode(layout.size)
+    menu = tetris.Menu(layout)
+    kezmenu = menu.build_menu(screen)
+    nightmare = tetris.get_nightmare(screen.get_size())
+    highscoresurf = menu.construct_highscoresurf(12345)
+    phases = Phases()
+    kezmenu.draw = phases.wrap('KezMenu.draw', kezmenu.draw)
+    down = [pygame.event.Event(pygame.KEYDOWN, key=pygame.K_DOWN)]
+
+    def frame(number):
+        kezmenu.update(down if number % 10 == 0 else [], 20)
+        before = perf_counter()
+        drawn = phases.totals.get('KezMenu.draw', 0.)
+        menu.draw(screen, kezmenu, nightmare, highscoresurf)
+        between = perf_counter()
+        phases.add('background', between - before - (phases.totals['KezMenu.draw'] - drawn))
+        pygame.display.flip()
+        phases.add('flip', perf_counter() - between)
+    return frame, phases
+
+
+def options_frames(layout, seed):
+    """ Same for the options screen, the mouse sweeping over it """
+    screen = pygame.display.set_mode(layout.size)
+    if tetris.sound_manager is None:
+        tetris.sound_manager = tetris.SoundManager()
+    options = tetris.OptionsScreen(screen)
+    phases = Phases()
+    back = options.back_button_rect.center
+
+    def frame(number):
+        # Half of the time over the back button, so both of its colors are drawn
+        mouse = back if number % 20 < 10 else (number % screen.get_width(), 0)
+        before = perf_counter()
+        options.draw(mouse)
+        between = perf_counter()
+        pygame.display.flip()
+        phases.add('OptionsScreen.draw', between - before)
+        phases.add('flip', perf_counter() - between)
+    return frame, phases
+
+
+def screens(seed):
+    classic = tetris.Layout()
+    large = tetris.Layout(*map(int, LARGE_BOARD.split('x')))
+    return [
+        ("Game.redraw", lambda: game_frames(classic, seed)),
+        ("Game.redraw[{}]".format(LARGE_BOARD), lambda: game_frames(large, seed)),
+        ("Menu.draw", lambda: menu_frames(classic, seed)),
+        ("OptionsScreen.draw", lambda: options_frames(classic, seed)),
+    ]
+
+
+def run_benchmarks(seed=DEFAULT_SEED, frames=DEFAULT_FRAMES, only=None, out=sys.stdout):
+    pygame.display.init()
+    pygame.font.init()
+    results = {}
+    for name, setup in screens(seed):
+        if only and not any(part in name for part in only):
+            continue
+        frame, phases = setup()
+        for number in range(WARMUP_FRAMES):
+            frame(number)
+        phases.totals.clear()
+        start = perf_counter()
+        for number in range(frames):
+            frame(number)
+        elapsed = perf_counter() - start
+
+        results[name] = {"per_call_us": elapsed / frames * 1e6, "number": frames, "repeat": 1}
+        print("{:<45} {:>12.2f} us {:>10.1f} fps".format(name, elapsed / frames * 1e6, frames / elapsed), file=out)
+        for phase, total in phases.totals.items():
+            results["{}/{}".format(name, phase)] = {"per_call_us": total / frames * 1e6, "number": frames, "repeat": 1}
+            print("  {:<43} {:>12.2f} us".format(phase, total / frames * 1e6), file=out)
+    return {
+        "version": BASELINE_VERSION,
+        "seed": seed,
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "machine": platform.machine(),
+        "video_driver": pygame.display.get_driver(),
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="tetris-bench-render", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="seed for the game boards")
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES,
+                        help="frames drawn of every screen (default: %(default)s)")
+    parser.add_argument("--only", action="append", help="only run screens whose name contains this")
+    parser.add_argument("--save", metavar="FILE", help="save the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare the results against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown reported as a regression (default: 0.10)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.seed, args.frames, args.only)
+
+    if args.save:
+        save_baseline(report, args.save)
+    if args.compare:
+        print()
+        regressions = compare(load_baseline(args.compare), report, args.threshold)
+        if regressions:
+            print("\n{} phase(s) regressed by more than {:.0%}".format(len(regressions), args.threshold))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Boards packed into one Python integer, for searches in pure Python.
+
+Row y of a board is the bit field starting at bit y * (width + 1): its bit 0 is a guard
+bit, set in `walls`, and bits 1 to width are the squares. Below the last row, four full
+rows make the floor. A tetromino is packed the same way, so
+
+    collides   (board | walls) & piece
+    left       piece >> 1, into the guard bit of its row if it was in the first column
+    right      piece << 1, into the guard bit of the next row if it was in the last one
+    down       piece << (width + 1)
+
+and adding 1 to the first square of every row carries into the guard bit of the next
+row exactly for the full rows. `collision_map` tests every position of a tetromino at
+once: bit (y, x) of its result is set when the tetromino doesn't fit at (y, x), which
+makes the straight drops of a rotation into all columns a few shifts per row.
+
+This is the third board format, next to the `Matris.matrix` dict and the bitmask rows of
+`bot`, and converts from and to both.
+"""
+from .bot import shape_masks
+
+FLOOR_ROWS = 4 # A tetromino is at most 4 rows high, it can't go through
+
+
+class Bitboards(object):
+    """The packing of the boards of one size, and the operations on them"""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.row = row = width + 1
+        self.squares = (1 << width) - 1 << 1 # The squares of row 0
+        self.guards = sum(1 << y*row for y in range(height + FLOOR_ROWS))
+        self.cells = sum(self.squares << y*row for y in range(height))
+        self.firsts = self.cells & self.guards << 1 # The first square of every row
+        self.floor = (1 << FLOOR_ROWS*row) - 1 << height*row
+        self.walls = self.guards | self.floor
+        self._pieces = {}
+
+    def bit(self, y, x):
+        return 1 << y*self.row + x + 1
+
+    def from_rows(self, rows):
+        """ A board from the bitmask rows of `bot.board_rows` """
+        board = 0
+        for y, mask in enumerate(rows):
+            board |= mask << y*self.row + 1
+        return board
+
+    def from_matrix(self, matrix):
+        """ A board from a `Matris.matrix` """
+        board = 0
+        for (y, x), square in matrix.items():
+            if square is not None:
+                board |= self.bit(y, x)
+        return board
+
+    def rows(self, board):
+        return [board >> y*self.row + 1 & (1 << self.width) - 1 for y in range(self.height)]
+
+    def piece(self, shape):
+        """ (bits, top row, first column) of `shape`, packed from its top left occupied corner """
+        if shape not in self._pieces:
+            masks, first, last = shape_masks(shape)
+            top = masks[0][0]
+            bits = 0
+            for dy, mask in masks:
+                bits |= mask >> first << (dy - top)*self.row + 1
+            self._pieces[shape] = (bits >> 1, top, first)
+        return self._pieces[shape]
+
+    def place(self, shape, y, x):
+        """
+        The bits of `shape` with its box at (y, x), as `Matris.tetromino_position` has it. Its first
+        column must be on the board, past the last one the bits would wrap to the next row.
+        """
+        bits, top, first = self.piece(shape)
+        return bits << (y+top)*self.row + x + first + 1
+
+    def collides(self, board, piece):
+        return bool((board | self.walls) & piece)
+
+    def drop(self, board, piece):
+        """ `piece` moved down as far as it goes """
+        solid = board | self.walls
+        while not (piece << self.row) & solid:
+            piece <<= self.row
+        return piece
+
+    def full_rows(self, board):
+        """ The full rows, as the guard bit of the row under each """
+        return ((board & self.cells) + self.firsts) & self.guards
+
+    def clear(self, board):
+        """ (board, lines cleared) once its full lines are removed """
+        full = self.full_rows(board)
+        lines = 0
+        row = self.row
+        # From the top, the rows under the one removed stay where they are
+        while full:
+            start = (full & -full).bit_length() - 1 - row # The row above the guard bit
+            full &= full - 1
+            above = board & (1 << start) - 1
+            board = board & ~((1 << start + row) - 1) | above << row
+            lines += 1
+        return board, lines
+
+    def collision_map(self, board, shape):
+        """ The positions of the packed `shape` (by its top left corner, see `piece`) where it collides """
+        bits, top, first = self.piece(shape)
+        solid = board | self.walls
+        collisions = 0
+        while bits:
+            offset = (bits & -bits).bit_length() - 1
+            collisions |= solid >> offset
+            bits &= bits - 1
+        return collisions
+
+    def landings(self, board, shape, start):
+        """ The positions where `shape` lands when dropped straight from row `start`, in every column at once """
+        bits, top, first = self.piece(shape)
+        row = self.row
+        free = ~self.collision_map(board, shape) & self.cells
+        falling = free & self.squares << (start + top)*row
+        landed = 0
+        while falling:
+            below = falling << row & free
+            landed |= falling & ~(below >> row)
+            falling = below
+        return landed
+
+    def drops(self, board, shapes, start):
+        """ Yields (rotation, x, y, board after) like `bot.drops`, for every straight drop of every rotation """
+        row = self.row
+        for rotation, shape in enumerate(shapes):
+            bits, top, first = self.piece(shape)
+            landed = self.landings(board, shape, start)
+            while landed:
+                position = (landed & -landed).bit_length() - 1
+                landed &= landed - 1
+                y, x = divmod(position, row)
+                yield rotation, x - 1 - first, y - top, board | bits << position
+
+
+def benchmark(seed=13, number=2000):
+    """ Times the straight drops of a T on a mid-game board, from the bitmask rows of `bot` and packed """
+    import timeit
+    from . import bot
+    from .bench import make_matris
+    from .tetrominoes import list_of_tetrominoes, rotate
+
+    matris = make_matris(seed)
+    layout = matris.layout
+    packing = Bitboards(layout.matrix_width, layout.matrix_height)
+    rows, board = bot.board_rows(matris), packing.from_matrix(matris.matrix)
+    shapes = [rotate(list_of_tetrominoes[2].shape, rotation) for rotation in range(4)]
+    rows_time = timeit.timeit(lambda: list(bot.drops(rows, shapes, 0, layout.matrix_width)), number=number)
+    packed_time = timeit.timeit(lambda: list(packing.drops(board, shapes, 0)), number=number)
+    print("Drops of a T: rows {:.1f} us, packed {:.1f} us".format(rows_time / number * 1e6, packed_time / number * 1e6))
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,155 @@
+"""
+A simple bot, for the demo games of `tetris-grid`.
+
+Every place the falling tetromino can be dropped to straight from the top is scored
+with a weighted sum of features of the board it leaves behind: the total height of
+the columns, the lines cleared, the holes and the bumpiness. The rows of the board
+are handled as bitmasks, so scoring a placement costs a few operations per row.
+`Lookahead` also takes the next tetromino into account.
+"""
+from .tetrominoes import list_of_tetrominoes, rotate
+from . import zobrist
+
+# The weights of the usual hand-tuned four-feature evaluation
+HEIGHT_WEIGHT = -0.510066
+LINES_WEIGHT = 0.760666
+HOLES_WEIGHT = -0.35663
+BUMPINESS_WEIGHT = -0.184483
+
+
+def board_rows(matris):
+    """ The rows of the matrix of `matris` as bitmasks, bit x set for an occupied column x """
+    width = matris.layout.matrix_width
+    matrix = matris.matrix
+    return [sum(1 << x for x in range(width) if matrix[(y, x)]) for y in range(matris.layout.matrix_height)]
+
+
+def shape_masks(shape):
+    """ The (row offset, bitmask) of the occupied rows of `shape`, and its lowest and highest column """
+    masks = tuple((dy, sum(1 << dx for dx, square in enumerate(row) if square))
+                  for dy, row in enumerate(shape) if any(row))
+    columns = [dx for row in shape for dx, square in enumerate(row) if square]
+    return masks, min(columns), max(columns)
+
+
+def evaluate(rows, width):
+    """ The score of the board `rows`, once its full lines are cleared """
+    full = (1 << width) - 1
+    remaining = [row for row in rows if row != full]
+    lines = len(rows) - len(remaining)
+
+    heights = [0] * width
+    covered = holes = 0
+    height = len(remaining) + lines
+    for y, row in enumerate(remaining, lines):
+        new = row & ~covered
+        while new:
+            x = (new & -new).bit_length() - 1
+            heights[x] = height - y
+            new &= new - 1
+        covered |= row
+        holes += (covered & ~row).bit_count()
+
+    bumpiness = sum(abs(a - b) for a, b in zip(heights, heights[1:]))
+    return (HEIGHT_WEIGHT * sum(heights) + LINES_WEIGHT * lines +
+            HOLES_WEIGHT * holes + BUMPINESS_WEIGHT * bumpiness)
+
+
+def drops(rows, shapes, start, width):
+    """
+    Yields (rotation, x, y, squares) for every column each of the rotations `shapes` can drop in
+    straight from row `start` of `rows`, `squares` being the (row offset, bitmask) of its squares
+    """
+    height = len(rows)
+    for rotation, shape in enumerate(shapes):
+        masks, first, last = shape_masks(shape)
+        for x in range(-first, width - last):
+            shifted = tuple((dy, mask << x if x >= 0 else mask >> -x) for dy, mask in masks)
+
+            def fits(y):
+                return all(0 <= y+dy < height and not rows[y+dy] & mask for dy, mask in shifted)
+
+            y = start
+            if not fits(y):
+                continue
+            while fits(y + 1):
+                y += 1
+            yield rotation, x, y, shifted
+
+
+def placements(matris, rows=None):
+    """ Yields (score, rotation, x) for every column each rotation of the falling tetromino can drop in """
+    width = matris.layout.matrix_width
+    rows = board_rows(matris) if rows is None else rows
+    shapes = [matris.rotated(rotation) for rotation in range(4)]
+    for rotation, x, y, shifted in drops(rows, shapes, matris.tetromino_position[0], width):
+        placed = list(rows)
+        for dy, mask in shifted:
+            placed[y+dy] |= mask
+        yield evaluate(placed, width), rotation, x
+
+
+def best_placement(matris):
+    """ The (rotation, x) of the best placement of the falling tetromino, None if there is none """
+    best = max(placements(matris), default=None)
+    return best and best[1:]
+
+
+class Lookahead(object):
+    """
+    `best_placement` looking one tetromino further: every placement of the falling tetromino is scored
+    with the best placement of the next one on the board it leaves. The boards are known by their
+    Zobrist hash, and their scores are kept in a `TranspositionTable`, where the search of the next
+    move finds the boards it looked at one move earlier.
+    """
+
+    def __init__(self, size=1 << 16):
+        self.table = zobrist.TranspositionTable(size)
+        self.shapes = [[rotate(tetromino.shape, rotation) for rotation in range(4)]
+                       for tetromino in list_of_tetrominoes]
+
+    def best_placement(self, matris):
+        width = matris.layout.matrix_width
+        rows = board_rows(matris)
+        keys = zobrist.square_keys(width, len(rows))
+        following = list_of_tetrominoes.index(matris.next_tetromino)
+        best = None
+        for rotation, x, y, shifted in drops(rows, [matris.rotated(turn) for turn in range(4)],
+                                              matris.tetromino_position[0], width):
+            placed, board_hash, lines = self.place(rows, matris.board_hash, keys, y, shifted, width)
+            score = LINES_WEIGHT * lines + self.search(placed, board_hash, following, keys, width)
+            if best is None or (score, rotation, x) > best:
+                best = (score, rotation, x)
+        return best and best[1:]
+
+    def place(self, rows, board_hash, keys, y, shifted, width):
+        """ (rows, hash, lines cleared) of the board once the squares `shifted` are placed at row `y` and it's cleared """
+        placed = list(rows)
+        for dy, mask in shifted:
+            placed[y+dy] |= mask
+            while mask:
+                board_hash ^= keys[(y+dy, (mask & -mask).bit_length() - 1)]
+                mask &= mask - 1
+        full = (1 << width) - 1
+        if full in placed:
+            remaining = [row for row in placed if row != full]
+            lines = len(placed) - len(remaining)
+            placed = [0] * lines + remaining
+            return placed, zobrist.rows_hash(placed), lines
+        return placed, board_hash, 0
+
+    def search(self, rows, board_hash, kind, keys, width):
+        """ The score of the best placement of tetromino number `kind` on a board, from the table if it's there """
+        key = board_hash ^ zobrist.next_key(kind)
+        score = self.table.get(key)
+        if score is None:
+            score = float('-inf') # Nowhere to go, it's game over
+            for rotation, x, y, shifted in drops(rows, self.shapes[kind], 0, width):
+                placed, placed_hash, lines = self.place(rows, board_hash, keys, y, shifted, width)
+                evaluation = self.table.get(placed_hash)
+                if evaluation is None:
+                    evaluation = evaluate(placed, width)
+                    self.table.put(placed_hash, evaluation)
+                score = max(score, evaluation + LINES_WEIGHT * lines)
+            self.table.put(key, score)
+        return score
@@ -0,0 +1,231 @@
+"""
+The game as a step/reset environment for reinforcement learning, without pygame.
+
+    env = TetrisEnv(seed=0)
+    observation, info = env.reset()
+    observation, reward, terminated, truncated, info = env.step(HARD_DROP)
+
+`VectorTetrisEnv` steps K boards at once. Their squares are one (K, H, W) array, so
+the collision tests, the locks and the line clears of a step are a handful of NumPy
+operations over the whole batch instead of a Python loop per board; `TetrisEnv` is
+a batch of one. The rules are the ones of `Matris`: same pieces, same wall kicks,
+same scoring. What's left out is the clock: the tetromino falls one row every
+`gravity` steps, and the reward of a step is the score it made.
+
+Needs NumPy, which the game itself doesn't: `pip install Tetris[env]`.
+"""
+try:
+    import numpy as np
+except ImportError as error:
+    raise ImportError("tetris.env needs NumPy, install it with `pip install Tetris[env]`") from error
+
+from .tetrominoes import list_of_tetrominoes, rotate
+
+# Actions
+NOOP, LEFT, RIGHT, ROTATE, SOFT_DROP, HARD_DROP = range(6)
+ACTIONS = 6
+
+# Squares of the observations
+EMPTY, BLOCK, FALLING = 0, 1, 2
+
+MATRIX_WIDTH = 10
+MATRIX_HEIGHT = 22 # With the 2 hidden rows at the top, where the tetrominoes appear
+
+PAD = 4 # The squares are kept in a frame of walls, so a 4x4 window around a tetromino never leaves the array
+KICKS = (0, 1, -1, 2, -2) # Columns tried in turn when rotating, as `Matris.request_rotation` does
+
+
+def shape_masks():
+    """ The (tetromino, rotation, 4, 4) masks of every rotation of `list_of_tetrominoes`, in their top left corner """
+    masks = np.zeros((len(list_of_tetrominoes), 4, 4, 4), dtype=bool)
+    for kind, tetromino in enumerate(list_of_tetrominoes):
+        for rotation in range(4):
+            for y, row in enumerate(rotate(tetromino.shape, rotation)):
+                for x, square in enumerate(row):
+                    masks[kind, rotation, y, x] = bool(square)
+    return masks
+
+
+MASKS = shape_masks()
+SIZES = np.array([len(tetromino.shape) for tetromino in list_of_tetrominoes])
+WINDOW = np.arange(4)
+
+
+class VectorTetrisEnv(object):
+    """`count` games stepped together; every argument and result is batched along the first axis"""
+
+    def __init__(self, count, width=MATRIX_WIDTH, height=MATRIX_HEIGHT, gravity=1, seed=None):
+        self.count = count
+        self.width = width
+        self.height = height
+        self.gravity = gravity # Steps per row of fall
+        self.random = np.random.default_rng(seed)
+        self.boards = np.arange(count)
+
+        # Occupied squares, walls included; `self.squares` is the board inside them
+        self.walls = np.ones((height + 2*PAD, width + 2*PAD), dtype=bool)
+        self.walls[PAD:PAD+height, PAD:PAD+width] = False
+        self.cells = np.empty((count,) + self.walls.shape, dtype=bool)
+        self.squares = self.cells[:, PAD:PAD+height, PAD:PAD+width]
+
+        self.piece = np.zeros(count, dtype=np.intp)
+        self.next_piece = np.zeros(count, dtype=np.intp)
+        self.rotation = np.zeros(count, dtype=np.intp)
+        self.y = np.zeros(count, dtype=np.intp)
+        self.x = np.zeros(count, dtype=np.intp)
+        self.steps = np.zeros(count, dtype=np.int64)
+        self.score = np.zeros(count, dtype=np.int64)
+        self.lines = np.zeros(count, dtype=np.int64)
+        self.level = np.ones(count, dtype=np.int64)
+        self.combo = np.ones(count, dtype=np.int64)
+
+    def reset(self, seed=None):
+        """ Starts every game over; returns (observations, info) """
+        if seed is not None:
+            self.random = np.random.default_rng(seed)
+        self._reset(np.ones(self.count, dtype=bool))
+        return self.observe(), self.info()
+
+    def _reset(self, boards):
+        self.cells[boards] = self.walls
+        for name in ('steps', 'score', 'lines'):
+            getattr(self, name)[boards] = 0
+        self.level[boards] = 1
+        self.combo[boards] = 1
+        self.next_piece[boards] = self.random.integers(len(list_of_tetrominoes), size=np.count_nonzero(boards))
+        self._spawn(boards)
+
+    def _spawn(self, boards):
+        """ The next tetromino of `boards` starts falling; returns which of them it doesn't fit in """
+        count = np.count_nonzero(boards)
+        self.piece[boards] = self.next_piece[boards]
+        self.next_piece[boards] = self.random.integers(len(list_of_tetrominoes), size=count)
+        self.rotation[boards] = 0
+        self.y[boards] = 0
+        self.x[boards] = (self.width - SIZES[self.piece[boards]]) // 2
+        return boards & self.collides(self.rotation, self.y, self.x)
+
+    def window(self, array, y, x):
+        """ The 4x4 squares of `array` (walls included) from (y, x) of the board, for every board """
+        rows = (y + PAD)[:, None, None] + WINDOW[:, None]
+        columns = (x + PAD)[:, None, None] + WINDOW
+        if array.ndim == 2:
+            return array[rows, columns]
+        return array[self.boards[:, None, None], rows, columns]
+
+    def collides(self, rotation, y, x):
+        """ Would the falling tetrominoes at `rotation`, (y, x) overlap a wall or a block? """
+        masks = MASKS[self.piece, rotation]
+        return (self.window(self.cells, y, x) & masks).any(axis=(1, 2))
+
+    def step(self, actions):
+        """ Plays `actions`, one per board; returns (observations, rewards, terminated, truncated, info) """
+        actions = np.asarray(actions)
+        score = self.score.copy()
+
+        moves = (actions == RIGHT).astype(np.intp) - (actions == LEFT)
+        moved = (moves != 0) & ~self.collides(self.rotation, self.y, self.x + moves)
+        self.x += np.where(moved, moves, 0)
+
+        rotating = actions == ROTATE
+        if rotating.any():
+            self.rotate(rotating)
+
+        # Hard drops go all the way down and lock straight away, for 10 points a row
+        dropping = actions == HARD_DROP
+        if dropping.any():
+            rows = self.drop_distance(dropping)
+            self.y += rows
+            self.score += 10 * rows
+
+        self.steps += 1
+        falling = (self.steps % self.gravity == 0) | (actions == SOFT_DROP)
+        landed = self.collides(self.rotation, self.y + 1, self.x)
+        self.y += falling & ~landed
+        locking = dropping | falling & landed
+        terminated = self.lock(locking) if locking.any() else np.zeros(self.count, dtype=bool)
+
+        rewards = self.score - score
+        info = self.info()
+        if terminated.any():
+            info['final_score'] = np.where(terminated, self.score, 0)
+            self._reset(terminated)
+        return self.observe(), rewards, terminated, np.zeros(self.count, dtype=bool), info
+
+    def rotate(self, boards):
+        """ Rotates the tetrominoes of `boards` right, moving them by the first of `KICKS` that stays on the board """
+        rotation = np.where(boards, (self.rotation + 1) % 4, self.rotation)
+        masks = MASKS[self.piece, rotation]
+        x = self.x.copy()
+        kicked = ~boards
+        for kick in KICKS:
+            inside = ~(self.window(self.walls, self.y, self.x + kick) & masks).any(axis=(1, 2))
+            x = np.where(inside & ~kicked, self.x + kick, x)
+            kicked |= inside
+        # As in the game, the kick only looks at the walls, the blocks are only checked where it lands
+        rotated = boards & kicked & ~self.collides(rotation, self.y, x)
+        self.rotation = np.where(rotated, rotation, self.rotation)
+        self.x = np.where(rotated, x, self.x)
+
+    def drop_distance(self, boards):
+        """ How many rows the tetrominoes of `boards` can fall, 0 for the other boards """
+        rows = np.zeros(self.count, dtype=np.intp)
+        falling = boards.copy()
+        while falling.any():
+            falling &= ~self.collides(self.rotation, self.y + rows + 1, self.x)
+            rows += falling
+        return rows
+
+    def lock(self, boards):
+        """ Locks the falling tetrominoes of `boards` in place and clears the full lines; returns which games are over """
+        index = self.boards[boards]
+        rows = (self.y[boards] + PAD)[:, None, None] + WINDOW[:, None]
+        columns = (self.x[boards] + PAD)[:, None, None] + WINDOW
+        masks = MASKS[self.piece[boards], self.rotation[boards]]
+        self.cells[index[:, None, None], rows, columns] |= masks
+
+        # The full lines go to the top of their board, in a stable sort that keeps the others in order, and are emptied
+        full = self.squares[index].all(axis=2)
+        cleared = full.sum(axis=1)
+        if cleared.any():
+            order = np.argsort(~full, axis=1, kind='stable')
+            squares = np.take_along_axis(self.squares[index], order[:, :, None], axis=1)
+            squares[np.arange(self.height) < cleared[:, None]] = False
+            self.squares[index] = squares
+
+        self.score[index] += 100 * cleared**2 * self.combo[index]
+        self.lines[index] += cleared
+        self.level[index] += self.lines[index] >= self.level[index] * 10
+        self.combo[index] = np.where(cleared > 0, self.combo[index] + 1, 1)
+        return self._spawn(boards)
+
+    def observe(self):
+        """ The (K, H, W) boards, as `EMPTY`, `BLOCK` or `FALLING` squares """
+        observations = self.cells.astype(np.uint8)
+        rows = (self.y + PAD)[:, None, None] + WINDOW[:, None]
+        columns = (self.x + PAD)[:, None, None] + WINDOW
+        boards = self.boards[:, None, None]
+        masks = MASKS[self.piece, self.rotation]
+        observations[boards, rows, columns] = np.where(masks, FALLING, observations[boards, rows, columns])
+        return observations[:, PAD:PAD+self.height, PAD:PAD+self.width]
+
+    def info(self):
+        return {'score': self.score.copy(), 'lines': self.lines.copy(), 'level': self.level.copy(),
+                'piece': self.piece.copy(), 'next_piece': self.next_piece.copy()}
+
+
+class TetrisEnv(object):
+    """One game, with the interface of `VectorTetrisEnv` minus the batch axis"""
+
+    def __init__(self, width=MATRIX_WIDTH, height=MATRIX_HEIGHT, gravity=1, seed=None):
+        self.vector = VectorTetrisEnv(1, width, height, gravity, seed)
+
+    def reset(self, seed=None):
+        observations, info = self.vector.reset(seed)
+        return observations[0], {name: value[0] for name, value in info.items()}
+
+    def step(self, action):
+        """ A game that ends is started over straight away, the `final_score` of `info` has its score """
+        observations, rewards, terminated, truncated, info = self.vector.step([action])
+        return (observations[0], int(rewards[0]), bool(terminated[0]), bool(truncated[0]),
+                {name: value[0] for name, value in info.items()})
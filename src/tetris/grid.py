@@ -0,0 +1,258 @@
+"""
+A wall of bot games in one window, and a scalability test of the renderer.
+
+    tetris-grid --boards 36           watch 36 bot games
+    tetris-grid --measure             frame rate for 1 to 64 boards, as fast as possible
+    tetris-grid --lookahead           bots that also look at the next tetromino
+
+Every board is drawn straight onto the screen from one atlas holding a block of each
+color at the scaled-down size. A board is only drawn again when its game changed,
+and the rectangles of the boards drawn in a frame go to a single `display.update`.
+"""
+import argparse
+import math
+import os
+import sys
+from time import perf_counter
+
+import pygame
+from pygame import Rect
+
+from .bot import best_placement, Lookahead
+from .spectate import COLORS
+from .versus import silence
+from . import __main__ as tetris
+
+DEFAULT_SIZE = (1280, 720)
+MEASURE_COUNTS = (1, 4, 16, 36, 64)
+GAP = 1 # Blocks of background between two boards
+FPS = 50
+
+
+def grid_shape(count, size, board):
+    """ Returns (columns, rows, blocksize) of the grid of `count` boards with the largest blocks """
+    width, height = size
+    best = None
+    for columns in range(1, count + 1):
+        rows = math.ceil(count / columns)
+        blocksize = min(width // (columns * (board[0] + GAP)), height // (rows * (board[1] + GAP)))
+        if best is None or blocksize > best[2]:
+            best = (columns, rows, blocksize)
+    return best
+
+
+class BlockAtlas(object):
+    """One surface with a block of every color at `blocksize`, blitted from by area"""
+
+    def __init__(self, blocksize):
+        self.blocksize = blocksize
+        self.surface = pygame.Surface((blocksize * len(COLORS), blocksize))
+        self.areas = {}
+        for index, color in enumerate(COLORS):
+            area = Rect(index * blocksize, 0, blocksize, blocksize)
+            self.surface.blit(tetris.construct_block(color, size=blocksize), area)
+            self.areas[color] = area
+        if pygame.display.get_surface():
+            self.surface = self.surface.convert()
+
+
+class BotGame(object):
+    """A headless game played by the bot, drawn in `rect` of the screen"""
+
+    screen = None # The boards never draw themselves, they all share one screen for their subsurface
+
+    def __init__(self, rect, layout, seed, move_time=0.05, planner=best_placement):
+        self.rect = rect
+        self.layout = layout
+        self.seed = seed
+        self.move_time = move_time # Seconds between two moves of the bot
+        self.planner = planner # Returns the (rotation, x) to go for
+        self.games = 0
+        self.new_game()
+
+    def new_game(self):
+        if BotGame.screen is None:
+            BotGame.screen = pygame.Surface(self.layout.size)
+        self.matris = tetris.Matris(BotGame.screen, self.layout, self.seed + self.games)
+        self.matris.score_writer = lambda score: None
+        silence(self.matris)
+        self.target = None
+        self.timer = 0
+        self.dirty = True
+
+    def step(self, timepassed):
+        matris = self.matris
+        try:
+            if self.target is None:
+                self.target = self.planner(matris) or (matris.tetromino_rotation, matris.tetromino_position[1])
+            self.timer += timepassed
+            while self.timer >= self.move_time and self.target:
+                self.timer -= self.move_time
+                self.move()
+            matris.last_lock = None
+            if matris.update(timepassed, (), False):
+                self.dirty = True
+            if matris.last_lock:
+                self.target = None
+        except tetris.GameOver:
+            self.games += 1
+            self.new_game()
+
+    def move(self):
+        """One step towards the target placement: rotate, then slide, then drop"""
+        matris = self.matris
+        rotation, x = self.target
+        if matris.tetromino_rotation != rotation:
+            moved = matris.request_rotation()
+        elif matris.tetromino_position[1] != x:
+            moved = matris.request_movement('left' if matris.tetromino_position[1] > x else 'right')
+        else:
+            moved = False
+        if moved is False:
+            # There or stuck on the way, either way it goes down here
+            self.target = None
+            matris.hard_drop()
+        self.dirty = True
+
+    def draw(self, screen, atlas):
+        """Draw the board and the falling tetromino, returns the rectangle drawn"""
+        matris = self.matris
+        blocksize = atlas.blocksize
+        left, top = self.rect.topleft
+        top -= 2 * blocksize # The 2 hidden rows
+        image, areas = atlas.surface, atlas.areas
+        blits = [(image, (left + x*blocksize, top + y*blocksize), areas[square[2]])
+                 for (y, x), square in matris.matrix.items() if square is not None and y >= 2]
+        posY, posX = matris.tetromino_position
+        area = areas[matris.current_tetromino.color]
+        for y, row in enumerate(matris.rotated()):
+            for x, square in enumerate(row):
+                if square and posY + y >= 2:
+                    blits.append((image, (left + (posX+x)*blocksize, top + (posY+y)*blocksize), area))
+        screen.fill(tetris.BGCOLOR, self.rect)
+        screen.blits(blits, doreturn=False)
+        self.dirty = False
+        return self.rect
+
+
+class Grid(object):
+    """`count` bot games laid out in a grid over `screen`"""
+
+    def __init__(self, screen, count, layout=None, seed=0, planner=best_placement):
+        layout = layout or tetris.Layout()
+        board = (layout.matrix_width, layout.visible_matrix_height)
+        columns, rows, blocksize = grid_shape(count, screen.get_size(), board)
+        if blocksize < 1:
+            raise ValueError("{} boards don't fit in a {}x{} window".format(count, *screen.get_size()))
+        self.screen = screen
+        self.atlas = BlockAtlas(blocksize)
+        self.games = []
+        # Centered in the window
+        width, height = screen.get_size()
+        left = (width - (columns * (board[0] + GAP) - GAP) * blocksize) // 2
+        top = (height - (rows * (board[1] + GAP) - GAP) * blocksize) // 2
+        for index in range(count):
+            column, row = index % columns, index // columns
+            rect = Rect(left + column * (board[0] + GAP) * blocksize, top + row * (board[1] + GAP) * blocksize,
+                        board[0] * blocksize, board[1] * blocksize)
+            self.games.append(BotGame(rect, layout, seed + 1000 * index, planner=planner))
+        screen.fill(tetris.BORDERCOLOR)
+
+    def frame(self, timepassed):
+        self.step(timepassed)
+        return self.draw()
+
+    def step(self, timepassed):
+        for game in self.games:
+            game.step(timepassed)
+
+    def draw(self):
+        """Draw the boards that changed; returns how many were drawn"""
+        dirty = [game.draw(self.screen, self.atlas) for game in self.games if game.dirty]
+        pygame.display.update(dirty)
+        return len(dirty)
+
+
+def watch(count, size, planner=best_placement):
+    screen = pygame.display.set_mode(size)
+    grid = Grid(screen, count, planner=planner)
+    pygame.display.flip()
+    clock = pygame.time.Clock()
+    shown = perf_counter()
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                return
+        grid.frame(clock.tick(FPS) / 1000.)
+        if perf_counter() - shown > 1:
+            shown = perf_counter()
+            pygame.display.set_caption("TeTris - {} bot games - {:.0f} fps".format(count, clock.get_fps()))
+
+
+def measure(counts, size, seconds=3., out=sys.stdout, planner=best_placement):
+    """
+    Runs every board count unthrottled for `seconds`, each frame advancing the games by one 50 Hz
+    frame; returns {count: (fps, ms simulating, ms drawing, boards drawn per frame)}
+    """
+    screen = pygame.display.set_mode(size)
+    results = {}
+    print("{:>7} {:>10} {:>10} {:>10} {:>10} {:>12}".format(
+        "boards", "fps", "ms/frame", "sim ms", "draw ms", "drawn/frame"), file=out)
+    for count in counts:
+        grid = Grid(screen, count, planner=planner)
+        pygame.display.flip()
+        frames = drawn = 0
+        simulating = drawing = 0.
+        start = perf_counter()
+        while perf_counter() - start < seconds:
+            pygame.event.pump()
+            before = perf_counter()
+            grid.step(1. / FPS)
+            between = perf_counter()
+            drawn += grid.draw()
+            simulating += between - before
+            drawing += perf_counter() - between
+            frames += 1
+        elapsed = perf_counter() - start
+        results[count] = (frames / elapsed, simulating * 1000 / frames, drawing * 1000 / frames, drawn / frames)
+        print("{:>7} {:>10.1f} {:>10.2f} {:>10.2f} {:>10.2f} {:>12.1f}".format(
+            count, frames / elapsed, elapsed * 1000 / frames, *results[count][1:]), file=out)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="tetris-grid", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--boards", type=int, default=36, help="number of bot games (default: %(default)s)")
+    parser.add_argument("--size", default="{}x{}".format(*DEFAULT_SIZE), metavar="WxH",
+                        help="size of the window (default: %(default)s)")
+    parser.add_argument("--measure", action="store_true",
+                        help="measure the frame rate for {} boards".format(", ".join(map(str, MEASURE_COUNTS))))
+    parser.add_argument("--seconds", type=float, default=3., help="length of each measurement")
+    parser.add_argument("--headless", action="store_true", help="measure without a window")
+    parser.add_argument("--lookahead", action="store_true",
+                        help="bots that look one tetromino ahead, sharing one transposition table")
+    args = parser.parse_args(argv)
+    try:
+        size = tuple(int(side) for side in args.size.lower().split('x'))
+    except ValueError:
+        parser.error("--size: expected WxH, got {!r}".format(args.size))
+
+    if args.headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pygame.display.init()
+    pygame.display.set_caption("TeTris - bot games")
+
+    lookahead = Lookahead() if args.lookahead else None
+    planner = lookahead.best_placement if lookahead else best_placement
+    if args.measure:
+        measure(MEASURE_COUNTS, size, args.seconds, planner=planner)
+    else:
+        watch(args.boards, size, planner)
+    if lookahead:
+        print("Transposition table: {entries}/{size} entries, {hits} hits, {misses} misses "
+              "({hit_rate:.0%}), {evictions} evictions".format(**lookahead.table.stats()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+The layers the game screen is composited from.
+
+`Game` draws the background, the frame of the board and the frames and labels of
+the side panels once, into the static layer, and copies it to the screen when the
+game starts. Each part that changes has a persistent `Layer` over its area of the
+screen, redrawn only when what it shows changes and then copied to the screen, in a
+fixed order:
+
+    static      background, frames, labels          once
+    board       `Matris.surface`, drawn in place     when the board changes
+    preview     the next tetrominoes                 when a tetromino comes in
+    info        score, level, lines, combo           when one of them changes
+    overlays    pause symbol, profiler               over the above
+
+Numbers are drawn glyph by glyph from `Glyphs`, rendered once, so a redraw doesn't
+allocate a single `Surface`, not even when the score changes.
+"""
+from pygame import Rect, Surface
+
+
+class Layer(object):
+    """A persistent surface over `rect` of the screen, with `static` (the static layer) under it"""
+
+    def __init__(self, static, rect):
+        self.static = static
+        self.rect = Rect(rect)
+        self.surface = Surface(self.rect.size)
+        self.shown = None # What it shows, as given to `update`
+        self.dirty = True # Drawn but not on the screen yet
+
+    def update(self, content):
+        """
+        Whether `content` (anything comparable) differs from what the layer shows; if so the
+        layer is cleared back to the static layer, for the caller to draw `content` on
+        """
+        if content == self.shown:
+            return False
+        self.shown = content
+        self.surface.blit(self.static, (0, 0), self.rect)
+        self.dirty = True
+        return True
+
+    def invalidate(self):
+        """ Something was drawn over the layer on the screen, redraw it whatever its content """
+        self.shown = None
+
+    def compose(self, screen):
+        """ Copies the layer to `screen` if it changed since the last time """
+        if self.dirty:
+            screen.blit(self.surface, self.rect)
+            self.dirty = False
+
+
+class Glyphs(object):
+    """The `characters` rendered once with `font`, to draw text made of them without rendering it"""
+
+    def __init__(self, font, characters, color):
+        self.glyphs = {character: font.render(character, True, color) for character in characters}
+        self.widths = {character: glyph.get_width() for character, glyph in self.glyphs.items()}
+
+    def width(self, text):
+        widths = self.widths
+        return sum(widths[character] for character in text)
+
+    def draw(self, surface, text, right, top):
+        """ Draws `text` on `surface` with its top right corner at (right, top) """
+        x = right - self.width(text)
+        glyphs, widths = self.glyphs, self.widths
+        for character in text:
+            surface.blit(glyphs[character], (x, top))
+            x += widths[character]
@@ -0,0 +1,125 @@
+"""
+Which placements the falling tetromino can really reach, and the inputs that get it there.
+
+`bot.placements` only drops tetrominoes straight down. The move generator here walks
+every (rotation, y, x) the tetromino can get to from where it is, with the rules of
+`Matris.request_movement` and `Matris.request_rotation` (wall kicks included), so it
+also finds the tucks under overhangs and the spins into holes. It's a breadth first
+search, so the inputs found for a placement are as few as possible; `play` carries
+them out on a `Matris`.
+
+The results are kept per board and tetromino, by `Matris.state_hash`, in a
+`TranspositionTable`.
+"""
+from collections import deque
+
+from .bot import board_rows, shape_masks
+from . import zobrist
+
+KICKS = (0, 1, -1, 2, -2) # Columns tried in turn by `Matris.request_rotation`
+
+# The inputs, named after what `play` calls for them
+LEFT, RIGHT, DOWN, ROTATE, DROP = 'left', 'right', 'down', 'rotate', 'drop'
+
+
+def search(rows, width, shapes, start):
+    """
+    The reachable placements of a tetromino whose rotations are `shapes`, starting at `start`,
+    a (rotation, y, x) on the board `rows`: {(rotation, y, x): shortest inputs, ending with `DROP`}.
+    Placements covering the same squares are only listed once.
+    """
+    height = len(rows)
+    # The (row offset, bitmask) of the squares of each rotation in each column it fits in
+    shifted = {}
+    for rotation, shape in enumerate(shapes):
+        masks, first, last = shape_masks(shape)
+        for x in range(-first, width - last):
+            shifted[(rotation, x)] = tuple((dy, mask << x if x >= 0 else mask >> -x) for dy, mask in masks)
+
+    def inside(rotation, y, x):
+        squares = shifted.get((rotation, x))
+        return squares is not None and all(0 <= y+dy < height for dy, mask in squares)
+
+    def fits(rotation, y, x):
+        squares = shifted.get((rotation, x))
+        if squares is None:
+            return False
+        for dy, mask in squares:
+            if not 0 <= y+dy < height or rows[y+dy] & mask:
+                return False
+        return True
+
+    def moves(rotation, y, x):
+        if fits(rotation, y, x-1):
+            yield LEFT, (rotation, y, x-1)
+        if fits(rotation, y, x+1):
+            yield RIGHT, (rotation, y, x+1)
+        if fits(rotation, y+1, x):
+            yield DOWN, (rotation, y+1, x)
+        # The first kick that keeps the tetromino on the board, as long as it doesn't overlap a block there
+        turned = (rotation + 1) % 4
+        for kick in KICKS:
+            if inside(turned, y, x+kick):
+                if fits(turned, y, x+kick):
+                    yield ROTATE, (turned, y, x+kick)
+                break
+
+    if not fits(*start):
+        return {}
+    parents = {start: None}
+    queue = deque([start])
+    found = {} # Squares of a placement: (placement, state it was dropped from)
+    while queue:
+        state = queue.popleft()
+        rotation, y, x = state
+        landing = y
+        while fits(rotation, landing + 1, x):
+            landing += 1
+        squares = frozenset((landing+dy, mask) for dy, mask in shifted[(rotation, x)])
+        if squares not in found:
+            # States come out of the queue in order of distance, the first one dropped here is the closest
+            found[squares] = ((rotation, landing, x), state)
+        for move, following in moves(*state):
+            if following not in parents:
+                parents[following] = (state, move)
+                queue.append(following)
+
+    placements = {}
+    for placement, state in found.values():
+        inputs = [DROP]
+        while parents[state]:
+            state, move = parents[state]
+            inputs.append(move)
+        placements[placement] = tuple(reversed(inputs))
+    return placements
+
+
+class MoveGenerator(object):
+    """The reachable placements of the falling tetromino of a `Matris`, remembered by board and tetromino"""
+
+    def __init__(self, size=4096):
+        self.table = zobrist.TranspositionTable(size)
+
+    def placements(self, matris):
+        """ {(rotation, y, x): shortest inputs} of the falling tetromino of `matris`, shared with the table """
+        key = matris.state_hash()
+        placements = self.table.get(key)
+        if placements is None:
+            shapes = [matris.rotated(rotation) for rotation in range(4)]
+            start = (matris.tetromino_rotation,) + matris.tetromino_position
+            placements = search(board_rows(matris), matris.layout.matrix_width, shapes, start)
+            self.table.put(key, placements)
+        return placements
+
+
+def play(matris, inputs):
+    """ Carries out `inputs` on `matris`; returns False as soon as one of them can't be """
+    for move in inputs:
+        if move == DROP:
+            matris.hard_drop()
+        elif move == ROTATE:
+            if matris.request_rotation() is False:
+                return False
+        elif not matris.request_movement(move):
+            return False
+    return True
@@ -0,0 +1,253 @@
+"""
+A perfect clear solver: the placements that empty the board with the pieces to come.
+
+    solver = PerfectClearSolver()
+    solution = solver.solve_matris(matris, lines=4)   # [(rotation, y, x), ...] or None
+
+The board is a `bitboard` integer and the tetrominoes are dropped straight down, like
+the bot does, never over an empty square: only clearing the row above could open it
+again, and leaving those out is what keeps a search to milliseconds. So a board said to
+have no perfect clear may still have one that tucks or clears over a hole. Before going
+deeper, a board has to pass three tests, each a few operations on the packed board:
+
+- the empty squares of the bottom `lines` rows count a multiple of 4, and there are
+  enough pieces in the queue to fill them;
+- parity: colouring the columns black and white, every tetromino covers two squares
+  of each, except the T standing up (3 and 1), the L and J (always 3 and 1) and the
+  long one standing up (4 and 0); the pieces to come must be able to make up the
+  difference between the empty black and white squares. Clearing lines doesn't change
+  it, since a full row has as many of each;
+- a column full all the way up splits the rows in two sides no piece can cross, the
+  empty squares of each side count a multiple of 4.
+
+Sub-boards are remembered, solved or not, by board, pieces and lines in a
+`TranspositionTable` that `save` writes to disk and the next run reads back.
+"""
+import json
+import os
+
+from .bitboard import Bitboards
+from .tetrominoes import list_of_tetrominoes, rotate
+from .zobrist import TranspositionTable
+
+memofile = os.path.join(os.path.dirname(__file__), ".perfectclears")
+
+NAMES = [tetromino.name for tetromino in list_of_tetrominoes]
+T, LONG = NAMES.index("hat"), NAMES.index("long")
+# What a piece can do to (black squares - white squares) it covers, by the column parity
+PARITY = {kind: {0} for kind in range(len(NAMES))}
+PARITY[T] = {0, 2, -2}
+PARITY[LONG] = {0, 4, -4}
+PARITY[NAMES.index("left_gun")] = PARITY[NAMES.index("right_gun")] = {2, -2}
+
+MEMO_VERSION = 1
+
+
+class PerfectClearSolver(object):
+    """Finds perfect clears on boards `width` x `height`, remembering at most `size` sub-boards"""
+
+    def __init__(self, width=10, height=22, size=1 << 18, path=memofile):
+        self.packing = Bitboards(width, height)
+        self.path = path
+        self.table = TranspositionTable(size)
+        self.nodes = 0
+        self.pruned = 0
+        # The distinct rotations of every tetromino: the same squares in another box are the same placement
+        self.rotations = []
+        for tetromino in list_of_tetrominoes:
+            rotations, seen = [], set()
+            for rotation in range(4):
+                shape = rotate(tetromino.shape, rotation)
+                bits = self.packing.piece(shape)[0]
+                if bits not in seen:
+                    seen.add(bits)
+                    rotations.append((rotation, shape))
+            self.rotations.append(rotations)
+        packing = self.packing
+        self.columns = [sum(packing.bit(y, x) for y in range(height)) for x in range(width)]
+        self.black = sum(self.columns[0::2]) # Black squares: the even columns
+        if path:
+            self.load()
+
+    def area(self, lines):
+        """ The squares of the bottom `lines` rows """
+        packing = self.packing
+        return packing.cells & ~((1 << (packing.height - lines) * packing.row) - 1)
+
+    def solve_matris(self, matris, lines=4):
+        """ A perfect clear of the board of `matris` with its falling and next tetrominoes """
+        board = self.packing.from_matrix(matris.matrix)
+        pieces = (matris.current_tetromino,) + tuple(matris.next_tetrominoes)
+        return self.solve(board, [NAMES.index(tetromino.name) for tetromino in pieces], lines)
+
+    def hint(self, matris, lines=4):
+        """ The (rotation, y, x) to drop the falling tetromino of `matris` at on the way to a perfect clear, or None """
+        solution = self.solve_matris(matris, lines)
+        return solution[0] if solution else None
+
+    def solve(self, board, pieces, lines=4):
+        """
+        The (rotation, y, x) of the pieces of `pieces` (indices in `list_of_tetrominoes`), in order,
+        that leave `board` empty without stacking above its bottom `lines` rows; None if there are none
+        """
+        board, cleared = self.packing.clear(board)
+        lines -= cleared
+        if lines < 0 or board & ~self.area(lines):
+            return None
+        solution = self.search(board, tuple(pieces), lines)
+        return None if solution is None else [tuple(placement) for placement in solution]
+
+    def search(self, board, pieces, lines):
+        if not board:
+            return []
+        area = self.area(lines)
+        empty = (area & ~board).bit_count()
+        needed = empty // 4
+        if empty % 4 or needed > len(pieces) or not self.feasible(board, pieces[:needed], lines):
+            self.pruned += 1
+            return None
+
+        pieces = pieces[:needed] # The others won't be placed, they don't make the problem any different
+        key = "{:x}/{}/{}".format(board, "".join(map(str, pieces)), lines)
+        known = self.table.get(key, False)
+        if known is not False:
+            return known
+
+        self.nodes += 1
+        packing = self.packing
+        row = packing.row
+        solution = None
+        for rotation, shape in self.rotations[pieces[0]]:
+            bits, top, first = packing.piece(shape)
+            landed = packing.landings(board, shape, 0) & area
+            while landed and solution is None:
+                position = (landed & -landed).bit_length() - 1
+                landed &= landed - 1
+                # Landed in the area, the whole tetromino is in it: its other squares are lower
+                placed = bits << position
+                if self.covers(placed, board, lines):
+                    continue
+                cleared, count = packing.clear(board | placed)
+                rest = self.search(cleared, pieces[1:], lines - count)
+                if rest is not None:
+                    y, x = divmod(position, row)
+                    solution = [(rotation, y - top, x - 1 - first)] + rest
+            if solution is not None:
+                break
+        self.table.put(key, solution)
+        return solution
+
+    def covers(self, piece, board, lines):
+        """ Does `piece` leave empty squares of `board` under it, in the bottom `lines` rows? """
+        row = self.packing.row
+        covered = piece << row
+        shift = row
+        while shift < lines*row:
+            covered |= covered << shift
+            shift <<= 1
+        return bool(covered & ~(board | piece) & self.packing.cells)
+
+    def feasible(self, board, pieces, lines):
+        """ Can `pieces` still fill the empty squares of the bottom `lines` rows, as far as parity and full columns tell? """
+        packing = self.packing
+        empty = self.area(lines) & ~board
+        difference = (empty & self.black).bit_count() - (empty & ~self.black).bit_count()
+        reachable = {0}
+        for kind in pieces:
+            reachable = {total + change for total in reachable for change in PARITY[kind]}
+        if difference not in reachable:
+            return False
+
+        # Columns full in every row of the area wall the sides between them off
+        walls = packing.squares
+        for y in range(packing.height - lines, packing.height):
+            walls &= board >> y*packing.row
+        side = 0
+        for x in range(packing.width + 1):
+            if x == packing.width or walls & packing.bit(0, x):
+                if (empty & side).bit_count() % 4:
+                    return False
+                side = 0
+            else:
+                side |= self.columns[x]
+        return True
+
+    def challenge(self, rng, lines=4, placed=4, extra=1, tries=1000):
+        """
+        A training problem, found with `rng`: (board, pieces, solution) with `placed` tetrominoes
+        dropped at random in the bottom `lines` rows, and the pieces to clear them, `extra` more than needed
+        """
+        packing = self.packing
+        area = self.area(lines)
+        for attempt in range(tries):
+            board = 0
+            for piece in range(placed):
+                rotation, shape = rng.choice(self.rotations[rng.randrange(len(NAMES))])
+                bits = packing.piece(shape)[0]
+                landed = packing.landings(board, shape, 0) & area
+                positions = [position for position in range(landed.bit_length())
+                             if landed >> position & 1 and not self.covers(bits << position, board, lines)]
+                if not positions:
+                    break
+                board |= bits << rng.choice(positions)
+            if not board or packing.full_rows(board):
+                continue
+            needed = (area & ~board).bit_count() // 4
+            pieces = [rng.randrange(len(NAMES)) for piece in range(needed + extra)]
+            solution = self.solve(board, pieces, lines)
+            if solution is not None:
+                return board, pieces, solution
+        return None
+
+    def stats(self):
+        """ The stats of the memo, with the nodes searched and pruned """
+        stats = self.table.stats()
+        stats.update(nodes=self.nodes, pruned=self.pruned)
+        return stats
+
+    def load(self):
+        try:
+            with open(self.path) as file:
+                memo = json.load(file)
+        except (IOError, ValueError):
+            return
+        if memo.get("version") != MEMO_VERSION or memo.get("size") != [self.packing.width, self.packing.height]:
+            return
+        for key, solution in memo["boards"]:
+            self.table.put(key, solution)
+
+    def save(self):
+        """ Writes the sub-boards remembered to `self.path`, for the next run """
+        memo = {"version": MEMO_VERSION, "size": [self.packing.width, self.packing.height],
+                "boards": list(self.table.entries.items())}
+        with open(self.path, 'w') as file:
+            json.dump(memo, file)
+
+
+def benchmark(problems=200, seed=17):
+    """ Times random 4-line problems searched from scratch, then from the memo as a new run would read it """
+    import random
+    import tempfile
+    import time
+
+    path = os.path.join(tempfile.mkdtemp(), "perfectclears")
+    solver = PerfectClearSolver(path=path)
+    rng = random.Random(seed)
+    found = [solver.challenge(rng) for problem in range(problems)]
+    timings = []
+    for memo in (False, True):
+        solver.table.clear()
+        if memo:
+            solver.load()
+        start = time.perf_counter()
+        for board, pieces, solution in found:
+            solver.solve(board, pieces)
+        timings.append((time.perf_counter() - start) / problems * 1e3)
+        solver.save()
+    os.remove(path)
+    print("{} 4-line perfect clears; {:.2f} ms each searching, {:.3f} ms from the memo on disk".format(
+        problems, *timings))
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,107 @@
+"""
+Every placement of a tetromino, found and scored in one NumPy pass.
+
+    found = placements(board, tetromino)
+    found.scores[i]          the score of dropping rotation found.rotation[i] in column found.x[i]
+
+For each rotation of the tetromino and each column it fits in, the tetromino is dropped
+straight down from `start`, like `bot.placements` does one by one. Here the landing rows
+come from a table of the next occupied square below every square of the board, and the
+boards they leave behind are stacked in one (P, H, W) array, so the lines, heights,
+holes and bumpiness of all ~34 placements are a few array operations. The scores use
+the weights of `bot`.
+
+Needs NumPy, like `tetris.env`.
+"""
+from collections import namedtuple
+
+from .env import np, MASKS
+from .tetrominoes import list_of_tetrominoes
+from .bot import HEIGHT_WEIGHT, LINES_WEIGHT, HOLES_WEIGHT, BUMPINESS_WEIGHT
+
+Placements = namedtuple("Placements", "rotation x y boards lines heights holes bumpiness scores")
+
+
+def shape_cells():
+    """ The (tetromino, rotation, 4 squares, (dy, dx)) offsets of the squares of every rotation """
+    kinds, rotations, dy, dx = np.nonzero(MASKS)
+    return np.stack([dy, dx], axis=-1).reshape(MASKS.shape[0], 4, 4, 2)
+
+
+CELLS = shape_cells()
+
+
+def candidates(kind, width):
+    """ The (rotation, x) of every column each rotation of tetromino `kind` fits in on a board `width` wide """
+    rotation, x = [], []
+    for turn in range(4):
+        columns = CELLS[kind, turn, :, 1]
+        for column in range(-columns.min(), width - columns.max()):
+            rotation.append(turn)
+            x.append(column)
+    return np.array(rotation), np.array(x)
+
+
+def placements(board, tetromino, start=0):
+    """
+    The placements of `tetromino` (a `Tetromino` or its index in `list_of_tetrominoes`) dropped from row
+    `start` of `board`, a (H, W) array of occupied squares; those that don't fit at `start` are left out
+    """
+    board = np.asarray(board, dtype=bool)
+    height, width = board.shape
+    kind = tetromino if isinstance(tetromino, (int, np.integer)) else list_of_tetrominoes.index(tetromino)
+    rotation, x = candidates(kind, width)
+    cells = CELLS[kind, rotation] # (P, 4, 2)
+    columns = x[:, None] + cells[:, :, 1]
+    rows = start + cells[:, :, 0]
+
+    # Below[r, c]: the first occupied row at or below row r of column c, `height` if there is none
+    occupied = np.where(board, np.arange(height)[:, None], height)
+    below = np.minimum.accumulate(np.vstack([occupied, np.full((1, width), height)])[::-1], axis=0)[::-1]
+
+    # The squares are in the board, placements that can't start overlapping a block are out
+    fits = (rows < height).all(axis=1)
+    fits[fits] = ~board[rows[fits], columns[fits]].any(axis=1)
+    rotation, x, cells, rows, columns = rotation[fits], x[fits], cells[fits], rows[fits], columns[fits]
+
+    # Every square can fall until the next block of its column, the tetromino as far as its shortest fall
+    y = start + (below[rows, columns] - 1 - rows).min(axis=1)
+    count = len(x)
+    boards = np.repeat(board[None], count, axis=0)
+    boards[np.arange(count)[:, None], y[:, None] + cells[:, :, 0], columns] = True
+
+    # The full lines are sorted to the top of their board and emptied
+    full = boards.all(axis=2)
+    lines = full.sum(axis=1)
+    if lines.any():
+        order = np.argsort(~full, axis=1, kind='stable')
+        boards = np.take_along_axis(boards, order[:, :, None], axis=1)
+        boards[np.arange(height) < lines[:, None]] = False
+
+    filled = boards.any(axis=1)
+    heights = np.where(filled, height - boards.argmax(axis=1), 0)
+    holes = (heights - boards.sum(axis=1)).sum(axis=1)
+    bumpiness = np.abs(np.diff(heights, axis=1)).sum(axis=1)
+    scores = (HEIGHT_WEIGHT * heights.sum(axis=1) + LINES_WEIGHT * lines +
+              HOLES_WEIGHT * holes + BUMPINESS_WEIGHT * bumpiness)
+    return Placements(rotation, x, y, boards, lines, heights, holes, bumpiness, scores)
+
+
+def matris_board(matris):
+    """ The matrix of `matris` as a (H, W) array of occupied squares """
+    layout = matris.layout
+    board = np.zeros((layout.matrix_height, layout.matrix_width), dtype=bool)
+    for (y, x), square in matris.matrix.items():
+        if square is not None:
+            board[y, x] = True
+    return board
+
+
+def best_placement(matris):
+    """ `bot.best_placement`, from one pass over all the placements """
+    found = placements(matris_board(matris), matris.current_tetromino, matris.tetromino_position[0])
+    if not len(found.x):
+        return None
+    # Like `max` over (score, rotation, x) tuples, the last of the best ones
+    best = len(found.x) - 1 - found.scores[::-1].argmax()
+    return int(found.rotation[best]), int(found.x[best])
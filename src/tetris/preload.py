@@ -0,0 +1,44 @@
+"""
+Background asset preloading.
+
+The menu leaves the process mostly idle, so the assets a game needs (sounds, block
+textures, backgrounds, the score file) are warmed on a background thread while it
+is shown. Tasks only fill caches; anything not warmed yet is simply loaded on demand.
+"""
+import threading
+
+
+class Preloader(threading.Thread):
+    """Runs `(priority, name, func)` tasks in order of priority, lowest first"""
+
+    def __init__(self, tasks):
+        threading.Thread.__init__(self, name="tetris-preloader", daemon=True)
+        self.tasks = sorted(tasks, key=lambda task: task[0])
+        self.completed = 0
+        self.current = None
+        self.errors = []
+        self.finished = threading.Event()
+
+    def run(self):
+        for priority, name, func in self.tasks:
+            self.current = name
+            try:
+                func()
+            except Exception as error:
+                # A missing asset is loaded (and handled) on demand later on
+                self.errors.append((name, error))
+            self.completed += 1
+        self.current = None
+        self.finished.set()
+
+    def progress(self):
+        """ Returns how much of the work is done, from 0.0 to 1.0 """
+        return self.completed / len(self.tasks) if self.tasks else 1.0
+
+    @property
+    def done(self):
+        return self.finished.is_set()
+
+    def wait(self, timeout=None):
+        """Block until all tasks ran; returns False if `timeout` expired first"""
+        return self.finished.wait(timeout)
@@ -0,0 +1,130 @@
+"""
+Frame-time profiler for the game loop.
+
+Every frame is split into the phases of `Game.main`/`Game.redraw`, the last few
+hundred frames are kept in a ring buffer, and an overlay (toggled with F3) shows
+the rolling percentiles and a small frame-time graph.
+"""
+import collections
+import csv
+from time import perf_counter
+
+import pygame
+from pygame import Rect, Surface
+
+PHASES = ('update', 'draw_surface', 'blit_info', 'blit_next_tetromino', 'flip')
+
+PHASE_COLORS = {'update':              (105, 105, 255),
+                'draw_surface':        (22, 181, 64),
+                'blit_info':           (245, 144, 12),
+                'blit_next_tetromino': (242, 41, 195),
+                'flip':                (10, 255, 226)}
+
+OVERLAY_SIZE = (260, 200)
+OVERLAY_BGCOLOR = (15, 15, 20)
+TEXTCOLOR = (255, 255, 255)
+BUDGET_COLOR = (204, 22, 22)
+
+
+def percentile(sorted_values, fraction):
+    """ Returns the value at `fraction` (0..1) of an already sorted list """
+    if not sorted_values:
+        return 0.0
+    return sorted_values[int(round(fraction * (len(sorted_values) - 1)))]
+
+
+class FrameProfiler(object):
+    """Records the time spent in every phase of the last `size` frames"""
+
+    def __init__(self, size=300, budget=1/50.):
+        self.frames = collections.deque(maxlen=size)
+        self.frame_number = 0
+        self.budget = budget # Frame time that is drawn as a red line in the graph
+        self.visible = False
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self._last = perf_counter()
+        self._font = None
+        self._surface = None
+
+    def toggle(self):
+        self.visible = not self.visible
+
+    def start(self):
+        """Starts a new frame; time passed since the last call to `lap` is not counted"""
+        for phase in PHASES:
+            self.current[phase] = 0.0
+        self._last = perf_counter()
+
+    def lap(self, phase):
+        """Adds the time passed since the previous lap (or `start`) to `phase`"""
+        now = perf_counter()
+        self.current[phase] += now - self._last
+        self._last = now
+
+    def skip(self):
+        """Forget the time passed since the previous lap, e.g. time spent drawing the overlay"""
+        self._last = perf_counter()
+
+    def end(self):
+        self.frame_number += 1
+        self.frames.append((self.frame_number,) + tuple(self.current[phase] for phase in PHASES))
+
+    def totals(self):
+        return [sum(frame[1:]) for frame in self.frames]
+
+    def percentiles(self, fractions=(0.5, 0.95, 0.99)):
+        """ Returns the frame-time percentiles, in seconds, over the ring buffer """
+        totals = sorted(self.totals())
+        return [percentile(totals, fraction) for fraction in fractions]
+
+    def draw(self, surface, position):
+        """Draws the overlay onto `surface` with its top left corner at `position`"""
+        if self._surface is None:
+            self._surface = Surface(OVERLAY_SIZE)
+            self._font = pygame.font.Font(None, 20)
+        overlay = self._surface
+        font = self._font
+        width, height = OVERLAY_SIZE
+        overlay.fill(OVERLAY_BGCOLOR)
+
+        last = self.frames[-1] if self.frames else (0,) + (0.0,)*len(PHASES)
+        top = 4
+        for phase, duration in zip(PHASES, last[1:]):
+            pygame.draw.rect(overlay, PHASE_COLORS[phase], Rect(4, top + 3, 8, 8))
+            overlay.blit(font.render(phase, True, TEXTCOLOR), (16, top))
+            text = font.render("{:.2f} ms".format(duration * 1000), True, TEXTCOLOR)
+            overlay.blit(text, text.get_rect(top=top, right=width-4))
+            top += 16
+
+        p50, p95, p99 = self.percentiles()
+        text = "p50 {:.1f}  p95 {:.1f}  p99 {:.1f} ms".format(p50*1000, p95*1000, p99*1000)
+        overlay.blit(font.render(text, True, TEXTCOLOR), (4, top + 2))
+        top += 20
+
+        # Frame-time graph, one stacked bar per frame, the newest on the right
+        graph = Rect(4, top, width-8, height-top-4)
+        scale = graph.height / (self.budget * 2)
+        for i, frame in enumerate(reversed(self.frames)):
+            x = graph.right - 1 - i
+            if x < graph.left:
+                break
+            bottom = graph.bottom
+            for phase, duration in zip(PHASES, frame[1:]):
+                bar = min(int(duration * scale + 0.5), bottom - graph.top)
+                if bar:
+                    pygame.draw.line(overlay, PHASE_COLORS[phase], (x, bottom - 1), (x, bottom - bar))
+                    bottom -= bar
+        budget_y = graph.bottom - int(self.budget * scale)
+        pygame.draw.line(overlay, BUDGET_COLOR, (graph.left, budget_y), (graph.right, budget_y))
+
+        surface.blit(overlay, position)
+        return overlay.get_rect(topleft=position)
+
+    def dump_csv(self, path):
+        """Writes the ring buffer to `path`, one row per frame, durations in milliseconds"""
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(('frame',) + tuple(phase + '_ms' for phase in PHASES) + ('total_ms',))
+            for frame in self.frames:
+                durations = [duration * 1000 for duration in frame[1:]]
+                writer.writerow([frame[0]] + ["{:.4f}".format(d) for d in durations + [sum(durations)]])
@@ -0,0 +1,83 @@
+"""
+The rewind of practice games: the last placements, to take back.
+
+`Matris.lock_tetromino` records the game in a `RewindBuffer` every time a new tetromino
+comes in, as a `savegame` of a few kilobytes. The records go round a `bytearray`
+allocated once for all of them, so however long the session, the memory used stays
+the same, and going back any number of placements is one `savegame.loads`.
+"""
+from . import savegame
+
+DEFAULT_PLACEMENTS = 100
+
+
+class RewindBuffer(object):
+    """The game as it was before each of the last `placements` placements"""
+
+    def __init__(self, placements=DEFAULT_PLACEMENTS):
+        self.placements = placements
+        self.slots = placements + 1 # And the game as it is now
+        self.record_size = 0
+        self.buffer = bytearray()
+        self.newest = -1 # Slot of the latest record
+        self.count = 0 # Records kept
+        self.recorded = 0
+        self.rewound = 0
+
+    def __len__(self):
+        """ The placements that can be taken back """
+        return max(self.count - 1, 0)
+
+    def record(self, matris):
+        """ Keeps the state of `matris`, forgetting the oldest record when it's full """
+        data = savegame.dumps(matris)
+        size = len(data)
+        if size != self.record_size:
+            # The first record, or another board: a record is the same size as long as the board is
+            self.record_size = size
+            self.buffer = bytearray(size * self.slots)
+            self.count = 0
+        self.newest = (self.newest + 1) % self.slots
+        start = self.newest * size
+        self.buffer[start:start+size] = data
+        self.count = min(self.count + 1, self.slots)
+        self.recorded += 1
+
+    def rewind(self, matris, placements=1):
+        """
+        Puts `matris` back as it was `placements` placements ago, at most as far back as the records go,
+        0 for the latest record; returns how many placements were taken back, None if there was no record
+        """
+        if not self.count:
+            return None
+        placements = min(placements, self.count - 1)
+        self.newest = (self.newest - placements) % self.slots
+        self.count -= placements
+        start = self.newest * self.record_size
+        savegame.loads(matris, memoryview(self.buffer)[start:start+self.record_size])
+        self.rewound += placements
+        return placements
+
+    def memory(self):
+        """ The bytes taken by the records, all allocated up front """
+        return len(self.buffer)
+
+    def report(self):
+        return "Rewind: {} of the last {} placements kept, {:.1f} KB; {} recorded, {} taken back".format(
+            len(self), self.placements, self.memory() / 1024., self.recorded, self.rewound)
+
+
+def benchmark(placements=DEFAULT_PLACEMENTS, seed=23, number=2000):
+    """ Times a rewind of a mid-game board, and tells the memory the buffer takes """
+    import timeit
+    from .bench import make_matris
+
+    matris = make_matris(seed)
+    buffer = RewindBuffer(placements)
+    buffer.record(matris)
+    seconds = timeit.timeit(lambda: buffer.rewind(matris, 0), number=number) / number
+    print("{}, a rewind takes {:.1f} us".format(buffer.report(), seconds * 1e6))
+
+
+if __name__ == '__main__':
+    benchmark()
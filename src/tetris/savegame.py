@@ -0,0 +1,165 @@
+"""
+Saved games: a `Matris` packed into a few kilobytes of bytes, and back.
+
+    data = dumps(matris)
+    loads(matris, data)       # `matris` is where the game was, board colors and pieces to come included
+
+The format is a fixed header made with `struct` (the numbers of the game, the falling
+tetromino, the timers and flags), then the kinds of the next tetrominoes, the state of
+the piece generator and one byte per square of the board, the index of its color in
+`COLORS` plus one, 0 for empty. The textures of the blocks aren't saved: they are random
+variants of their color anyway, and get picked again on loading.
+
+The game writes one to `savefile` when its window is closed, or when it crashes, and
+picks up from there the next time a game starts.
+"""
+import os
+import struct
+from operator import itemgetter
+
+from .tetrominoes import list_of_tetrominoes
+
+savefile = os.path.join(os.path.dirname(__file__), ".savegame")
+
+MAGIC = b"TSAV"
+VERSION = 3 # 1 had the board size in bytes, too small for `Layout.parse`; 2 had the held arrow keys
+# The colors of the tetrominoes, then the garbage of versus games (`GARBAGE_COLOR`)
+COLORS = tuple(tetromino.color for tetromino in list_of_tetrominoes) + ('grey',)
+CODES = {color: code for code, color in enumerate(COLORS, 1)}
+
+HEADER = struct.Struct(
+    "<4sBHHH"   # magic, version, width, height, number of next tetrominoes
+    "QIIIQ"     # score, level, lines, combo, board hash
+    "BBhh"      # falling tetromino: kind, rotation, y, x
+    "HHB"       # pending garbage, garbage sent, flags
+    "dd"        # downwards timer, pause timer
+    "Bd")       # the generator: is a gauss value pending, that value
+RANDOM = struct.Struct("<625I") # The Mersenne Twister state of `random.Random.getstate`, 624 words and the index
+
+# The flags, one bit each
+PAUSED, HIGHSCORE_SOUND, HARD_DROP = (1 << bit for bit in range(3))
+
+_squares = {}
+_blocks = {} # The squares of each color by block size, code 0 is an empty one
+
+
+def squares(width, height):
+    """ A getter of the squares of a `Matris.matrix` of that size in row order, and their keys """
+    if (width, height) not in _squares:
+        keys = [(y, x) for y in range(height) for x in range(width)]
+        _squares[(width, height)] = (itemgetter(*keys), keys)
+    return _squares[(width, height)]
+
+
+def dumps(matris):
+    """ The state of `matris` as bytes """
+    layout = matris.layout
+    width, height = layout.matrix_width, layout.matrix_height
+    kinds = list_of_tetrominoes.index
+    version, words, gauss = matris.random.getstate()
+    flags = (PAUSED * bool(matris.paused) | HIGHSCORE_SOUND * bool(matris.played_highscorebeaten_sound) |
+             HARD_DROP * bool(matris.hard_drop_occurred))
+    y, x = matris.tetromino_position
+    header = HEADER.pack(
+        MAGIC, VERSION, width, height, len(matris.next_tetrominoes),
+        matris.score, matris.level, matris.lines, matris.combo, matris.board_hash,
+        kinds(matris.current_tetromino), matris.tetromino_rotation, y, x,
+        matris.pending_garbage, matris.garbage_sent, flags,
+        matris.downwards_timer, matris.pause_timer,
+        gauss is not None, gauss or 0.)
+    board = bytes([0 if square is None else CODES[square[2]] for square in squares(width, height)[0](matris.matrix)])
+    return b"".join((header, bytes(map(kinds, matris.next_tetrominoes)), RANDOM.pack(*words), board))
+
+
+def loads(matris, data):
+    """ Puts `matris` in the state of `data`, from `dumps`; raises ValueError if it isn't one for its board """
+    layout = matris.layout
+    width, height = layout.matrix_width, layout.matrix_height
+    try:
+        (magic, version, saved_width, saved_height, preview,
+         score, level, lines, combo, board_hash,
+         kind, rotation, y, x, pending_garbage, garbage_sent, flags,
+         downwards_timer, pause_timer,
+         has_gauss, gauss) = HEADER.unpack_from(data)
+    except struct.error:
+        raise ValueError("not a saved game, it's too short") from None
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a saved game of this version")
+    if (saved_width, saved_height) != (width, height):
+        raise ValueError("the game was saved on a {}x{} board, not {}x{}".format(
+            saved_width, saved_height - 2, width, height - 2))
+    offset = HEADER.size + preview
+    if len(data) != offset + RANDOM.size + width * height:
+        raise ValueError("the saved game is {} bytes, not {}".format(len(data), offset + RANDOM.size + width * height))
+    # Checked before `matris` is touched, so it's left as it was when the data is broken
+    next_kinds = data[HEADER.size:offset]
+    board = data[offset + RANDOM.size:]
+    if (not preview or max(next_kinds) >= len(list_of_tetrominoes) or kind >= len(list_of_tetrominoes) or
+            rotation > 3 or max(board) > len(COLORS)):
+        raise ValueError("not a saved game, its tetrominoes or colors are out of range")
+    matris.random.setstate((3, RANDOM.unpack_from(data, offset), gauss if has_gauss else None))
+
+    blocksize = layout.blocksize
+    if blocksize not in _blocks:
+        _blocks[blocksize] = [None] + [('block', matris.block(color), color) for color in COLORS]
+    pieces = _blocks[blocksize]
+    getter, keys = squares(width, height)
+    matris.matrix = dict(zip(keys, map(pieces.__getitem__, board)))
+
+    matris.next_tetrominoes = tuple(list_of_tetrominoes[kind] for kind in next_kinds)
+    matris.next_tetromino = matris.next_tetrominoes[0]
+    matris.current_tetromino = tetromino = list_of_tetrominoes[kind]
+    matris.tetromino_rotation = rotation
+    matris.tetromino_position = (y, x)
+    matris.tetromino_block = matris.block(tetromino.color)
+    matris.shadow_block = matris.block(tetromino.color, shadow=True)
+
+    matris.score, matris.level, matris.lines, matris.combo = score, level, lines, combo
+    matris.board_hash = board_hash
+    matris.pending_garbage, matris.garbage_sent = pending_garbage, garbage_sent
+    matris.paused = bool(flags & PAUSED)
+    matris.played_highscorebeaten_sound = bool(flags & HIGHSCORE_SOUND)
+    matris.hard_drop_occurred = bool(flags & HARD_DROP)
+    matris.downwards_timer, matris.pause_timer = downwards_timer, pause_timer
+    # The arrow keys held then aren't held now, the piece mustn't slide on its own
+    matris.movement_keys = {'left': 0, 'right': 0}
+    matris.movement_keys_timer = -matris.movement_keys_speed * 2
+
+
+def save(matris, path=savefile):
+    """ Writes the state of `matris` to `path`, through a temporary file so a crash can't leave half of it """
+    temporary = path + ".tmp"
+    with open(temporary, 'wb') as file:
+        file.write(dumps(matris))
+    os.replace(temporary, path)
+
+
+def resume(matris, path=savefile):
+    """
+    Loads the game saved at `path` into `matris` and deletes it; False if there is none it can load,
+    and then the file stays: it may be the game of another board size, to resume with that size
+    """
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+        loads(matris, data)
+    except (IOError, ValueError):
+        return False
+    os.remove(path)
+    return True
+
+
+def benchmark(seed=21, number=2000):
+    """ Times `dumps` and `loads` of a mid-game board """
+    import timeit
+    from .bench import make_matris
+
+    matris = make_matris(seed, preview=3)
+    data = dumps(matris)
+    encode = timeit.timeit(lambda: dumps(matris), number=number) / number * 1e6
+    decode = timeit.timeit(lambda: loads(matris, data), number=number) / number * 1e6
+    print("{} bytes; dumps {:.1f} us, loads {:.1f} us".format(len(data), encode, decode))
+
+
+if __name__ == '__main__':
+    benchmark()
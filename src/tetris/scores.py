@@ -2,31 +2,36 @@ import os
 
 scorefile = os.path.join(os.path.dirname(__file__), ".highscores")
 
+_scores = None # All scores, highest first; the file is only read once
+
+def read_scores():
+    """ Returns all the scores, highest first, reading the score file on the first call only """
+    global _scores
+    if _scores is None:
+        try:
+            with open(scorefile) as file:
+                scores = sorted([int(score.strip())
+                                 for score in file.readlines()
+                                 if score.strip().isdigit()], reverse=True)
+        except IOError:
+            scores = []
+        _scores = scores
+    return _scores
+
 def load_score():
     """ Returns the highest score, or 0 if no one has scored yet """
-    try:
-        with open(scorefile) as file:
-            scores = sorted([int(score.strip())
-                             for score in file.readlines()
-                             if score.strip().isdigit()], reverse=True)
-    except IOError:
-        scores = []
-
+    scores = read_scores()
     return scores[0] if scores else 0
 
 def load_high_scores(count=5):
     """ Returns the top 'count' high scores, or empty list if no scores yet """
-    try:
-        with open(scorefile) as file:
-            scores = sorted([int(score.strip())
-                             for score in file.readlines()
-                             if score.strip().isdigit()], reverse=True)
-    except IOError:
-        scores = []
-
-    return scores[:count] if scores else []
+    return read_scores()[:count]
 
 def write_score(score):
+    global _scores
     assert str(score).isdigit()
     with open(scorefile, 'a') as file:
         file.write("{}\n".format(score))
+    if _scores is not None:
+        # A new list rather than an insort, readers on other threads may hold the old one
+        _scores = sorted(_scores + [int(score)], reverse=True)
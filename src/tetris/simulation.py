@@ -0,0 +1,94 @@
+"""
+Game logic on its own thread, for `tetris --sim-thread`.
+
+`SimulationThread` steps a `Matris` at a fixed tick rate and, whenever the board
+changed, publishes an immutable `Snapshot` of it. Publishing is a single attribute
+assignment and the renderer only ever reads the latest snapshot, so neither side
+waits for the other: a slow `flip` can't delay gravity or input, and a slow tick
+can't stall the display. Input goes the other way through a `SimpleQueue`, since
+only the main thread may pump pygame events. The main thread sleeps on the event queue
+while the game is paused, so the simulation calls `wake` when it has something to show
+then, or when it ends.
+"""
+import collections
+import queue
+import threading
+from time import perf_counter, sleep
+
+Snapshot = collections.namedtuple("Snapshot", [
+    "tick",
+    "blocks",                    # ((x, y, surface, color), ...) of the squares occupied in the matrix
+    "tetromino", "rotation", "next_tetromino", "next_tetrominoes",
+    "shape", "position", "shadow_position", "tetromino_block", "shadow_block",
+    "score", "level", "lines", "combo",
+    "paused", "pause_timer",
+])
+
+MAX_CATCH_UP_TICKS = 5 # After a long stall, drop time rather than fast-forwarding the game
+
+
+class SimulationThread(threading.Thread):
+    """
+    Runs `matris.update` every 1/`rate` seconds with the input pushed by the main thread; `wake`,
+    if given, is called from this thread on a new snapshot of a paused game and when it finishes
+    """
+
+    def __init__(self, matris, rate=100, wake=None):
+        threading.Thread.__init__(self, name="tetris-simulation", daemon=True)
+        self.matris = matris
+        self.tick_length = 1. / rate
+        self.ticks = 0
+        self.inputs = queue.SimpleQueue()
+        self.soft_drop = False
+        self.latest = matris.snapshot(0)
+        self.exit_requested = False
+        self.error = None # Whatever ended the game, `GameOver` included
+        self.wake = wake
+        self._stopped = threading.Event()
+
+    def push(self, events, soft_drop):
+        """Hand the events of a frame and the state of the soft drop keys to the simulation"""
+        if events:
+            self.inputs.put(events)
+        self.soft_drop = soft_drop
+
+    def stop(self):
+        self._stopped.set()
+
+    @property
+    def finished(self):
+        return self.exit_requested or self.error is not None
+
+    def run(self):
+        next_tick = perf_counter()
+        try:
+            while not self._stopped.is_set():
+                now = perf_counter()
+                if now < next_tick:
+                    sleep(next_tick - now)
+                    continue
+                if now - next_tick > self.tick_length * MAX_CATCH_UP_TICKS:
+                    next_tick = now
+                next_tick += self.tick_length
+                self.step()
+        except SystemExit:
+            self.exit_requested = True
+        except Exception as error:
+            self.error = error
+        finally:
+            if self.wake:
+                self.wake()
+
+    def step(self):
+        events = []
+        while True:
+            try:
+                events.extend(self.inputs.get_nowait())
+            except queue.Empty:
+                break
+        self.ticks += 1
+        paused = self.matris.paused
+        if self.matris.update(self.tick_length, events, self.soft_drop):
+            self.latest = self.matris.snapshot(self.ticks)
+            if self.wake and (paused or self.matris.paused):
+                self.wake()
@@ -0,0 +1,273 @@
+"""
+Live spectator broadcast, for `tetris --spectate-port PORT`.
+
+The game publishes a `Snapshot` whenever the board changes. `BoardEncoder` turns it
+into a compact binary delta holding only the rows that changed, each one as an
+occupancy bitmask plus one color byte per occupied square, followed by the falling
+piece and the HUD values. `SpectatorServer` runs an asyncio loop on its own thread
+and fans every message out to the connected viewers. A viewer that falls behind
+has its backlog replaced by a single keyframe, so a slow viewer never slows
+down the player or the other viewers.
+
+Wire format, all integers big-endian; every message is prefixed by its u32 length:
+
+    keyframe  b'F' u32 tick  u16 width  u16 height  rows  tail
+    delta     b'D' u32 tick  rows  tail
+    rows      u16 count, then per row: u16 y, ceil(width/8) bytes little-endian mask,
+              one color index byte per set bit of the mask, lowest bit first
+    tail      see TAIL below; piece indices refer to `list_of_tetrominoes`, 255 is none
+"""
+import asyncio
+import struct
+import threading
+
+from .tetrominoes import list_of_tetrominoes
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 7432
+
+KEYFRAME = b'F'
+DELTA = b'D'
+
+COLORS = tuple(tetromino.color for tetromino in list_of_tetrominoes) + ('grey',) # Grey is versus garbage
+COLOR_INDEX = {color: index for index, color in enumerate(COLORS)}
+NO_PIECE = 255
+
+LENGTH = struct.Struct('>I')
+HEADER = struct.Struct('>cI')
+SIZE = struct.Struct('>HH')
+COUNT = struct.Struct('>H')
+ROW = struct.Struct('>H')
+# piece, rotation, y, x, shadow y, next piece, score, level, lines, combo, paused
+TAIL = struct.Struct('>BBhhhBIHIHB')
+
+
+def piece_index(tetromino):
+    return list_of_tetrominoes.index(tetromino) if tetromino is not None else NO_PIECE
+
+
+class BoardEncoder(object):
+    """Encodes snapshots of one board as keyframes and deltas against the previous snapshot"""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.mask_bytes = (width + 7) // 8
+        self.empty_rows = [self.encode_row(y, 0, b'') for y in range(height)]
+        self.rows = list(self.empty_rows)
+        self.blocks = ()
+
+    def encode_row(self, y, mask, colors):
+        return ROW.pack(y) + mask.to_bytes(self.mask_bytes, 'little') + colors
+
+    def rows_of(self, snapshot):
+        """ Returns the encoded rows of `snapshot`, one bytes object per row """
+        masks = [0] * self.height
+        squares = [[] for _ in range(self.height)]
+        for x, y, block, color in snapshot.blocks:
+            masks[y] |= 1 << x
+            squares[y].append((x, COLOR_INDEX[color]))
+        rows = list(self.empty_rows)
+        for y, mask in enumerate(masks):
+            if mask:
+                rows[y] = self.encode_row(y, mask, bytes(color for x, color in sorted(squares[y])))
+        return rows
+
+    def tail(self, snapshot):
+        y, x = snapshot.position
+        return TAIL.pack(piece_index(snapshot.tetromino), snapshot.rotation, y, x, snapshot.shadow_position[0],
+                         piece_index(snapshot.next_tetromino), snapshot.score, snapshot.level,
+                         snapshot.lines, snapshot.combo, snapshot.paused)
+
+    def delta(self, snapshot):
+        """ Returns the delta from the previous snapshot, and updates the encoder to `snapshot` """
+        if snapshot.blocks == self.blocks:
+            changed = [] # Only the piece moved, which is most ticks
+        else:
+            rows = self.rows_of(snapshot)
+            changed = [row for row, previous in zip(rows, self.rows) if row != previous]
+            self.rows, self.blocks = rows, snapshot.blocks
+        return b''.join([HEADER.pack(DELTA, snapshot.tick), COUNT.pack(len(changed))] + changed +
+                        [self.tail(snapshot)])
+
+    def keyframe(self, snapshot, rows=None):
+        """ Returns the whole state of the last snapshot passed to `delta`, or of `snapshot` and the `rows` it had """
+        rows = self.rows if rows is None else rows
+        return b''.join([HEADER.pack(KEYFRAME, snapshot.tick), SIZE.pack(self.width, self.height),
+                         COUNT.pack(len(rows))] + rows + [self.tail(snapshot)])
+
+
+class BoardDecoder(object):
+    """Applies keyframes and deltas; `squares` maps (y, x) to a color name"""
+
+    def __init__(self):
+        self.width = self.height = None
+        self.squares = {}
+        self.tick = 0
+        self.piece = None # (tetromino, rotation, y, x, shadow y) or None
+        self.next_tetromino = None
+        self.score = self.lines = 0
+        self.level = self.combo = 1
+        self.paused = False
+
+    def apply(self, message):
+        kind, self.tick = HEADER.unpack_from(message)
+        offset = HEADER.size
+        if kind == KEYFRAME:
+            self.width, self.height = SIZE.unpack_from(message, offset)
+            offset += SIZE.size
+            self.squares = {}
+        elif kind != DELTA or self.width is None:
+            raise ValueError("unexpected message {!r}".format(kind))
+
+        mask_bytes = (self.width + 7) // 8
+        count, = COUNT.unpack_from(message, offset)
+        offset += COUNT.size
+        for _ in range(count):
+            y, = ROW.unpack_from(message, offset)
+            offset += ROW.size
+            mask = int.from_bytes(message[offset:offset+mask_bytes], 'little')
+            offset += mask_bytes
+            for x in range(self.width):
+                self.squares.pop((y, x), None)
+            x = 0
+            while mask:
+                if mask & 1:
+                    self.squares[(y, x)] = COLORS[message[offset]]
+                    offset += 1
+                mask >>= 1
+                x += 1
+
+        (piece, rotation, y, x, shadow_y, next_piece,
+         self.score, self.level, self.lines, self.combo, paused) = TAIL.unpack_from(message, offset)
+        self.paused = bool(paused)
+        self.piece = (list_of_tetrominoes[piece], rotation, y, x, shadow_y) if piece != NO_PIECE else None
+        self.next_tetromino = list_of_tetrominoes[next_piece] if next_piece != NO_PIECE else None
+        return kind
+
+
+class SpectatorServer(object):
+    """Serves the published snapshots to any number of viewers over TCP, from an asyncio thread"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, queue_size=64):
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.encoder = None
+        self.latest = None # (encoder, rows, snapshot) of the last publish, for the keyframes
+        self.keyframe = None # Encoded from `latest` the first time a viewer needs it
+        self.clients = set()
+        self._writers = set() # The tasks sending to the viewers, cancelled on `stop`
+        self._resync = set() # Viewers whose next message must be a keyframe
+        self.loop = None
+        self._ready = threading.Event()
+        self._thread = None
+        self.error = None
+
+    def start(self):
+        """Start serving; returns once the port is bound (or failed to)"""
+        self._thread = threading.Thread(target=self._run, name="tetris-spectators", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self.error:
+            raise self.error
+
+    def stop(self):
+        """Disconnect the viewers, close the port and the loop; returns once its thread is done"""
+        if self.loop:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+            self.loop.close()
+            self.loop = None
+
+    def publish(self, snapshot, width, height):
+        """Encode `snapshot` of a `width`x`height` matrix and send it to every viewer; thread-safe"""
+        if self.encoder is None or (self.encoder.width, self.encoder.height) != (width, height):
+            self.encoder = BoardEncoder(width, height)
+        delta = self.encoder.delta(snapshot)
+        # `delta` replaces the rows list rather than changing it, so the loop can read this one later
+        self.loop.call_soon_threadsafe(self._fan_out, LENGTH.pack(len(delta)) + delta,
+                                       (self.encoder, self.encoder.rows, snapshot))
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self._serve, self.host, self.port))
+            self.port = self.server.sockets[0].getsockname()[1] # In case port 0 was asked for
+        except OSError as error:
+            self.error = error
+            self.loop = None
+            self._ready.set()
+            return
+        self._ready.set()
+        self.loop.run_forever()
+
+    async def _shutdown(self):
+        self.server.close()
+        for task in self._writers:
+            task.cancel()
+        await asyncio.gather(*self._writers, return_exceptions=True)
+        await self.server.wait_closed()
+
+    def current_keyframe(self):
+        """The keyframe of the last published snapshot, or None before the first one"""
+        if self.keyframe is None and self.latest:
+            encoder, rows, snapshot = self.latest
+            keyframe = encoder.keyframe(snapshot, rows)
+            self.keyframe = LENGTH.pack(len(keyframe)) + keyframe
+        return self.keyframe
+
+    def _fan_out(self, delta, latest):
+        self.latest, self.keyframe = latest, None
+        for outbox in self.clients:
+            if outbox.full():
+                # This viewer can't keep up: drop its backlog, one keyframe brings it up to date
+                while not outbox.empty():
+                    outbox.get_nowait()
+                self._resync.add(outbox)
+            if outbox in self._resync:
+                self._resync.discard(outbox)
+                outbox.put_nowait(self.current_keyframe())
+            else:
+                outbox.put_nowait(delta)
+
+    async def _serve(self, reader, writer):
+        outbox = asyncio.Queue(self.queue_size)
+        keyframe = self.current_keyframe()
+        if keyframe:
+            outbox.put_nowait(keyframe)
+        else:
+            self._resync.add(outbox) # Nothing was published yet
+        self.clients.add(outbox)
+        self._writers.add(asyncio.current_task())
+        try:
+            while True:
+                writer.write(await outbox.get())
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        except asyncio.CancelledError:
+            pass # Stopped by `stop`, the viewer is disconnected below
+        finally:
+            self.clients.discard(outbox)
+            self._resync.discard(outbox)
+            self._writers.discard(asyncio.current_task())
+            writer.close()
+
+
+def read_messages(sock):
+    """Yields the messages received on a connected socket until it is closed"""
+    buffer = bytearray()
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            return
+        buffer += data
+        while len(buffer) >= LENGTH.size:
+            length, = LENGTH.unpack_from(buffer)
+            if len(buffer) < LENGTH.size + length:
+                break
+            yield bytes(buffer[LENGTH.size:LENGTH.size+length])
+            del buffer[:LENGTH.size+length]
@@ -0,0 +1,51 @@
+"""
+Startup phases, timed for `tetris --startup-report`.
+
+The window and the first menu frame come first; everything the player can't see
+or hear yet (the mixer, the background music) is deferred until that frame has
+been flipped to the screen.
+"""
+import sys
+from time import perf_counter
+
+
+class Startup(object):
+    """Times the startup phases and runs the deferred ones after the first menu frame"""
+
+    def __init__(self, started=None, report=False, out=sys.stdout):
+        self.started = perf_counter() if started is None else started
+        self.phases = []
+        self.deferred = []
+        self.report_enabled = report
+        self.out = out
+        self.first_frame_at = None
+        self._last = self.started
+
+    def mark(self, phase):
+        """Record the time spent since the previous mark as `phase`"""
+        now = perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def defer(self, phase, func):
+        """Run `func` once the first menu frame is on screen"""
+        self.deferred.append((phase, func))
+
+    def first_frame_shown(self):
+        self.mark("first menu frame")
+        self.first_frame_at = self._last
+        deferred, self.deferred = self.deferred, []
+        for phase, func in deferred:
+            func()
+            self.mark(phase)
+        if self.report_enabled:
+            self.report()
+
+    def report(self):
+        print("Startup report", file=self.out)
+        for phase, duration in self.phases:
+            print("  {:<24} {:>8.1f} ms".format(phase, duration * 1000), file=self.out)
+        if self.first_frame_at is not None:
+            print("  {:<24} {:>8.1f} ms".format("time to first frame", (self.first_frame_at - self.started) * 1000),
+                  file=self.out)
+        print("  {:<24} {:>8.1f} ms".format("total", (self._last - self.started) * 1000), file=self.out)
@@ -0,0 +1,349 @@
+"""
+Two-player versus games between two processes, for `tetris --versus-host PORT` and
+`tetris --versus-join [HOST:]PORT`.
+
+Both processes simulate both boards. Only the input of each tick crosses the wire,
+as one byte, so a match costs a few hundred bytes per second. The remote input of a
+tick that hasn't arrived yet is predicted: presses are assumed not to happen, held
+keys are assumed to stay held. When the real input turns out different, `Lockstep`
+goes back to the state saved before that tick and simulates again up to the present.
+The game is deterministic at a fixed tick: both boards draw their pieces from a
+generator seeded by the host, and garbage lines cross over between ticks.
+
+Every lock of a board is also reported by the process that plays it, once the tick is
+final. The other side checks it against its own simulation, which catches any
+divergence.
+
+Messages, all integers big-endian:
+
+    HELLO  b'H' u8 version  u32 seed
+    INPUT  b'I' u32 tick  u8 input bits
+    LOCK   b'L' u32 tick  u8 piece  u8 rotation  i16 y  i16 x  u8 lines cleared
+    QUIT   b'Q' u32 tick
+"""
+import collections
+import contextlib
+import random
+import socket
+import struct
+
+import pygame
+
+from .tetrominoes import list_of_tetrominoes
+
+DEFAULT_HOST = '127.0.0.1'
+VERSION = 1
+
+TICK_LENGTH = 1 / 50. # The game loop runs one tick per frame
+MAX_ROLLBACK = 15 # Ticks the local game may run ahead of the remote input, 300 ms
+
+HELLO, INPUT, LOCK, QUIT = b'H', b'I', b'L', b'Q'
+MESSAGES = {
+    HELLO: struct.Struct('>cBI'),
+    INPUT: struct.Struct('>cIB'),
+    LOCK: struct.Struct('>cIBBhhB'),
+    QUIT: struct.Struct('>cI'),
+}
+
+DRAW = -1
+
+# Input bits of a tick
+LEFT, RIGHT, LEFT_UP, RIGHT_UP, ROTATE, DROP, SOFT_DROP = (1 << bit for bit in range(7))
+
+# Replayed as key events in this order, so a tap and a drop within one tick still make sense
+KEYS = ((ROTATE, pygame.KEYDOWN, pygame.K_UP),
+        (LEFT, pygame.KEYDOWN, pygame.K_LEFT),
+        (RIGHT, pygame.KEYDOWN, pygame.K_RIGHT),
+        (LEFT_UP, pygame.KEYUP, pygame.K_LEFT),
+        (RIGHT_UP, pygame.KEYUP, pygame.K_RIGHT),
+        (DROP, pygame.KEYDOWN, pygame.K_SPACE))
+ALIASES = {pygame.K_w: pygame.K_UP, pygame.K_a: pygame.K_LEFT, pygame.K_d: pygame.K_RIGHT}
+
+# The events and soft drop state replayed for every possible input byte
+EVENTS = [([pygame.event.Event(kind, key=key) for bit, kind, key in KEYS if bits & bit], bool(bits & SOFT_DROP))
+          for bits in range(SOFT_DROP << 1)]
+
+
+class DesyncError(Exception):
+    """The two processes disagree on the state of a board"""
+
+
+def encode_input(events, soft_drop):
+    """ Returns the input bits of the pygame `events` of a frame """
+    bits = SOFT_DROP if soft_drop else 0
+    for event in events:
+        if event.type == pygame.KEYDOWN or event.type == pygame.KEYUP:
+            key = ALIASES.get(event.key, event.key)
+            for bit, kind, bound in KEYS:
+                if event.type == kind and key == bound:
+                    bits |= bit
+    return bits
+
+
+def predict(bits):
+    """ The guess for the input following `bits`: no new presses, the soft drop stays as it was """
+    return bits & SOFT_DROP
+
+
+def encode_lock(lock):
+    tetromino, rotation, (y, x), lines = lock
+    return list_of_tetrominoes.index(tetromino), rotation, y, x, lines
+
+
+def decode_lock(piece, rotation, y, x, lines):
+    return list_of_tetrominoes[piece], rotation, (y, x), lines
+
+
+@contextlib.contextmanager
+def muted(boards):
+    """Silence the sounds of `boards` for the duration, e.g. while simulating ticks again"""
+    saved = [silence(board) for board in boards]
+    try:
+        yield
+    finally:
+        for board, sounds in zip(boards, saved):
+            vars(board).update(sounds)
+
+
+def silence(board):
+    """Silence the sounds of `board` for good; returns the sounds it had"""
+    sounds = {name: value for name, value in vars(board).items()
+              if name.endswith('_sound') and hasattr(value, 'play')}
+    for name in sounds:
+        setattr(board, name, _SILENT)
+    return sounds
+
+
+class _Silent(object):
+    def play(self):
+        pass
+
+_SILENT = _Silent()
+
+
+class Lockstep(object):
+    """
+    Steps the boards of both players one tick at a time, predicting the remote input and rolling
+    back when a prediction was wrong. `topped_out` is the exception raised by a board whose
+    stack reached the top.
+    """
+
+    def __init__(self, boards, local, topped_out, max_rollback=MAX_ROLLBACK):
+        self.boards = boards
+        self.local = local
+        self.remote = 1 - local
+        self.topped_out = topped_out
+        self.max_rollback = max_rollback
+        self.tick = 0 # The next tick to simulate
+        self.received = -1 # The last tick of remote input received
+        self.inputs = ({}, {}) # tick -> input bits of each player, as played
+        self.predicted = {} # tick -> remote input bits that were guessed
+        self.saved = {} # tick -> state of the boards before that tick
+        self.lost = [None, None] # The tick at which each player topped out
+        self.locks = collections.defaultdict(list) # tick -> [(player, lock), ...]
+        self.reported = collections.deque() # (tick, lock) of the remote board, to be checked
+        self.locks_sent = -1
+        self.rollback_from = None
+        self.rollbacks = 0
+        self.resimulated = 0
+
+    @property
+    def confirmed(self):
+        """The last tick simulated with the real input of both players"""
+        return min(self.received, self.tick - 1)
+
+    @property
+    def stalled(self):
+        return self.tick - self.received > self.max_rollback
+
+    @property
+    def result(self):
+        """None while the match is on, else the winning player or `DRAW`"""
+        confirmed = self.confirmed
+        lost = [tick for tick in self.lost if tick is not None and tick <= confirmed]
+        if not lost:
+            return None
+        losers = [player for player, tick in enumerate(self.lost) if tick == min(lost)]
+        return DRAW if len(losers) == 2 else 1 - losers[0]
+
+    def receive(self, tick, bits):
+        """Input of the remote player for `tick`, in order"""
+        self.inputs[self.remote][tick] = bits
+        self.received = tick
+        if tick in self.predicted and self.predicted.pop(tick) != bits:
+            if self.rollback_from is None or tick < self.rollback_from:
+                self.rollback_from = tick
+
+    def advance(self, bits):
+        """Simulate the next tick with the local input `bits`; False while waiting for the remote input"""
+        self.rollback()
+        if self.stalled:
+            return False
+        self.inputs[self.local][self.tick] = bits
+        self.simulate(self.tick)
+        self.tick += 1
+        self.forget()
+        return True
+
+    def rollback(self):
+        if self.rollback_from is None:
+            return
+        tick, self.rollback_from = self.rollback_from, None
+        states, lost = self.saved[tick]
+        for board, state in zip(self.boards, states):
+            board.load_state(state)
+        self.lost = list(lost)
+        self.rollbacks += 1
+        with muted(self.boards):
+            for tick in range(tick, self.tick):
+                self.simulate(tick)
+                self.resimulated += 1
+
+    def simulate(self, tick):
+        self.saved[tick] = ([board.save_state() for board in self.boards], tuple(self.lost))
+        self.locks.pop(tick, None)
+        for player, board in enumerate(self.boards):
+            bits = self.inputs[player].get(tick)
+            if bits is None:
+                # Only the remote input can be missing, and only for ticks after `received`
+                bits = self.predicted[tick] = predict(self.inputs[player].get(self.received, 0))
+            if self.lost[player] is not None:
+                continue
+            events, soft_drop = EVENTS[bits]
+            board.last_lock = None
+            try:
+                board.update(TICK_LENGTH, events, soft_drop)
+            except self.topped_out:
+                self.lost[player] = tick
+            if board.last_lock:
+                self.locks[tick].append((player, board.last_lock))
+
+        # Garbage crosses over once both boards moved, so the order of the boards doesn't matter
+        for player, board in enumerate(self.boards):
+            if board.garbage_sent:
+                self.boards[1 - player].pending_garbage += board.garbage_sent
+                board.garbage_sent = 0
+
+    def forget(self):
+        """Drop what no rollback can need anymore, and check the reported locks of final ticks"""
+        confirmed = self.confirmed
+        for tick in [tick for tick in self.saved if tick <= confirmed]:
+            del self.saved[tick]
+            self.predicted.pop(tick, None)
+            for inputs in self.inputs:
+                # The last received input is kept, the predictions are based on it
+                if tick < self.received:
+                    inputs.pop(tick, None)
+        while self.reported and self.reported[0][0] <= confirmed:
+            tick, lock = self.reported.popleft()
+            if (self.remote, lock) not in self.locks.get(tick, ()):
+                raise DesyncError("the remote board locked {} at tick {}, not here".format(lock, tick))
+
+    def report(self, tick, lock):
+        """A lock of the remote board, as reported by the remote side"""
+        self.reported.append((tick, lock))
+
+    def outgoing_locks(self):
+        """Yields (tick, lock) of the local board for every final tick not reported yet"""
+        confirmed = self.confirmed
+        for tick in range(self.locks_sent + 1, confirmed + 1):
+            for player, lock in self.locks.get(tick, ()):
+                if player == self.local:
+                    yield tick, lock
+        self.locks_sent = max(self.locks_sent, confirmed)
+
+
+def listen(port, host=DEFAULT_HOST):
+    """A nonblocking socket waiting for the opponent, see `Connection.accept`"""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(1)
+    listener.setblocking(False)
+    return listener
+
+
+class Connection(object):
+    """A nonblocking TCP connection carrying the fixed-size messages of the versus protocol"""
+
+    def __init__(self, sock):
+        sock.setblocking(False)
+        if sock.family in (socket.AF_INET, socket.AF_INET6):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = sock
+        self.incoming = bytearray()
+        self.outgoing = bytearray()
+        self.messages = collections.deque() # Received, not handed out yet
+        self.closed = False
+
+    @classmethod
+    def accept(cls, listener):
+        """The connection of the opponent, or None if nobody connected yet"""
+        try:
+            sock, address = listener.accept()
+        except BlockingIOError:
+            return None
+        return cls(sock)
+
+    @classmethod
+    def connect(cls, host, port):
+        """The connection to the host, or None if it isn't listening yet"""
+        try:
+            return cls(socket.create_connection((host, port), timeout=1))
+        except (ConnectionRefusedError, socket.timeout):
+            return None
+
+    def send(self, kind, *values):
+        self.outgoing += MESSAGES[kind].pack(kind, *values)
+
+    def flush(self):
+        try:
+            while self.outgoing:
+                sent = self.sock.send(self.outgoing)
+                del self.outgoing[:sent]
+        except BlockingIOError:
+            pass
+        except OSError:
+            self.closed = True
+
+    def receive(self):
+        """Returns the [(kind, values), ...] received since the last call"""
+        self._read()
+        messages = list(self.messages)
+        self.messages.clear()
+        return messages
+
+    def next_message(self):
+        """Returns the next (kind, values) received, or None"""
+        self._read()
+        return self.messages.popleft() if self.messages else None
+
+    def _read(self):
+        try:
+            while True:
+                data = self.sock.recv(4096)
+                if not data:
+                    self.closed = True
+                    break
+                self.incoming += data
+        except BlockingIOError:
+            pass
+        except OSError:
+            self.closed = True
+
+        while self.incoming:
+            message = MESSAGES.get(bytes(self.incoming[:1]))
+            if message is None:
+                raise DesyncError("unknown message {!r}".format(bytes(self.incoming[:1])))
+            if len(self.incoming) < message.size:
+                break
+            values = message.unpack_from(self.incoming)
+            del self.incoming[:message.size]
+            self.messages.append((values[0], values[1:]))
+
+    def close(self):
+        self.sock.close()
+
+
+def new_seed():
+    return random.getrandbits(32)
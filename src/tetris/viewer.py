@@ -0,0 +1,133 @@
+"""
+Watch a game served by `tetris --spectate-port PORT`.
+
+    tetris-spectate --port PORT
+
+The stream is received on a thread, and the latest state is drawn by the game's own
+`Game.redraw`, so a spectator sees exactly what the player sees.
+"""
+import argparse
+import socket
+import sys
+import threading
+
+import pygame
+
+from .spectate import DEFAULT_HOST, DEFAULT_PORT, BoardDecoder, read_messages
+from .simulation import Snapshot
+from .tetrominoes import rotate
+from . import __main__ as tetris
+
+
+class Receiver(threading.Thread):
+    """Applies the incoming messages to a `BoardDecoder`, `version` counts them"""
+
+    def __init__(self, messages, decoder):
+        threading.Thread.__init__(self, name="tetris-spectate", daemon=True)
+        self.messages = messages
+        self.decoder = decoder
+        self.lock = threading.Lock()
+        self.version = 0
+        self.closed = False
+
+    def run(self):
+        try:
+            for message in self.messages:
+                with self.lock:
+                    self.decoder.apply(message)
+                    self.version += 1
+        except OSError:
+            pass
+        finally:
+            self.closed = True
+
+
+class SpectatorView(object):
+    """Turns the decoded board into `Snapshot`s, with one texture per color so blocks don't flicker"""
+
+    def __init__(self, matris):
+        self.matris = matris
+        self._blocks = {}
+
+    def block(self, color, shadow=False):
+        if (color, shadow) not in self._blocks:
+            self._blocks[(color, shadow)] = self.matris.block(color, shadow)
+        return self._blocks[(color, shadow)]
+
+    def snapshot(self, decoder):
+        if decoder.piece:
+            tetromino, rotation, y, x, shadow_y = decoder.piece
+            shape = rotate(tetromino.shape, rotation)
+            tetromino_block, shadow_block = self.block(tetromino.color), self.block(tetromino.color, True)
+        else:
+            tetromino, rotation, y, x, shadow_y = None, 0, 0, 0, 0
+            shape, tetromino_block, shadow_block = (), None, None
+        return Snapshot(
+            tick=decoder.tick,
+            blocks=tuple((x, y, self.block(color), color) for (y, x), color in decoder.squares.items()),
+            tetromino=tetromino, rotation=rotation, next_tetromino=decoder.next_tetromino,
+            next_tetrominoes=(decoder.next_tetromino,) if decoder.next_tetromino else (),
+            shape=shape, position=(y, x), shadow_position=(shadow_y, x),
+            tetromino_block=tetromino_block, shadow_block=shadow_block,
+            score=decoder.score, level=decoder.level, lines=decoder.lines, combo=decoder.combo,
+            paused=decoder.paused, pause_timer=0)
+
+
+def watch(sock, blocksize=None):
+    messages = read_messages(sock)
+    decoder = BoardDecoder()
+    # The first message is always a keyframe, it gives the size of the board
+    decoder.apply(next(messages))
+    layout = tetris.Layout(decoder.width, decoder.height - 2, blocksize)
+
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode(layout.size)
+    pygame.display.set_caption("TeTris - spectating")
+
+    game = tetris.Game(layout)
+    game.start(screen)
+    view = SpectatorView(game.matris)
+    receiver = Receiver(messages, decoder)
+    receiver.start()
+
+    clock = pygame.time.Clock()
+    drawn = None
+    while True:
+        clock.tick(50)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                return
+        if receiver.version != drawn:
+            with receiver.lock:
+                drawn = receiver.version
+                snapshot = view.snapshot(decoder)
+            game.redraw(snapshot)
+        if receiver.closed:
+            pygame.display.set_caption("TeTris - spectating (game closed)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="tetris-spectate", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default=DEFAULT_HOST, help="host of the game (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port of the game (default: %(default)s)")
+    parser.add_argument("--blocksize", type=int, metavar="PIXELS", help="size of a block on the board")
+    args = parser.parse_args(argv)
+
+    try:
+        sock = socket.create_connection((args.host, args.port))
+    except OSError as error:
+        print("Can't connect to {}:{}: {}".format(args.host, args.port, error), file=sys.stderr)
+        return 1
+    print("Waiting for a game on {}:{}".format(args.host, args.port))
+    with sock:
+        try:
+            watch(sock, args.blocksize)
+        except StopIteration:
+            print("The game was closed", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Zobrist hashing of boards, and a bounded transposition table for board searches.
+
+The hash of a board is the XOR of a random 64-bit key per occupied square, so placing
+or removing a square is one XOR and `Matris` keeps the hash of its board up to date as
+tetrominoes lock and lines clear. The keys are derived from the coordinates rather than
+drawn from a generator, so a hash means the same board from one run to the next.
+"""
+from collections import OrderedDict
+
+MASK = (1 << 64) - 1
+PIECE_SALT = 0x5bd1e995 << 32 # Keeps the keys of the pieces apart from the keys of the squares
+NEXT_SALT = 0x27d4eb2f << 32
+
+
+def splitmix64(value):
+    """ A well mixed 64-bit key for the integer `value` """
+    value = (value + 0x9e3779b97f4a7c15) & MASK
+    value = ((value ^ (value >> 30)) * 0xbf58476d1ce4e5b9) & MASK
+    value = ((value ^ (value >> 27)) * 0x94d049bb133111eb) & MASK
+    return value ^ (value >> 31)
+
+
+def square_key(y, x):
+    return splitmix64(y << 16 | x)
+
+
+_square_keys = {}
+
+
+def square_keys(width, height):
+    """ The cached {(y, x): key} of every square of a board """
+    if (width, height) not in _square_keys:
+        _square_keys[(width, height)] = {(y, x): square_key(y, x) for y in range(height) for x in range(width)}
+    return _square_keys[(width, height)]
+
+
+_row_keys = {}
+
+
+def row_keys(width, height):
+    """ The cached keys of the full rows of a board, by row """
+    if (width, height) not in _row_keys:
+        keys = square_keys(width, height)
+        rows = []
+        for y in range(height):
+            value = 0
+            for x in range(width):
+                value ^= keys[(y, x)]
+            rows.append(value)
+        _row_keys[(width, height)] = rows
+    return _row_keys[(width, height)]
+
+
+def piece_key(kind, rotation, y, x):
+    """ The key of tetromino number `kind` of `list_of_tetrominoes` falling at `rotation`, (y, x) """
+    return splitmix64(PIECE_SALT | kind << 24 | rotation << 20 | (y & 0x3ff) << 10 | x & 0x3ff)
+
+
+def next_key(kind):
+    """ The key of tetromino number `kind` as the one to place next, for search results """
+    return splitmix64(NEXT_SALT | kind)
+
+
+def board_hash(matrix):
+    """ The hash of a `Matris.matrix`, from scratch """
+    value = 0
+    for (y, x), square in matrix.items():
+        if square is not None:
+            value ^= square_key(y, x)
+    return value
+
+
+def rows_hash(rows):
+    """ The hash of a board given as bitmask rows, as `bot.board_rows` makes them """
+    value = 0
+    for y, row in enumerate(rows):
+        while row:
+            x = (row & -row).bit_length() - 1
+            value ^= square_key(y, x)
+            row &= row - 1
+    return value
+
+
+class TranspositionTable(object):
+    """A dict of at most `size` entries that forgets the least recently used one when full"""
+
+    def __init__(self, size=1 << 16):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        entries = self.entries
+        entries[key] = value
+        entries.move_to_end(key)
+        if len(entries) > self.size:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        """ {'size', 'entries', 'hits', 'misses', 'evictions', 'hit_rate'} """
+        lookups = self.hits + self.misses
+        return {'size': self.size, 'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'hit_rate': self.hits / lookups if lookups else 0.}
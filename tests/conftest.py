@@ -0,0 +1,61 @@
+import os
+
+# Before pygame is imported anywhere: no window, no sound card
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import pytest
+
+from tetris.__main__ import Layout, Matris
+from tetris.bot import best_placement
+from tetris.versus import silence
+
+
+@pytest.fixture
+def screen():
+    """The display, set to the classic window"""
+    pygame.init()
+    yield pygame.display.set_mode(Layout().size)
+    pygame.quit()
+
+
+@pytest.fixture
+def new_matris():
+    """A maker of silent `Matris` that don't write scores, offscreen"""
+
+    def new_matris(seed, layout=None, preview=1):
+        layout = layout or Layout()
+        matris = Matris(pygame.Surface(layout.size), layout, seed, preview)
+        matris.score_writer = lambda score: None
+        silence(matris)
+        return matris
+
+    return new_matris
+
+
+@pytest.fixture
+def bot_drop():
+    """Drops the falling tetromino of a `Matris` where the bot would; raises `GameOver` when it tops out"""
+
+    def bot_drop(matris):
+        rotation, x = best_placement(matris)
+        while matris.tetromino_rotation != rotation and matris.request_rotation():
+            pass
+        while matris.tetromino_position[1] != x and matris.request_movement(
+                'left' if matris.tetromino_position[1] > x else 'right'):
+            pass
+        matris.hard_drop()
+
+    return bot_drop
+
+
+def fill(matris, full):
+    """Sets every square of `matris` for which `full(y, x)` is true to a block, empties the others"""
+    for (y, x) in matris.matrix:
+        matris.matrix[(y, x)] = ('block', None, 'blue') if full(y, x) else None
+
+
+@pytest.fixture
+def fill_board():
+    return fill
@@ -0,0 +1,46 @@
+import random
+
+import pytest
+
+from tetris import bot
+from tetris.__main__ import Layout
+from tetris.bitboard import Bitboards
+from tetris.tetrominoes import list_of_tetrominoes, rotate
+
+
+def placed_rows(rows, y, shifted):
+    placed = list(rows)
+    for dy, mask in shifted:
+        placed[y+dy] |= mask
+    return placed
+
+
+@pytest.mark.parametrize("width, height", [(10, 22), (4, 6), (20, 42)])
+def test_packed_boards_match_the_game(new_matris, fill_board, width, height):
+    rng = random.Random(13)
+    packing = Bitboards(width, height)
+    matris = new_matris(13, Layout(width, height - 2))
+    for number in range(20):
+        stack = rng.randrange(height)
+        fill_board(matris, lambda y, x: y >= height - stack and (rng.random() < 0.85 or y % 3 == 0))
+        rows = bot.board_rows(matris)
+        board = packing.from_matrix(matris.matrix)
+        assert board == packing.from_rows(rows) and packing.rows(board) == rows
+
+        for tetromino in list_of_tetrominoes:
+            shapes = [rotate(tetromino.shape, rotation) for rotation in range(4)]
+            for shape in shapes:
+                for x in range(-2, width):
+                    for y in range(height):
+                        if not 0 <= packing.piece(shape)[2] + x < width:
+                            # Its first column is off the board, it can't be packed
+                            assert not matris.fits(shape, (y, x))
+                        else:
+                            assert matris.fits(shape, (y, x)) != packing.collides(board, packing.place(shape, y, x))
+            expected = [(rotation, x, y, packing.from_rows(placed_rows(rows, y, shifted)))
+                        for rotation, x, y, shifted in bot.drops(rows, shapes, 0, width)]
+            assert sorted(packing.drops(board, shapes, 0)) == sorted(expected)
+
+        cleared, lines = packing.clear(board)
+        assert lines == matris.remove_lines()
+        assert cleared == packing.from_matrix(matris.matrix)
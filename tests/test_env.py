@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from tetris.__main__ import GameOver, Layout
+from tetris.env import BLOCK, HARD_DROP, LEFT, NOOP, RIGHT, ROTATE, SOFT_DROP, TetrisEnv
+from tetris.tetrominoes import list_of_tetrominoes
+
+
+def test_env_stays_in_sync_with_the_game(new_matris):
+    """Random actions in a `TetrisEnv` and in a `Matris` getting the same pieces leave them in the same state"""
+    seed = 3
+    layout = Layout()
+    rng = random.Random(seed)
+    env = TetrisEnv(seed=seed)
+    env.reset()
+    vector = env.vector
+    games = 0
+
+    def start(matris):
+        # The environment starts on the same tetromino
+        vector.piece[0] = list_of_tetrominoes.index(matris.current_tetromino)
+        vector.x[0] = layout.spawn_column(matris.current_tetromino.shape)
+        return matris
+
+    matris = start(new_matris(seed, layout))
+    for step in range(1, 3001):
+        action = rng.choice((NOOP, LEFT, LEFT, RIGHT, RIGHT, ROTATE, ROTATE, SOFT_DROP, HARD_DROP))
+        vector.next_piece[0] = list_of_tetrominoes.index(matris.next_tetromino)
+        observation, reward, terminated, truncated, info = env.step(action)
+
+        score = matris.score
+        try:
+            if action in (LEFT, RIGHT):
+                matris.request_movement('left' if action == LEFT else 'right')
+            elif action == ROTATE:
+                matris.request_rotation()
+            elif action == HARD_DROP:
+                matris.hard_drop()
+            if action != HARD_DROP and (step % vector.gravity == 0 or action == SOFT_DROP):
+                if not matris.request_movement('down'):
+                    matris.lock_tetromino()
+        except GameOver:
+            assert terminated and info['final_score'] == matris.score
+            games += 1
+            matris = start(new_matris(seed + games, layout))
+            continue
+
+        assert not terminated
+        assert reward == matris.score - score
+        assert (info['score'], info['lines'], info['level']) == (matris.score, matris.lines, matris.level)
+        assert (vector.rotation[0], vector.y[0], vector.x[0]) == (matris.tetromino_rotation,) + matris.tetromino_position
+        blocks = [[matris.matrix[(y, x)] is not None for x in range(layout.matrix_width)]
+                  for y in range(layout.matrix_height)]
+        assert ((observation == BLOCK) == np.array(blocks)).all()
+    assert games > 0
@@ -0,0 +1,61 @@
+import pygame
+
+from tetris import __main__ as tetris
+from tetris.bench import make_matris
+from tetris.versus import silence
+
+
+def test_redraws_make_no_surface_and_add_up_to_a_full_redraw(screen, bot_drop, monkeypatch):
+    """
+    Once the game has started, with the assets preloaded, no `Surface` is made and no text rendered,
+    and the screen is the same as with every layer drawn from scratch
+    """
+    layout = tetris.Layout()
+    # What the preloader warms while the menu is shown
+    for priority, name, task in tetris.preload_tasks(layout):
+        task()
+    tetris.get_pause_symbol()
+
+    made = []
+    surface, font = tetris.Surface, pygame.font.Font
+
+    class CountedSurface(surface):
+        def __init__(self, *args, **kwargs):
+            made.append(args)
+            surface.__init__(self, *args, **kwargs)
+
+    class CountedFont(font):
+        def render(self, *args, **kwargs):
+            made.append(args)
+            return font.render(self, *args, **kwargs)
+
+    monkeypatch.setattr(tetris, 'Surface', CountedSurface)
+    monkeypatch.setattr(pygame.font, 'Font', CountedFont)
+    game = tetris.Game(layout, preview=3)
+    matris = make_matris(31, layout=layout, preview=3, screen=screen)
+    matris.score_writer = lambda score: None
+    silence(matris)
+    game.start(screen, matris)
+    started = len(made)
+    for frame in range(200):
+        if frame % 5 == 0:
+            try:
+                bot_drop(matris)
+            except tetris.GameOver:
+                break
+        else:
+            matris.request_movement('left' if frame % 2 else 'right')
+        matris.score += 1
+        matris.paused = frame % 50 < 10
+        matris.pause_timer = 0
+        game.redraw()
+    assert made[started:] == []
+    monkeypatch.undo()
+
+    game.redraw() # The game may have ended on a lock, before its redraw
+    composed = screen.copy()
+    screen.blit(game.static_layer, (0, 0))
+    for layer in (game.preview_layer, game.info_layer):
+        layer.invalidate()
+    game.redraw()
+    assert pygame.image.tostring(composed, 'RGB') == pygame.image.tostring(screen, 'RGB')
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+import pygame
+
+from tetris import __main__ as tetris
+from tetris import aio, scores
+
+
+def scripted_events(monkeypatch, *frames):
+    """Makes `pygame.event.get` return the events of `frames`, one list per frame"""
+    frames = iter(frames)
+    monkeypatch.setattr(pygame.event, 'get', lambda *args: next(frames))
+
+
+def key(code):
+    return pygame.event.Event(pygame.KEYDOWN, key=code, mod=0, unicode='', scancode=0)
+
+
+def test_high_scores_without_scores_ignore_enter(screen, monkeypatch):
+    monkeypatch.setattr(scores, 'load_high_scores', lambda count: [])
+    scripted_events(monkeypatch, [key(pygame.K_RETURN)], [key(pygame.K_SPACE), key(pygame.K_DOWN)],
+                    [key(pygame.K_ESCAPE)])
+    tetris.Menu().show_high_scores(screen)
+
+
+def test_high_scores_scroll(screen, monkeypatch):
+    monkeypatch.setattr(scores, 'load_high_scores', lambda count: list(range(100, 0, -1)))
+    scripted_events(monkeypatch, [key(pygame.K_END)], [key(pygame.K_RETURN)], [key(pygame.K_ESCAPE)])
+    tetris.Menu().show_high_scores(screen)
+
+
+def test_the_menu_reloads_the_score_once_it_is_written(screen, monkeypatch):
+    menu = tetris.Menu()
+    calls = []
+
+    def write_score(score):
+        time.sleep(.1)
+        calls.append(('write', score))
+
+    async def play(game, screen, io, resume=False):
+        io.submit(write_score, 1000)
+        menu.running = False
+
+    monkeypatch.setattr(tetris.Game, 'main_async', play)
+    monkeypatch.setattr(tetris, 'load_score', lambda: calls.append('load') or 0)
+    scripted_events(monkeypatch, [key(pygame.K_RETURN)], [])
+    asyncio.run(menu.main_async(screen, aio.BackgroundIO()))
+    assert calls == ['load', ('write', 1000), 'load']
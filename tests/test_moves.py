@@ -0,0 +1,56 @@
+import random
+
+from tetris import bot, zobrist
+from tetris.__main__ import GameOver, Layout
+from tetris.moves import MoveGenerator, play
+from tetris.tetrominoes import list_of_tetrominoes
+
+
+def test_every_placement_found_is_reached(new_matris, fill_board):
+    """
+    The inputs found for every placement on random boards with overhangs take the tetromino
+    there, and the straight drops are a subset of what's found
+    """
+    boards = 10
+    layout = Layout()
+    rng = random.Random(9)
+    matris = new_matris(9, layout)
+    generator = MoveGenerator()
+    tucks = 0
+    for number in range(boards):
+        # A ragged stack with a shelf sticking out of it, to tuck things under
+        heights = [rng.randrange(6) for x in range(layout.matrix_width)]
+        shelf = rng.randrange(layout.matrix_width - 3)
+        fill_board(matris, lambda y, x: y >= layout.matrix_height - heights[x] or
+                   (y == layout.matrix_height - 8 and shelf <= x < shelf + 3))
+        matris.board_hash = zobrist.board_hash(matris.matrix)
+
+        for tetromino in list_of_tetrominoes:
+            matris.current_tetromino = tetromino
+            matris.tetromino_rotation = 0
+            matris.tetromino_position = (0, layout.spawn_column(tetromino.shape))
+            placements = generator.placements(matris)
+            shapes = [matris.rotated(rotation) for rotation in range(4)]
+
+            def squares(rotation, y, x):
+                return frozenset((y+dy, mask << x if x >= 0 else mask >> -x)
+                                 for dy, mask in bot.shape_masks(shapes[rotation])[0])
+
+            # The stack is low, every straight drop can be reached
+            straight = {squares(rotation, y, x) for rotation, x, y, shifted in
+                        bot.drops(bot.board_rows(matris), shapes, 0, layout.matrix_width)}
+            found = {squares(*placement) for placement in placements}
+            assert straight <= found and len(found) == len(placements)
+            tucks += len(found) > len(straight)
+            assert generator.placements(matris) is placements
+
+            state = matris.save_state()
+            for placement, inputs in placements.items():
+                matris.load_state(state)
+                try:
+                    assert play(matris, inputs)
+                except GameOver:
+                    pass
+                assert matris.last_lock[1:3] == (placement[0], placement[1:])
+            matris.load_state(state)
+    assert tucks > 0 and generator.table.hits == boards * len(list_of_tetrominoes)
@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from tetris import zobrist
+from tetris.__main__ import Layout
+from tetris.perfect import PerfectClearSolver
+from tetris.tetrominoes import list_of_tetrominoes
+
+
+def set_board(matris, solver, board):
+    for (y, x) in matris.matrix:
+        matris.matrix[(y, x)] = ('block', None, 'blue') if board & solver.packing.bit(y, x) else None
+    matris.board_hash = zobrist.board_hash(matris.matrix)
+
+
+@pytest.fixture
+def solver(tmp_path):
+    layout = Layout()
+    return PerfectClearSolver(layout.matrix_width, layout.matrix_height, path=str(tmp_path / "perfectclears"))
+
+
+@pytest.fixture(scope="module")
+def problems():
+    layout = Layout()
+    solver = PerfectClearSolver(layout.matrix_width, layout.matrix_height, path=None)
+    return [solver.challenge(random.Random(17 + problem)) for problem in range(20)]
+
+
+def test_solutions_clear_the_board_in_the_game(new_matris, solver, problems):
+    matris = new_matris(17)
+    assert all(problems)
+    for board, pieces, solution in problems:
+        set_board(matris, solver, board)
+        for kind, (rotation, y, x) in zip(pieces, solution):
+            matris.current_tetromino = list_of_tetrominoes[kind]
+            matris.tetromino_rotation = rotation
+            matris.tetromino_position = (0, x)
+            matris.hard_drop()
+            assert matris.last_lock[1:3] == (rotation, (y, x))
+        assert all(square is None for square in matris.matrix.values())
+
+
+def test_memo_goes_to_disk_and_back(solver, problems):
+    for board, pieces, solution in problems:
+        assert solver.solve(board, pieces) is not None
+    solver.save()
+
+    layout = Layout()
+    loaded = PerfectClearSolver(layout.matrix_width, layout.matrix_height, path=solver.path)
+    assert len(loaded.table) == len(solver.table)
+    for board, pieces, solution in problems:
+        assert loaded.solve(board, pieces) == solution
+    assert loaded.table.hits >= len(problems) and loaded.nodes == 0
+
+
+def test_hint_is_the_first_placement(new_matris, solver, problems):
+    board, pieces, solution = problems[0]
+    matris = new_matris(17)
+    set_board(matris, solver, board)
+    matris.current_tetromino = list_of_tetrominoes[pieces[0]]
+    matris.next_tetrominoes = tuple(list_of_tetrominoes[kind] for kind in pieces[1:])
+    assert solver.hint(matris) == solution[0]
+
+
+def test_no_solution_with_too_few_pieces(solver, problems):
+    board, pieces, solution = problems[0]
+    assert solver.solve(board, pieces[:len(solution) - 1]) is None
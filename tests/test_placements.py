@@ -0,0 +1,26 @@
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from tetris import bot
+from tetris.__main__ import Layout
+from tetris.placements import best_placement, matris_board, placements
+from tetris.tetrominoes import list_of_tetrominoes
+
+
+def test_every_placement_matches_the_bot(new_matris, fill_board):
+    layout = Layout()
+    rng = random.Random(5)
+    matris = new_matris(5, layout)
+    for number in range(30):
+        stack = rng.randrange(layout.matrix_height - 2)
+        fill_board(matris, lambda y, x: y >= layout.matrix_height - stack and rng.random() < 0.8)
+        for tetromino in list_of_tetrominoes:
+            matris.current_tetromino = tetromino
+            expected = {(rotation, x): score for score, rotation, x in bot.placements(matris)}
+            found = placements(matris_board(matris), tetromino, matris.tetromino_position[0])
+            assert {(int(rotation), int(x)): score
+                    for rotation, x, score in zip(found.rotation, found.x, found.scores)} == expected
+            assert best_placement(matris) == bot.best_placement(matris)
@@ -0,0 +1,71 @@
+import pytest
+
+from tetris import savegame
+from tetris.__main__ import GameOver
+from tetris.rewind import RewindBuffer
+
+
+def test_rewinds_to_the_states_played(new_matris, bot_drop):
+    """Every state a game goes back to is the one saved when it was played"""
+    placements = 20
+    matris = new_matris(23)
+    buffer = matris.rewind_buffer = RewindBuffer(placements)
+    buffer.record(matris)
+    memory = buffer.memory()
+    history = [savegame.dumps(matris)]
+    for lock in range(60):
+        bot_drop(matris) # Records the placement
+        history.append(savegame.dumps(matris))
+        assert buffer.memory() == memory # Allocated once
+    assert len(buffer) == placements and buffer.recorded == len(history)
+
+    # One step at a time, then several, then further than the records go
+    for step in range(5):
+        assert buffer.rewind(matris) == 1
+        history.pop()
+        assert savegame.dumps(matris) == history[-1]
+    assert buffer.rewind(matris, 5) == 5
+    del history[-5:]
+    assert savegame.dumps(matris) == history[-1]
+    assert buffer.rewind(matris, placements) == placements - 10
+    assert savegame.dumps(matris) == history[-1 - (placements - 10)] and len(buffer) == 0
+    assert buffer.rewind(matris) == 0
+
+
+def test_topping_out_in_practice_takes_the_placement_back(new_matris):
+    matris = new_matris(23)
+    matris.rewind_buffer = RewindBuffer(5)
+    matris.rewind_buffer.record(matris)
+    before = savegame.dumps(matris)
+    for (y, x) in matris.matrix:
+        if y > 1 and x != 0:
+            matris.matrix[(y, x)] = ('block', matris.block('blue'), 'blue')
+    matris.hard_drop()
+    assert savegame.dumps(matris) == before
+
+
+def test_an_empty_buffer_has_nothing_to_rewind(new_matris):
+    buffer = RewindBuffer(5)
+    assert buffer.rewind(new_matris(23)) is None and len(buffer) == 0 and buffer.memory() == 0
+
+
+def test_a_rewind_lets_go_of_the_arrow_keys(new_matris):
+    matris = new_matris(23)
+    matris.rewind_buffer = buffer = RewindBuffer(5)
+    matris.movement_keys['left'] = 1 # Held when the record is taken
+    matris.movement_keys_timer = 1.
+    buffer.record(matris)
+    buffer.rewind(matris, 0)
+    assert matris.movement_keys == {'left': 0, 'right': 0}
+    assert matris.movement_keys_timer == -matris.movement_keys_speed * 2
+
+
+def test_practice_scores_are_not_written(new_matris):
+    matris = new_matris(23)
+    written = []
+    matris.score_writer = written.append
+    matris.rewind_buffer = RewindBuffer(5)
+    matris.score = 1000
+    with pytest.raises(GameOver):
+        matris.gameover()
+    assert written == []
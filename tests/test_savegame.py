@@ -0,0 +1,136 @@
+import pygame
+import pytest
+
+from tetris import savegame
+from tetris.__main__ import Game, GameOver, Layout, Matris
+
+
+def board(matris):
+    return {key: square and square[2] for key, square in matris.matrix.items()}
+
+
+def numbers(matris):
+    return ([getattr(matris, name) for name in Matris.STATE if name not in ('matrix', 'tetromino_block', 'shadow_block')] +
+            [matris.random.getstate()])
+
+
+@pytest.fixture
+def saved(new_matris, bot_drop):
+    """A game some locks in, with garbage on the way, and its save"""
+    matris = new_matris(21, preview=3)
+    for lock in range(30):
+        bot_drop(matris)
+    matris.pending_garbage = 2
+    return matris, savegame.dumps(matris)
+
+
+def test_a_game_played_on_from_its_save_stays_the_same(new_matris, bot_drop):
+    game, copy = new_matris(21, preview=3), new_matris(21, preview=3)
+    for lock in range(100):
+        if lock % 30 == 0:
+            game.pending_garbage = 2
+        data = savegame.dumps(game)
+        savegame.loads(copy, data)
+        assert board(copy) == board(game) and numbers(copy) == numbers(game) and savegame.dumps(copy) == data
+        try:
+            bot_drop(game)
+            bot_drop(copy)
+        except GameOver:
+            break
+        assert board(copy) == board(game) and numbers(copy) == numbers(game)
+
+
+@pytest.mark.parametrize("broken", [
+    lambda data: data[:10],
+    lambda data: b"XXXX" + data[4:],
+    lambda data: data + b"\0",
+])
+def test_broken_saves_are_refused(new_matris, saved, broken):
+    matris, data = saved
+    with pytest.raises(ValueError):
+        savegame.loads(new_matris(21, preview=3), broken(data))
+
+
+def header_with(data, field, value):
+    fields = list(savegame.HEADER.unpack_from(data))
+    fields[field] = value
+    return savegame.HEADER.pack(*fields) + data[savegame.HEADER.size:]
+
+
+@pytest.mark.parametrize("broken", [
+    lambda data: header_with(data, 10, 200), # Falling tetromino
+    lambda data: header_with(data, 11, 7), # Rotation
+    lambda data: data[:savegame.HEADER.size] + b"\x09" + data[savegame.HEADER.size + 1:], # Next tetromino
+    lambda data: data[:-1] + b"\xff", # Color
+])
+def test_saves_out_of_range_are_refused_untouched(new_matris, saved, broken):
+    matris, data = saved
+    other = new_matris(22, preview=3)
+    before = savegame.dumps(other)
+    with pytest.raises(ValueError):
+        savegame.loads(other, broken(data))
+    assert savegame.dumps(other) == before
+
+
+def test_a_save_of_another_board_size_is_refused(new_matris, saved):
+    matris, data = saved
+    with pytest.raises(ValueError):
+        savegame.loads(new_matris(21, Layout(12, 20)), data)
+
+
+def test_wide_boards_round_trip(new_matris, bot_drop):
+    layout = Layout(300, 20)
+    matris, copy = new_matris(21, layout), new_matris(22, layout)
+    bot_drop(matris)
+    savegame.loads(copy, savegame.dumps(matris))
+    assert board(copy) == board(matris) and numbers(copy) == numbers(matris)
+
+
+def test_resume_deletes_only_the_saves_it_loads(new_matris, saved, tmp_path):
+    matris, data = saved
+    path = tmp_path / "savegame"
+    assert not savegame.resume(new_matris(21), str(path))
+
+    path.write_bytes(data)
+    assert not savegame.resume(new_matris(21, Layout(12, 20)), str(path))
+    assert path.read_bytes() == data # For a game on the board it was saved on
+
+    path.write_bytes(data[:-1] + b"\xff")
+    assert not savegame.resume(new_matris(21, preview=3), str(path)) and path.exists()
+
+    path.write_bytes(data)
+    resumed = new_matris(21, preview=3)
+    assert savegame.resume(resumed, str(path)) and savegame.dumps(resumed) == data and not path.exists()
+
+
+def test_only_the_games_played_from_the_menu_resume(screen, saved, tmp_path, monkeypatch):
+    matris, data = saved
+    path = tmp_path / "savegame"
+    path.write_bytes(data)
+    monkeypatch.setattr(savegame, 'savefile', str(path))
+
+    game = Game(preview=3)
+    game.start(screen) # Like the viewer and the benchmarks
+    assert game.matris.score == 0 and game.matris.autosave is None and path.read_bytes() == data
+
+    game.start(screen, resume=True)
+    assert savegame.dumps(game.matris) == data and game.matris.autosave == str(path) and not path.exists()
+
+
+@pytest.mark.parametrize("sim_rate", [None, 100])
+def test_a_crash_saves_the_game(screen, tmp_path, monkeypatch, sim_rate):
+    path = tmp_path / "savegame"
+    monkeypatch.setattr(savegame, 'savefile', str(path))
+    game = Game(sim_rate=sim_rate)
+    game.start(screen, resume=True)
+
+    def crash(*args):
+        raise RuntimeError("crash")
+
+    monkeypatch.setattr(game.matris, 'update', crash)
+    with pytest.raises(RuntimeError):
+        if sim_rate:
+            game.main_threaded(pygame.time.Clock())
+        else:
+            game.frame(20)
+    assert path.read_bytes() == savegame.dumps(game.matris)
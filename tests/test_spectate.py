@@ -0,0 +1,63 @@
+import socket
+
+import pytest
+
+from tetris import spectate
+from tetris.__main__ import GameOver, Layout
+from tetris.spectate import BoardDecoder, BoardEncoder, SpectatorServer
+
+
+def squares(matris):
+    return {key: square[2] for key, square in matris.matrix.items() if square}
+
+
+def assert_shows(decoder, matris, snapshot):
+    assert decoder.squares == squares(matris)
+    assert decoder.piece == (snapshot.tetromino, snapshot.rotation) + snapshot.position + snapshot.shadow_position[:1]
+    assert (decoder.score, decoder.level, decoder.lines, decoder.combo) == (
+        matris.score, matris.level, matris.lines, matris.combo)
+
+
+@pytest.mark.parametrize("layout", [Layout(), Layout(100, 200)], ids=["classic", "large"])
+def test_deltas_and_keyframes_round_trip(new_matris, bot_drop, fill_board, layout):
+    matris = new_matris(5, layout)
+    fill_board(matris, lambda y, x: y > layout.matrix_height - 4 and (x * 7 + y) % 5)
+    encoder = BoardEncoder(layout.matrix_width, layout.matrix_height)
+    follower, joiner = BoardDecoder(), BoardDecoder()
+    for tick in range(40):
+        snapshot = matris.snapshot(tick)
+        delta = encoder.delta(snapshot)
+        assert follower.apply(delta if tick else encoder.keyframe(snapshot)) == (
+            spectate.DELTA if tick else spectate.KEYFRAME)
+        assert_shows(follower, matris, snapshot)
+        if tick % 10 == 9: # A viewer joining now only gets the keyframe
+            joiner.apply(encoder.keyframe(snapshot))
+            assert (joiner.width, joiner.height) == (layout.matrix_width, layout.matrix_height)
+            assert_shows(joiner, matris, snapshot)
+        try:
+            if tick % 2:
+                bot_drop(matris)
+            else:
+                matris.request_movement('left')
+        except GameOver:
+            break
+
+
+def test_keyframes_are_made_only_for_viewers(new_matris, bot_drop, monkeypatch):
+    layout = Layout()
+    matris = new_matris(5)
+    made = []
+    keyframe = BoardEncoder.keyframe
+    monkeypatch.setattr(BoardEncoder, 'keyframe', lambda *args: made.append(True) or keyframe(*args))
+    server = SpectatorServer(port=0)
+    server.start()
+    try:
+        for tick in range(20):
+            server.publish(matris.snapshot(tick), layout.matrix_width, layout.matrix_height)
+        viewer = socket.create_connection((server.host, server.port), timeout=5)
+        decoder = BoardDecoder()
+        assert decoder.apply(next(spectate.read_messages(viewer))) == spectate.KEYFRAME
+        assert decoder.tick == 19 and decoder.squares == {} and len(made) == 1
+        viewer.close()
+    finally:
+        server.stop()
@@ -0,0 +1,102 @@
+import collections
+import random
+import socket
+
+import pygame
+import pytest
+
+from tetris import __main__ as tetris
+from tetris.__main__ import GameOver
+from tetris.versus import (
+    DROP, INPUT, LEFT, LEFT_UP, LOCK, RIGHT, RIGHT_UP, ROTATE, SOFT_DROP,
+    Connection, Lockstep, decode_lock, encode_lock,
+)
+
+
+def fingerprint(boards):
+    return [(sorted((key, square[2]) for key, square in board.matrix.items() if square),
+             board.score, board.lines, board.current_tetromino, board.tetromino_position) for board in boards]
+
+
+def test_late_input_ends_where_a_game_without_latency_does(new_matris):
+    """
+    Two `Lockstep`s talking over a socket pair, the remote input arriving up to ten ticks late,
+    end up where a game with both inputs on time ends up
+    """
+    ticks, seed = 1500, 7
+    rng = random.Random(seed)
+    inputs = [[rng.choice((0, 0, 0, LEFT, RIGHT, LEFT_UP, RIGHT_UP, ROTATE, DROP, SOFT_DROP))
+               for tick in range(ticks)] for player in range(2)]
+
+    def new_boards():
+        return [new_matris(seed) for player in range(2)]
+
+    reference = Lockstep(new_boards(), 0, GameOver)
+    for tick in range(ticks):
+        reference.receive(tick, inputs[1][tick])
+        assert reference.advance(inputs[0][tick])
+
+    a, b = socket.socketpair()
+    peers = [(Lockstep(new_boards(), player, GameOver), Connection(sock)) for player, sock in enumerate((a, b))]
+    delayed = [collections.deque(), collections.deque()] # Messages held back, (deliver at, kind, values)
+    step = 0
+    while any(lockstep.tick < ticks or lockstep.received < ticks - 1 for lockstep, connection in peers):
+        for player, (lockstep, connection) in enumerate(peers):
+            for kind, values in connection.receive():
+                delayed[player].append((step + rng.randrange(10), kind, values))
+            while delayed[player] and delayed[player][0][0] <= step:
+                at, kind, values = delayed[player].popleft()
+                if kind == INPUT:
+                    lockstep.receive(*values)
+                elif kind == LOCK:
+                    lockstep.report(values[0], decode_lock(*values[1:]))
+            if lockstep.tick < ticks and lockstep.advance(inputs[player][lockstep.tick]):
+                connection.send(INPUT, lockstep.tick - 1, inputs[player][lockstep.tick - 1])
+            for tick, lock in lockstep.outgoing_locks():
+                connection.send(LOCK, tick, *encode_lock(lock))
+            connection.flush()
+        step += 1
+    a.close()
+    b.close()
+
+    expected = fingerprint(reference.boards)
+    for lockstep, connection in peers:
+        lockstep.rollback()
+        lockstep.forget()
+        assert fingerprint(lockstep.boards) == expected
+        assert lockstep.lost == reference.lost
+        assert lockstep.rollbacks > 0
+
+
+@pytest.fixture
+def versus_game(monkeypatch):
+    """A `VersusGame` on a double-width display, the other end of its connection and the results it showed"""
+    layout = tetris.Layout()
+    pygame.init()
+    screen = pygame.display.set_mode((layout.width*2, layout.height))
+    a, b = socket.socketpair()
+    game = tetris.VersusGame(layout, Connection(a), 7, 0)
+    shown = []
+    monkeypatch.setattr(game, 'show_result', lambda screen, text: shown.append(text))
+    yield game, screen, b, shown
+    a.close()
+    b.close()
+    pygame.quit()
+
+
+def test_a_malformed_message_ends_the_game_out_of_sync(versus_game):
+    game, screen, peer, shown = versus_game
+    peer.send(b"\xff" * 16)
+    game.main(screen)
+    assert shown == ["Out of sync"]
+
+
+def test_one_flip_per_frame_at_most(versus_game, monkeypatch):
+    game, screen, peer, shown = versus_game
+    frames = 60
+    events = iter([[]] * frames + [[pygame.event.Event(pygame.KEYDOWN, key=pygame.K_ESCAPE)]])
+    monkeypatch.setattr(pygame.event, 'get', lambda *args: next(events))
+    flips = []
+    monkeypatch.setattr(pygame.display, 'flip', lambda: flips.append(True))
+    game.main(screen)
+    assert shown == [] and 0 < len(flips) <= frames + 2 # And one for each board as it starts
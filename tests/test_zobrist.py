@@ -0,0 +1,27 @@
+from tetris.__main__ import GameOver
+from tetris.zobrist import TranspositionTable, board_hash
+
+
+def test_hash_kept_in_sync_with_the_board(new_matris, bot_drop):
+    matris = new_matris(11)
+    seen = set()
+    for lock in range(200):
+        if lock % 25 == 0:
+            matris.pending_garbage = 1 # Also goes through `add_garbage`
+        try:
+            bot_drop(matris)
+        except GameOver:
+            break
+        assert matris.board_hash == board_hash(matris.matrix)
+        seen.add(matris.board_hash)
+    assert matris.lines > 0 and len(seen) > lock // 2
+
+
+def test_transposition_table_evicts_the_least_recently_used():
+    table = TranspositionTable(2)
+    table.put(1, 'a')
+    table.put(2, 'b')
+    assert table.get(1) == 'a' # 2 is now the least recently used
+    table.put(3, 'c')
+    assert table.get(2) is None and table.get(1) == 'a' and table.get(3) == 'c'
+    assert table.stats()['evictions'] == 1 and table.hits == 3 and table.misses == 1